@@ -3,8 +3,10 @@ import asyncio
 import json
 import logging
 import sys
+from typing import AsyncIterator
 from dotenv import load_dotenv
 from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.artifacts.in_memory_artifact_service import InMemoryArtifactService
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
@@ -14,7 +16,9 @@ from google.genai import types
 from agent.backend.agents.drivers_license.agent import drivers_license_agent
 from agent.backend.agents.scheduler.agent import scheduler_agent
 from agent.backend.agents.orchestrator.prompt import PROMPT
-from agent.backend.types.types import AgentCallRequest, AgentCallResponse, FunctionPayload
+from agent.backend.sessions import SessionRegistry, event_size
+from config import SESSION_BACKEND, SESSION_DB_PATH
+from agent.backend.types.types import AgentCallRequest, AgentCallResponse, AgentStreamChunk, FunctionPayload
 
 # Configure logging to stdout
 logging.basicConfig(
@@ -44,8 +48,13 @@ logger.info("orchestrator-agent created successfully")
 
 APP_NAME = "drivers-license-assistant"
 logger.info(f"Initializing services for app: {APP_NAME}")
-SESSION_SERVICE = InMemorySessionService()
-logger.info("InMemorySessionService initialized")
+if SESSION_BACKEND == "sqlite":
+    from agent.backend.sqlite_session_service import SqliteSessionService
+    SESSION_SERVICE = SqliteSessionService()
+    logger.info(f"SqliteSessionService initialized at {SESSION_DB_PATH}")
+else:
+    SESSION_SERVICE = InMemorySessionService()
+    logger.info("InMemorySessionService initialized")
 ARTIFACT_SERVICE = InMemoryArtifactService()
 logger.info("InMemoryArtifactService initialized")
 
@@ -58,124 +67,138 @@ RUNNER = Runner(
 )
 logger.info("Runner created successfully")
 
-user_id_to_session_id = {}
-
-
-async def call_agent(req: AgentCallRequest) -> AgentCallResponse:
-    """Executes one turn of the agent with a query and full chat context."""
+# Sessions per chat user ID, bounded by idle time, count and approximate size.
+# Persisted sessions are only dropped from memory, to be restored on return
+SESSIONS = SessionRegistry(SESSION_SERVICE, APP_NAME, delete_evicted=SESSION_BACKEND != "sqlite")
+
+# Partial events carry text deltas as the model generates them; the final
+# event of each model response repeats the whole text
+STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+def _function_payloads(event) -> list[FunctionPayload]:
+    """Payloads of the function responses in an event, logging its function calls."""
+    author = event.author
+    function_calls = [
+        e.function_call for e in event.content.parts if e.function_call
+    ]
+    function_responses = [
+        e.function_response for e in event.content.parts if e.function_response
+    ]
+    logger.debug(f"Found {len(function_calls)} function call(s) and {len(function_responses)} function response(s)")
+
+    for func_call in function_calls:
+        logger.info(f"FUNC CALLS: [{author}]: {func_call.name}({json.dumps(func_call.args)})")
+
+    func_payloads = []
+    for func_resp in function_responses:
+        func_payload = None
+
+        if func_resp.response is None:
+            logger.warning(f"Empty function response for {func_resp.name}")
+            continue
+
+        try:
+            func_payload = func_resp.response["result"]
+        except Exception as e:
+            logger.error(f"Error parsing function response JSON: {str(e)}")
+
+        if func_payload:
+            func_payloads.append(FunctionPayload(
+                name=func_resp.name or "UNKNOWN",
+                payload=func_payload,
+            ))
+            logger.info(f"Added function payload for {func_resp.name}")
+    return func_payloads
+
+
+async def stream_agent(req: AgentCallRequest) -> AsyncIterator[AgentStreamChunk]:
+    """Executes one turn of the agent, yielding text deltas and function payloads as they arrive.
+
+    The runner streams model output as partial events. Once a response has
+    been streamed, its final event only repeats the text already yielded, so
+    that text is skipped; responses without partials (e.g. from models that
+    do not stream) are yielded whole.
+    """
     logger.info("="*60)
-    logger.info("call_agent function invoked")
+    logger.info("stream_agent function invoked")
     logger.info(f"Question: {req.question}")
     logger.info(f"Session ID: {req.session_id}")
-    
+
     try:
         assert req.session_id, "Session ID must be provided"
 
         user_id = req.session_id
         logger.info(f"User ID: {user_id}")
-
-        if user_id_to_session_id.get(user_id):
-            session_id = user_id_to_session_id[user_id]
-            session = await SESSION_SERVICE.get_session(
-                app_name=APP_NAME, session_id=session_id, user_id=user_id,
-            )
-            if session is None:
-                raise ValueError(f"Session with ID {session_id} not found for user {user_id}")
-            logger.info(f"Session found with ID: {session_id}")
-        else:
-            logger.info("Creating session")
-            session = await SESSION_SERVICE.create_session(
-                state={}, app_name=APP_NAME, user_id=user_id
-            )
-            session_id = session.id
-            user_id_to_session_id[user_id] = session_id
-            logger.info(f"Session created with ID: {session_id}")
+        session = await SESSIONS.get_or_create(user_id)
 
         query = f"[user]: {req.question}"
         logger.info(f"[user]: {req.question}")
-
-        logger.info("Creating content object for agent")
         content = types.Content(role="user", parts=[types.Part(text=query)])
-        logger.info("Content object created")
 
-        logger.info("Starting async runner execution")
-        events_async = RUNNER.run_async(
-            session_id=session.id, user_id=user_id, new_message=content
-        )
-        logger.info("Runner started, processing events stream")
-
-        full_response = ""
-        func_payloads = []
         event_count = 0
+        # Whether the current model response has been streamed as partials
+        streamed = False
+        # Approximate bytes the turn adds to the session: the user message and
+        # every non-partial event, which the runner appends to the session
+        turn_bytes = len(query)
+        try:
+            logger.info("Starting async runner execution")
+            events_async = RUNNER.run_async(
+                session_id=session.id, user_id=user_id, new_message=content,
+                run_config=STREAMING_RUN_CONFIG,
+            )
+            async for event in events_async:
+                event_count += 1
+                if not event.partial:
+                    turn_bytes += event_size(event)
+                if not event.content or not event.content.parts:
+                    logger.debug("Skipping event with no content or parts")
+                    continue
 
-        logger.info("Beginning event stream processing")
-        async for event in events_async:
-            event_count += 1
-            logger.debug(f"Processing event {event_count}")
-            if not event.content or not event.content.parts:
-                logger.debug("Skipping event with no content or parts")
-                continue
-
-            author = event.author
-            logger.debug(f"Event from author: {author}")
-
-            logger.debug("Extracting function calls and responses from event")
-            function_calls = [
-                e.function_call for e in event.content.parts if e.function_call
-            ]
-            function_responses = [
-                e.function_response for e in event.content.parts if e.function_response
-            ]
-            logger.debug(f"Found {len(function_calls)} function call(s) and {len(function_responses)} function response(s)")
-
-            if event.content.parts[0].text:
-                text_response = event.content.parts[0].text
-                # logger.info(f"[{author}]: {text_response}")
-                full_response += text_response
-
-            for func_call in function_calls:
-                logger.info(f"FUNC CALLS: [{author}]: {func_call.name}({json.dumps(func_call.args)})")
-                
-            for func_resp in function_responses:
-                func_payload = None
-
-                if func_resp.response is None:
-                    logger.warning(f"Empty function response for {func_resp.name}")
+                text = event.content.parts[0].text
+                if event.partial:
+                    if text:
+                        streamed = True
+                        yield AgentStreamChunk(delta=text)
                     continue
 
-                # logger.info(f"Processing function response for {func_resp.name} - {func_resp.response}")
-                try:
-                    func_payload = func_resp.response["result"]
-                    # logger.info(f"FUNC RESPONSE: [{author}]: {func_resp.name} -> {func_payload}")
-                except Exception as e:
-                    logger.error(f"Error parsing function response JSON: {str(e)}")
-
-                if func_payload:
-                    func_payloads.append(FunctionPayload(
-                        name=func_resp.name or "UNKNOWN",
-                        payload=func_payload,
-                    ))
-                    logger.info(f"Added function payload for {func_resp.name}")
-        
+                if text and not streamed:
+                    yield AgentStreamChunk(delta=text)
+                streamed = False
+
+                for func_payload in _function_payloads(event):
+                    yield AgentStreamChunk(function_payload=func_payload)
+        finally:
+            SESSIONS.release(user_id, session.id, turn_bytes)
+
         logger.info(f"Event stream processing complete. Processed {event_count} events")
-        logger.info(f"Collected {len(func_payloads)} function payload(s)")
-        logger.info(f"Full response length: {len(full_response)} characters")
-        logger.info(f"Final response: {full_response}")
-        
-        logger.info("Creating AgentCallResponse")
-        response = AgentCallResponse(
-            answer=full_response,
-            function_payloads=func_payloads,
-        )
-        logger.info("call_agent execution completed successfully")
         logger.info("="*60)
-        
-        return response
     except Exception as e:
-        logger.error(f"Error in call_agent: {str(e)}", exc_info=True)
+        logger.error(f"Error in stream_agent: {str(e)}", exc_info=True)
         raise
 
 
+async def call_agent(req: AgentCallRequest) -> AgentCallResponse:
+    """Executes one turn of the agent with a query and full chat context."""
+    full_response = ""
+    func_payloads = []
+
+    async for chunk in stream_agent(req):
+        full_response += chunk.delta
+        if chunk.function_payload is not None:
+            func_payloads.append(chunk.function_payload)
+
+    logger.info(f"Collected {len(func_payloads)} function payload(s)")
+    logger.info(f"Full response length: {len(full_response)} characters")
+    logger.info(f"Final response: {full_response}")
+
+    return AgentCallResponse(
+        answer=full_response,
+        function_payloads=func_payloads,
+    )
+
+
 if __name__ == "__main__":
     logger.info("Running agent in standalone mode")
     import os
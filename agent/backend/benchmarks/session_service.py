@@ -0,0 +1,125 @@
+"""
+Session Service Per-Turn Overhead Benchmark
+===========================================
+Measures the session service time, in microseconds, that one agent turn
+pays with ``InMemorySessionService`` and with ``SqliteSessionService``.
+
+Usage:
+    python -m agent.backend.benchmarks.session_service [sessions] [turns]
+
+A turn is what the runner does to the session service around one
+question: two ``get_session`` calls (the app's session lookup and the
+runner's own) and ``append_event`` for the user message, a function call,
+its response (carrying a state delta) and the final answer. Each of
+``sessions`` conversations runs ``turns`` turns, interleaved, so history
+grows as it would in production. The SQLite service is timed on the turn
+path only; the write-behind flush runs between turns and its time is
+reported separately, as is a cold ``get_session`` that loads a session
+from disk. It runs with and without ``revalidate``, the per-hit check for
+other workers' writes.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent.backend.sqlite_session_service import SqliteSessionService
+
+APP_NAME = "bench-app"
+DEFAULT_SESSIONS = 50
+DEFAULT_TURNS = 20
+# Retrieved document context stored in state on every turn, as the RAG tool does
+CONTEXT_BYTES = 4_000
+
+
+def _turn_events(turn: int) -> list[Event]:
+    invocation_id = f"inv-{turn}"
+    text = "Preciso renovar minha carteira de motorista. " * 4
+    return [
+        Event(invocation_id=invocation_id, author="user",
+              content=types.Content(role="user", parts=[types.Part(text=text)])),
+        Event(invocation_id=invocation_id, author="orchestrator_agent",
+              content=types.Content(role="model", parts=[types.Part(
+                  function_call=types.FunctionCall(name="search_documents", args={"query": text}))])),
+        Event(invocation_id=invocation_id, author="orchestrator_agent",
+              content=types.Content(role="user", parts=[types.Part(
+                  function_response=types.FunctionResponse(name="search_documents", response={"result": ["chunk"] * 20}))]),
+              actions=EventActions(state_delta={"X-drivers-license-context": ["x" * CONTEXT_BYTES], "turn": turn})),
+        Event(invocation_id=invocation_id, author="orchestrator_agent",
+              content=types.Content(role="model", parts=[types.Part(text=text * 3)])),
+    ]
+
+
+async def _turn(service, user_id: str, session_id: str, turn: int) -> float:
+    events = _turn_events(turn)
+    started = time.perf_counter()
+    await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    session = await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    for event in events:
+        await service.append_event(session, event)
+    return time.perf_counter() - started
+
+
+async def run(service, sessions: int, turns: int) -> dict[str, float]:
+    """Mean per-turn time in microseconds, plus flush and cold load times for SQLite."""
+    ids = []
+    for i in range(sessions):
+        session = await service.create_session(app_name=APP_NAME, user_id=f"user-{i}")
+        ids.append((f"user-{i}", session.id))
+
+    turn_time = flush_time = 0.0
+    for turn in range(turns):
+        for user_id, session_id in ids:
+            turn_time += await _turn(service, user_id, session_id, turn)
+        if isinstance(service, SqliteSessionService):
+            started = time.perf_counter()
+            await service.flush()
+            flush_time += time.perf_counter() - started
+
+    results = {"turn": turn_time / (sessions * turns) * 1e6}
+    if isinstance(service, SqliteSessionService):
+        results["flush per turn"] = flush_time / (sessions * turns) * 1e6
+        user_id, session_id = ids[0]
+        service._sessions.clear()
+        started = time.perf_counter()
+        await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        results[f"cold load ({turns * 4} events)"] = (time.perf_counter() - started) * 1e6
+    return results
+
+
+async def main_async(sessions: int, turns: int) -> None:
+    print(f"Session service time per turn over {sessions} sessions x {turns} turns (us):")
+    for name, results in [
+        ("InMemorySessionService", await run(InMemorySessionService(), sessions, turns)),
+        ("SqliteSessionService", await _run_sqlite(sessions, turns, revalidate=True)),
+        ("  revalidate=False", await _run_sqlite(sessions, turns, revalidate=False)),
+    ]:
+        for metric, us in results.items():
+            print(f"  {name:<24} {metric:<24} {us:>10,.0f}")
+
+
+async def _run_sqlite(sessions: int, turns: int, revalidate: bool) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        service = SqliteSessionService(
+            os.path.join(directory, "sessions.db"), cache_size=sessions, revalidate=revalidate,
+        )
+        try:
+            return await run(service, sessions, turns)
+        finally:
+            await service.close()
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SESSIONS
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TURNS
+    asyncio.run(main_async(sessions, turns))
+
+
+if __name__ == "__main__":
+    main()
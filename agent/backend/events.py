@@ -0,0 +1,115 @@
+"""
+Instrumentation Event Queue
+===========================
+Moves metric updates out of the instrumented call path.
+
+The wrappers in ``agent/backend/instrument.py`` describe each finished call
+as one fixed-layout event (a ``NamedTuple`` of timestamps, names, token
+counts) and append it to a bounded queue; that append is all the call pays
+for. A daemon thread drains the queue every ``interval`` seconds, or as
+soon as a batch is waiting, and hands each event to the handler registered
+for its type, which updates Prometheus, the local metrics store, sketches
+and session summaries exactly as the wrappers used to.
+
+When the queue is full the event is dropped and counted, never waited on.
+``flush`` applies everything queued so far; ``/metrics`` runs it in a
+worker thread before every scrape, so scraped values never lag the calls
+that finished before it and the event loop never pays for the drain.
+"""
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from prometheus_client import Counter, Gauge
+
+from config import INSTRUMENTATION_QUEUE_SIZE, INSTRUMENTATION_FLUSH_INTERVAL
+
+logger = logging.getLogger("adk_metrics")
+
+
+INSTRUMENTATION_EVENTS = Counter(
+    "adk_instrumentation_events_total",
+    "Instrumentation events by outcome (applied, dropped, failed)",
+    ["result"]
+)
+INSTRUMENTATION_QUEUE_DEPTH = Gauge(
+    "adk_instrumentation_queue_depth",
+    "Instrumentation events waiting when the aggregator last drained the queue",
+    multiprocess_mode="livemax"
+)
+_EVENTS_APPLIED = INSTRUMENTATION_EVENTS.labels(result="applied")
+_EVENTS_DROPPED = INSTRUMENTATION_EVENTS.labels(result="dropped")
+_EVENTS_FAILED = INSTRUMENTATION_EVENTS.labels(result="failed")
+
+
+class EventQueue:
+    """Bounded queue of instrumentation events drained by a daemon thread.
+
+    Args:
+        handlers: Function applying an event, per event type
+        max_queue: Events held before new ones are dropped
+        batch_size: Queued events that wake the thread before ``interval``
+        interval: Seconds between drains
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[type, Callable[[Any], None]],
+        max_queue: int = INSTRUMENTATION_QUEUE_SIZE,
+        batch_size: int = 512,
+        interval: float = INSTRUMENTATION_FLUSH_INTERVAL,
+    ):
+        self.handlers = handlers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: deque = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # Handlers assume a single writer (e.g. overhead budgets)
+        self._flush_lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="adk-metrics-aggregator", daemon=True)
+                self._thread.start()
+
+    def submit(self, event: tuple) -> None:
+        """Queue one event; safe to call from the event loop."""
+        if len(self._queue) >= self.max_queue:
+            _EVENTS_DROPPED.inc()
+            return
+        self._queue.append(event)
+        if self._thread is None:
+            self._start()
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Apply every queued event now."""
+        with self._flush_lock:
+            INSTRUMENTATION_QUEUE_DEPTH.set(len(self._queue))
+            applied = failed = 0
+            while True:
+                try:
+                    event = self._queue.popleft()
+                except IndexError:
+                    break
+                try:
+                    self.handlers[type(event)](event)
+                    applied += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Failed to apply {type(event).__name__}: {e}")
+            if applied:
+                _EVENTS_APPLIED.inc(applied)
+            if failed:
+                _EVENTS_FAILED.inc(failed)
@@ -0,0 +1,100 @@
+"""
+Top Sessions by Cost, Tokens and Latency
+========================================
+Weighted Space-Saving summaries fed by the LLM wrapper in
+``agent/backend/instrument.py``. They find the handful of sessions that
+drive spend without putting ``session_id`` on any Prometheus label.
+
+Each summary holds at most ``capacity`` sessions. A new session arriving
+at a full summary replaces the one with the smallest total and inherits
+that total as its overestimation error, so every session whose true total
+exceeds ``stream total / capacity`` is guaranteed to be listed, and a
+reported value is never more than ``error`` above the true one. Memory is
+constant regardless of how many sessions pass through.
+
+The summaries are per process. With several workers
+(``PROMETHEUS_MULTIPROC_DIR`` set) each one would only rank the sessions
+it served, and the endpoint would return whichever worker answered, so
+they are disabled: nothing is recorded and the top-sessions response has
+``enabled`` false and empty lists.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import TOP_SESSIONS_CAPACITY, TOP_SESSIONS_ENABLED
+
+
+class SpaceSaving:
+    """Weighted Space-Saving summary keeping the top ``capacity`` keys.
+
+    Entries map a key to ``[value, error]``; ``value - error`` is a lower
+    bound on the key's true total.
+    """
+
+    __slots__ = ("capacity", "total", "_entries")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0.0
+        self._entries: Dict[str, List[float]] = {}
+
+    def add(self, key: str, weight: float) -> None:
+        if weight <= 0:
+            return
+        self.total += weight
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self._entries) < self.capacity:
+            self._entries[key] = [weight, 0.0]
+        else:
+            # Linear scan: only new keys at a full summary pay it, and capacity is small
+            victim = min(self._entries, key=lambda k: self._entries[k][0])
+            floor = self._entries.pop(victim)[0]
+            self._entries[key] = [floor + weight, floor]
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, float, float]]:
+        """``(key, value, error)`` by descending value."""
+        ranked = sorted(self._entries.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, value, error) for key, (value, error) in ranked[:limit]]
+
+
+class TopSessions:
+    """Space-Saving summaries of per-session LLM cost, tokens and latency.
+
+    Args:
+        capacity: Sessions tracked per summary
+        enabled: When False, recording is a no-op and every list is empty
+    """
+
+    METRICS = ("cost", "tokens", "latency")
+
+    def __init__(self, capacity: int = TOP_SESSIONS_CAPACITY, enabled: bool = TOP_SESSIONS_ENABLED):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._summaries = {metric: SpaceSaving(capacity) for metric in self.METRICS}
+        self._lock = threading.Lock()
+
+    def record(self, session_id: str, cost: float, tokens: float, latency: float) -> None:
+        """One finished LLM call of a session."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._summaries["cost"].add(session_id, cost)
+            self._summaries["tokens"].add(session_id, tokens)
+            self._summaries["latency"].add(session_id, latency)
+
+    def top(self, metric: str, limit: Optional[int] = None) -> List[Tuple[str, float, float]]:
+        """Heaviest sessions for one metric as ``(session_id, value, error)``."""
+        with self._lock:
+            return self._summaries[metric].top(limit)
+
+    def total(self, metric: str) -> float:
+        with self._lock:
+            return self._summaries[metric].total
+
+
+# Process-wide summaries fed by agent/backend/instrument.py
+TOP_SESSIONS = TopSessions()
@@ -13,12 +13,31 @@ Usage:
     app.include_router(get_metrics_router())
 """
 
+import asyncio
+import os
 import time
 import functools
 import inspect
 import logging
 import sys
-from prometheus_client import Counter, Histogram, Gauge
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from opentelemetry import trace as otel_trace
+from prometheus_client import CollectorRegistry, Counter, Histogram, Gauge, make_asgi_app, multiprocess
+
+from agent.backend.events import EventQueue
+from agent.backend.heavy_hitters import TOP_SESSIONS
+from agent.backend.metrics_store import LOCAL_METRICS
+from agent.backend.overhead import OverheadBudget
+from agent.backend.sketches import LATENCY_SKETCHES
+from agent.backend.tracing import TRACER, OpenSpan
+from config import (
+    PROMETHEUS_MULTIPROC_DIR,
+    AGENT_DURATION_BUCKETS,
+    LLM_DURATION_BUCKETS,
+    TOOL_DURATION_BUCKETS,
+    METRICS_EXEMPLARS_ENABLED,
+    SESSION_BACKEND,
+)
 
 
 logger = logging.getLogger("adk_metrics")
@@ -42,6 +61,38 @@ MODEL_PRICING = {
 }
 DEFAULT_PRICING = {"prompt": 0.10, "completion": 0.40}
 
+# --- Histogram Bucket Profiles (seconds) ---
+# The client default tops out at 10s, which multi-hop agent runs and long
+# generations routinely exceed; every quantile above that is lost.
+BUCKET_PROFILES: Dict[str, Tuple[float, ...]] = {
+    "default": Histogram.DEFAULT_BUCKETS,
+    "tool": (.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf")),
+    "llm": (.1, .25, .5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0, 300.0, float("inf")),
+    "agent": (.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, float("inf")),
+}
+
+
+def resolve_buckets(spec: str, fallback: str) -> Tuple[float, ...]:
+    """Buckets for a profile name or a comma-separated list of upper bounds."""
+    spec = spec.strip().lower()
+    if spec in BUCKET_PROFILES:
+        return BUCKET_PROFILES[spec]
+    try:
+        bounds = sorted({float(b) for b in spec.split(",") if b.strip()})
+    except ValueError:
+        bounds = []
+    if not bounds:
+        logger.warning(f"Invalid histogram buckets {spec!r}; using the {fallback!r} profile")
+        return BUCKET_PROFILES[fallback]
+    if bounds[-1] != float("inf"):
+        bounds.append(float("inf"))
+    return tuple(bounds)
+
+
+AGENT_BUCKETS = resolve_buckets(AGENT_DURATION_BUCKETS, "agent")
+LLM_BUCKETS = resolve_buckets(LLM_DURATION_BUCKETS, "llm")
+TOOL_BUCKETS = resolve_buckets(TOOL_DURATION_BUCKETS, "tool")
+
 # --- Metrics Definitions ---
 # Conversation Metrics
 CONVERSATIONS_TOTAL = Counter(
@@ -55,25 +106,29 @@ CONVERSATIONS_TOTAL = Counter(
 AGENT_TOOL_INFO = Gauge(
     "adk_agent_tool_info",
     "Static info metric indicating which tools belong to which agent",
-    ["agent_name", "tool_name"]
+    ["agent_name", "tool_name"],
+    multiprocess_mode="max"
 )
 
 AGENT_WORKFLOWS_INFO = Gauge(
     "adk_agent_workflows_info",
     "Static info metric indicating which workflow(s) each agent is associated with",
-    ["agent_name", "workflows"]
+    ["agent_name", "workflows"],
+    multiprocess_mode="max"
 )
 
 AGENT_SUBAGENTS_INFO = Gauge(
     "adk_agent_subagents_info",
     "Static info metric indicating the direct sub-agents of each agent",
-    ["agent_name", "subagents"]
+    ["agent_name", "subagents"],
+    multiprocess_mode="max"
 )
 
 AGENT_MODEL_INFO = Gauge(
     "adk_agent_model_info",
     "Static info metric indicating which model each agent uses",
-    ["agent_name", "model"]
+    ["agent_name", "model"],
+    multiprocess_mode="max"
 )
 
 AGENT_RUNS = Counter(
@@ -84,7 +139,8 @@ AGENT_RUNS = Counter(
 AGENT_DURATION = Histogram(
     "adk_agent_run_duration_seconds",
     "Time taken for agent execution",
-    ["agent_name"]
+    ["agent_name"],
+    buckets=AGENT_BUCKETS
 )
 # LLM Metrics
 LLM_REQUESTS = Counter(
@@ -95,7 +151,26 @@ LLM_REQUESTS = Counter(
 LLM_DURATION = Histogram(
     "adk_llm_request_duration_seconds",
     "Latency of LLM requests",
-    ["model", "agent_name"]
+    ["model", "agent_name"],
+    buckets=LLM_BUCKETS
+)
+LLM_TIME_TO_FIRST_RESPONSE = Histogram(
+    "adk_llm_time_to_first_response_seconds",
+    "Time from sending an LLM request to receiving its first response chunk",
+    ["model", "agent_name"],
+    buckets=LLM_BUCKETS
+)
+LLM_INTER_CHUNK = Histogram(
+    "adk_llm_inter_chunk_seconds",
+    "Gap between consecutive response chunks of a streamed LLM request",
+    ["model", "agent_name"],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, float("inf"))
+)
+LLM_OUTPUT_TOKENS_PER_SECOND = Histogram(
+    "adk_llm_output_tokens_per_second",
+    "Completion tokens per second of generation, after the first response chunk",
+    ["model", "agent_name"],
+    buckets=(1, 5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 1000, float("inf"))
 )
 LLM_TOKENS = Counter(
     "adk_llm_tokens_total",
@@ -116,10 +191,237 @@ TOOL_CALLS = Counter(
 TOOL_DURATION = Histogram(
     "adk_tool_call_duration_seconds",
     "Latency of tool calls",
-    ["tool_name", "agent_name"]
+    ["tool_name", "agent_name"],
+    buckets=TOOL_BUCKETS
 )
 
 
+# --- Bound Metric Children ---
+# The wrappers resolve the same few label sets on every call. Each set is
+# bound once and kept in a bounded LRU cache, so a burst of unexpected
+# label values cannot grow memory here; evicted sets are just bound again.
+_CHILD_CACHE_SIZE = 1024
+
+
+class _AgentChildren(NamedTuple):
+    runs_success: Counter
+    runs_error: Counter
+    duration: Histogram
+
+
+class _LlmChildren(NamedTuple):
+    requests_success: Counter
+    requests_error: Counter
+    duration: Histogram
+    time_to_first_response: Histogram
+    inter_chunk: Histogram
+    tokens_per_second: Histogram
+    prompt_tokens: Counter
+    completion_tokens: Counter
+    total_tokens: Counter
+    cost: Counter
+    prompt_price: float  # Dollars per prompt token
+    completion_price: float  # Dollars per completion token
+
+
+class _ToolChildren(NamedTuple):
+    calls_success: Counter
+    calls_error: Counter
+    duration: Histogram
+
+
+@functools.lru_cache(maxsize=_CHILD_CACHE_SIZE)
+def _agent_children(agent_name: str) -> _AgentChildren:
+    return _AgentChildren(
+        AGENT_RUNS.labels(agent_name=agent_name, status="success"),
+        AGENT_RUNS.labels(agent_name=agent_name, status="error"),
+        AGENT_DURATION.labels(agent_name=agent_name),
+    )
+
+
+@functools.lru_cache(maxsize=_CHILD_CACHE_SIZE)
+def _llm_children(model_name: str, agent_name: str) -> _LlmChildren:
+    pricing = MODEL_PRICING.get(model_name, DEFAULT_PRICING)
+    return _LlmChildren(
+        LLM_REQUESTS.labels(model=model_name, agent_name=agent_name, status="success"),
+        LLM_REQUESTS.labels(model=model_name, agent_name=agent_name, status="error"),
+        LLM_DURATION.labels(model=model_name, agent_name=agent_name),
+        LLM_TIME_TO_FIRST_RESPONSE.labels(model=model_name, agent_name=agent_name),
+        LLM_INTER_CHUNK.labels(model=model_name, agent_name=agent_name),
+        LLM_OUTPUT_TOKENS_PER_SECOND.labels(model=model_name, agent_name=agent_name),
+        LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="prompt"),
+        LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="completion"),
+        LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="total"),
+        LLM_COST.labels(model=model_name, agent_name=agent_name),
+        pricing["prompt"] / 1_000_000,
+        pricing["completion"] / 1_000_000,
+    )
+
+
+@functools.lru_cache(maxsize=_CHILD_CACHE_SIZE)
+def _tool_children(tool_name: str, agent_name: str) -> _ToolChildren:
+    return _ToolChildren(
+        TOOL_CALLS.labels(tool_name=tool_name, agent_name=agent_name, status="success"),
+        TOOL_CALLS.labels(tool_name=tool_name, agent_name=agent_name, status="error"),
+        TOOL_DURATION.labels(tool_name=tool_name, agent_name=agent_name),
+    )
+
+
+# --- Overhead Budgets ---
+# Exemplars, chunk-gap histograms and logs are sampled per call once a
+# wrapper's own time exceeds its share of the calls it wraps.
+AGENT_BUDGET = OverheadBudget("agent")
+LLM_BUDGET = OverheadBudget("llm")
+TOOL_BUDGET = OverheadBudget("tool")
+SESSION_BUDGET = OverheadBudget("session")
+
+
+# --- Exemplars ---
+def _session_id(invocation_context, span: Optional[OpenSpan] = None) -> Optional[str]:
+    """ADK session ID of a call, from its invocation context or its span."""
+    session = getattr(invocation_context, "session", None)
+    session_id = getattr(session, "id", None) or (span.session_id if span is not None else None)
+    return str(session_id) if session_id else None
+
+
+def _exemplar(invocation_context, span: Optional[OpenSpan] = None) -> Optional[Dict[str, str]]:
+    """Trace and session IDs linking an observation to the conversation behind it.
+
+    The trace ID is that of the wrapper's span, or of the current
+    OpenTelemetry span when tracing is off. Exemplar labels are capped at
+    128 characters in total, so the session ID is truncated.
+    """
+    if not METRICS_EXEMPLARS_ENABLED:
+        return None
+    labels = {}
+    if span is not None:
+        labels["trace_id"] = span.trace_id
+    else:
+        span_context = otel_trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            labels["trace_id"] = format(span_context.trace_id, "032x")
+    session_id = _session_id(invocation_context, span)
+    if session_id:
+        labels["session_id"] = session_id[:64]
+    return labels or None
+
+
+# --- Instrumentation Events ---
+# One fixed-layout record per finished call. The wrappers only build and
+# queue these; the aggregator thread in agent/backend/events.py applies them
+# below to the same metrics the wrappers used to update inline.
+class AgentEvent(NamedTuple):
+    timestamp: float  # Unix epoch seconds at the end of the run
+    agent_name: str
+    status: str
+    duration: float
+    exemplar: Optional[Dict[str, str]]
+    overhead: float  # Wrapper time, for the overhead budget
+
+
+class LlmEvent(NamedTuple):
+    timestamp: float
+    model: str
+    agent_name: str
+    status: str
+    duration: float
+    exemplar: Optional[Dict[str, str]]
+    overhead: float
+    session_id: Optional[str]
+    time_to_first_response: Optional[float]  # None when no chunk arrived
+    generation: Optional[float]  # First to last chunk, or the whole call for one chunk
+    chunk_gaps: Optional[List[float]]  # None when extras were not sampled
+    usage_chunks: int  # Chunks that reported usage
+    prompt_tokens: int  # Summed over chunks
+    completion_tokens: int
+    total_tokens: int
+    output_tokens: int  # Largest completion count of any chunk
+
+
+class ToolEvent(NamedTuple):
+    timestamp: float
+    tool_name: str
+    agent_name: str
+    status: str
+    duration: float
+    exemplar: Optional[Dict[str, str]]
+    overhead: float
+
+
+class SessionEvent(NamedTuple):
+    timestamp: float
+    session_id: str
+    log: bool  # Sampled log line
+    duration: float
+    overhead: float
+
+
+def _apply_agent_event(event: AgentEvent) -> None:
+    children = _agent_children(event.agent_name)
+    (children.runs_success if event.status == "success" else children.runs_error).inc()
+    children.duration.observe(event.duration, event.exemplar)
+    LOCAL_METRICS.record_agent_run(event.agent_name, event.status, event.duration, event.timestamp)
+    LATENCY_SKETCHES.record("agent", (event.agent_name,), event.duration, event.timestamp)
+    AGENT_BUDGET.record(event.overhead, event.duration)
+
+
+def _apply_llm_event(event: LlmEvent) -> None:
+    children = _llm_children(event.model, event.agent_name)
+    if event.time_to_first_response is not None:
+        children.time_to_first_response.observe(event.time_to_first_response, event.exemplar)
+    if event.chunk_gaps:
+        for gap in event.chunk_gaps:
+            children.inter_chunk.observe(gap)
+    cost = event.prompt_tokens * children.prompt_price + event.completion_tokens * children.completion_price
+    if event.prompt_tokens:
+        children.prompt_tokens.inc(event.prompt_tokens)
+    if event.completion_tokens:
+        children.completion_tokens.inc(event.completion_tokens)
+    if event.total_tokens:
+        children.total_tokens.inc(event.total_tokens)
+    if cost > 0:
+        children.cost.inc(cost)
+    if event.usage_chunks:
+        LOCAL_METRICS.record_llm_usage(
+            event.agent_name, event.model, event.prompt_tokens, event.completion_tokens,
+            event.total_tokens, cost, event.timestamp,
+        )
+    (children.requests_success if event.status == "success" else children.requests_error).inc()
+    children.duration.observe(event.duration, event.exemplar)
+    if event.output_tokens and event.generation:
+        children.tokens_per_second.observe(event.output_tokens / event.generation)
+    LOCAL_METRICS.record_llm_request(event.agent_name, event.model, event.duration, event.timestamp)
+    LATENCY_SKETCHES.record("model", (event.agent_name, event.model), event.duration, event.timestamp)
+    if event.session_id:
+        TOP_SESSIONS.record(event.session_id, cost, event.total_tokens, event.duration)
+    LLM_BUDGET.record(event.overhead, event.duration)
+
+
+def _apply_tool_event(event: ToolEvent) -> None:
+    children = _tool_children(event.tool_name, event.agent_name)
+    (children.calls_success if event.status == "success" else children.calls_error).inc()
+    children.duration.observe(event.duration, event.exemplar)
+    LOCAL_METRICS.record_tool_call(event.agent_name, event.tool_name, event.status, event.duration, event.timestamp)
+    LATENCY_SKETCHES.record("tool", (event.agent_name, event.tool_name), event.duration, event.timestamp)
+    TOOL_BUDGET.record(event.overhead, event.duration)
+
+
+def _apply_session_event(event: SessionEvent) -> None:
+    CONVERSATIONS_TOTAL.inc()
+    LOCAL_METRICS.record_conversation(now=event.timestamp)
+    if event.log:
+        logger.info(f"New conversation started, session_id={event.session_id}")
+    SESSION_BUDGET.record(event.overhead, event.duration)
+
+
+EVENTS = EventQueue({
+    AgentEvent: _apply_agent_event,
+    LlmEvent: _apply_llm_event,
+    ToolEvent: _apply_tool_event,
+    SessionEvent: _apply_session_event,
+})
+
+
 # --- Patching Helpers ---
 def _safe_get_attr(obj, attr, default="unknown"):
     """Safely get an attribute from an object."""
@@ -186,8 +488,13 @@ def _patch_function(module_name: str, func_name: str, wrapper_factory):
 def run_async_wrapper(original_method):
     @functools.wraps(original_method)
     async def wrapper(self, *args, **kwargs):
+        entered = time.perf_counter()
         agent_name = _safe_get_attr(self, "name", "unknown_agent")
-        start_time = time.time()
+        # Args: (parent_context,)
+        invocation_context = args[0] if args else kwargs.get("parent_context")
+        span = TRACER.start("agent", agent_name, invocation_context)
+        extras = AGENT_BUDGET.sample()
+        start_time = time.perf_counter()
         status = "success"
         
         try:
@@ -206,9 +513,14 @@ def run_async_wrapper(original_method):
             status = "error"
             raise
         finally:
-            duration = time.time() - start_time
-            AGENT_RUNS.labels(agent_name=agent_name, status=status).inc()
-            AGENT_DURATION.labels(agent_name=agent_name).observe(duration)
+            stopped = time.perf_counter()
+            duration = stopped - start_time
+            TRACER.end(span, duration, status)
+            exemplar = _exemplar(invocation_context, span) if extras else None
+            EVENTS.submit(AgentEvent(
+                time.time(), agent_name, status, duration, exemplar,
+                (start_time - entered) + (time.perf_counter() - stopped),
+            ))
             
     return wrapper
 
@@ -216,6 +528,7 @@ def run_async_wrapper(original_method):
 def _call_llm_async_wrapper(original_method):
     @functools.wraps(original_method)
     async def wrapper(self, *args, **kwargs):
+        entered = time.perf_counter()
         # Args: (invocation_context, llm_request, model_response_event)
         invocation_context = args[0] if len(args) > 0 else kwargs.get("invocation_context")
         llm_request = args[1] if len(args) > 1 else kwargs.get("llm_request")
@@ -228,8 +541,20 @@ def _call_llm_async_wrapper(original_method):
         if invocation_context and hasattr(invocation_context, "agent"):
             agent_name = invocation_context.agent.name
 
-        start_time = time.time()
+        span = TRACER.start("llm", model_name, invocation_context)
+        extras = LLM_BUDGET.sample()
+        start_time = time.perf_counter()
         status = "success"
+        # Chunk arrival times split queueing (time to first response) from generation
+        first_chunk_time = None
+        last_chunk_time = None
+        chunk_gaps = [] if extras else None
+        # Usage summed over chunks, as the token counters have always added it up
+        prompt_sum = completion_sum = total_sum = 0
+        usage_chunks = 0
+        output_tokens = 0
+        # Wrapper time spent on chunks, part of the measured call duration
+        chunk_overhead = 0.0
         
         try:
             # _call_llm_async returns an async generator yielding LlmResponse
@@ -237,8 +562,16 @@ def _call_llm_async_wrapper(original_method):
             
             if inspect.isasyncgen(result):
                 async for llm_response in result:
-                    # Extract token usage from each LlmResponse
-                    if llm_response and hasattr(llm_response, "usage_metadata"):
+                    now = time.perf_counter()
+                    if first_chunk_time is None:
+                        first_chunk_time = now
+                    elif chunk_gaps is not None:
+                        chunk_gaps.append(now - last_chunk_time)
+                    last_chunk_time = now
+                    
+                    # Extract token usage from each LlmResponse. Streamed partials report
+                    # running usage that the final aggregated response repeats
+                    if llm_response and hasattr(llm_response, "usage_metadata") and not getattr(llm_response, "partial", False):
                         usage = llm_response.usage_metadata
                         if usage:
                             if isinstance(usage, dict):
@@ -249,23 +582,14 @@ def _call_llm_async_wrapper(original_method):
                                 prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
                                 completion_tokens = getattr(usage, "candidates_token_count", 0) or 0
                                 total_tokens = getattr(usage, "total_token_count", 0) or 0
-                            
-                            # Emit token metrics with agent_name
-                            if prompt_tokens:
-                                LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="prompt").inc(prompt_tokens)
-                            if completion_tokens:
-                                LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="completion").inc(completion_tokens)
-                            if total_tokens:
-                                LLM_TOKENS.labels(model=model_name, agent_name=agent_name, type="total").inc(total_tokens)
-                            
-                            # Calculate and emit cost with agent_name
-                            pricing = MODEL_PRICING.get(model_name, DEFAULT_PRICING)
-                            prompt_cost = (prompt_tokens / 1_000_000) * pricing["prompt"]
-                            completion_cost = (completion_tokens / 1_000_000) * pricing["completion"]
-                            total_cost = prompt_cost + completion_cost
-                            if total_cost > 0:
-                                LLM_COST.labels(model=model_name, agent_name=agent_name).inc(total_cost)
+                            prompt_sum += prompt_tokens
+                            completion_sum += completion_tokens
+                            total_sum += total_tokens
+                            usage_chunks += 1
+                            # Streamed chunks report running totals; keep the largest
+                            output_tokens = max(output_tokens, completion_tokens)
                     
+                    chunk_overhead += time.perf_counter() - now
                     yield llm_response
             else:
                 yield await result
@@ -274,9 +598,23 @@ def _call_llm_async_wrapper(original_method):
             status = "error"
             raise
         finally:
-            duration = time.time() - start_time
-            LLM_REQUESTS.labels(model=model_name, agent_name=agent_name, status=status).inc()
-            LLM_DURATION.labels(model=model_name, agent_name=agent_name).observe(duration)
+            stopped = time.perf_counter()
+            duration = stopped - start_time
+            time_to_first_response = first_chunk_time - start_time if first_chunk_time is not None else None
+            # A single chunk carries the whole answer, so its generation time is the full call
+            generation = ((last_chunk_time - first_chunk_time) or duration) if first_chunk_time is not None else None
+            TRACER.end(span, duration, status, {
+                "agent_name": agent_name,
+                "completion_tokens": output_tokens,
+                "time_to_first_response": time_to_first_response,
+            })
+            exemplar = _exemplar(invocation_context, span) if extras else None
+            EVENTS.submit(LlmEvent(
+                time.time(), model_name, agent_name, status, duration, exemplar,
+                (start_time - entered) + chunk_overhead + (time.perf_counter() - stopped),
+                _session_id(invocation_context, span), time_to_first_response, generation, chunk_gaps,
+                usage_chunks, prompt_sum, completion_sum, total_sum, output_tokens,
+            ))
             
     return wrapper
 
@@ -284,14 +622,17 @@ def _call_llm_async_wrapper(original_method):
 def __call_tool_async_wrapper(original_func):
     @functools.wraps(original_func)
     async def wrapper(*args, **kwargs):
+        entered = time.perf_counter()
         # Args: (tool, args, tool_context)
         tool = args[0] if args else kwargs.get("tool")
         tool_context = args[2] if len(args) > 2 else kwargs.get("tool_context")
 
         tool_name = _safe_get_attr(tool, "name", "unknown_tool")
         agent_name = _safe_get_attr(tool_context, "agent_name", "unknown_agent") 
-        
-        start_time = time.time()
+        invocation_context = getattr(tool_context, "_invocation_context", None)
+        span = TRACER.start("tool", tool_name, invocation_context)
+        extras = TOOL_BUDGET.sample()
+        start_time = time.perf_counter()
         status = "success"
         
         try:
@@ -300,24 +641,100 @@ def __call_tool_async_wrapper(original_func):
             status = "error"
             raise
         finally:
-            duration = time.time() - start_time
-            TOOL_CALLS.labels(tool_name=tool_name, agent_name=agent_name, status=status).inc()
-            TOOL_DURATION.labels(tool_name=tool_name, agent_name=agent_name).observe(duration)
+            stopped = time.perf_counter()
+            duration = stopped - start_time
+            TRACER.end(span, duration, status, {"agent_name": agent_name})
+            exemplar = _exemplar(invocation_context, span) if extras else None
+            EVENTS.submit(ToolEvent(
+                time.time(), tool_name, agent_name, status, duration, exemplar,
+                (start_time - entered) + (time.perf_counter() - stopped),
+            ))
             
     return wrapper
 
 
 def _create_session_wrapper(original_method):
-    """Wrapper for InMemorySessionService.create_session to track new conversations."""
+    """Wrapper for session service create_session methods to track new conversations."""
     @functools.wraps(original_method)
     async def wrapper(self, *args, **kwargs):
+        start_time = time.perf_counter()
         result = await original_method(self, *args, **kwargs)
-        CONVERSATIONS_TOTAL.inc()
-        logger.info(f"New conversation started, session_id={result.id}")
+        stopped = time.perf_counter()
+        EVENTS.submit(SessionEvent(
+            time.time(), str(result.id), SESSION_BUDGET.sample(),
+            stopped - start_time, time.perf_counter() - stopped,
+        ))
         return result
     return wrapper
 
 
+# --- Metrics Endpoint ---
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples to
+# files in that directory and /metrics merges them, so a scrape sees the
+# whole server instead of whichever worker answered it. Counters and
+# histograms of exited workers are kept so totals never go backwards;
+# their live gauges (cache entries, stream subscribers) are dropped.
+_reaped_pids: set[int] = set()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_dead_workers() -> int:
+    """Remove the live gauge files of workers that are no longer running."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return 0
+    pids = set()
+    for filename in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+        stem, ext = os.path.splitext(filename)
+        pid = stem.rsplit("_", 1)[-1]
+        if ext == ".db" and pid.isdigit():
+            pids.add(int(pid))
+    dead = [pid for pid in pids - _reaped_pids if not _pid_alive(pid)]
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, PROMETHEUS_MULTIPROC_DIR)
+        _reaped_pids.add(pid)
+        logger.info(f"Removed live metrics of exited worker pid={pid}")
+    return len(dead)
+
+
+def mark_worker_exited() -> None:
+    """Drop this worker's live gauges on shutdown (multi-worker mode only)."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid(), PROMETHEUS_MULTIPROC_DIR)
+
+
+def make_metrics_app():
+    """ASGI app serving /metrics, merging all workers in multi-worker mode.
+
+    Queued instrumentation events are applied before every scrape, on a
+    worker thread so a long queue never stalls the event loop.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        app = make_asgi_app()
+    else:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, PROMETHEUS_MULTIPROC_DIR)
+        app = make_asgi_app(registry)
+        logger.info(f"Serving multi-worker metrics from {PROMETHEUS_MULTIPROC_DIR}")
+
+    async def metrics_app(scope, receive, send):
+        if scope["type"] == "http":
+            await asyncio.to_thread(EVENTS.flush)
+            # Workers killed without a clean shutdown are reaped on the next scrape
+            cleanup_dead_workers()
+        await app(scope, receive, send)
+
+    return metrics_app
+
+
 # --- Main Instrument Function ---
 
 def _register_agent_tool_metrics():
@@ -358,6 +775,13 @@ def _register_agent_tool_metrics():
                 AGENT_SUBAGENTS_INFO.labels(agent_name=agent_name, subagents=subagents_str).set(1)
                 logger.info(f"Registered subagents metric: agent={agent_name}, subagents={subagents_str}")
 
+            LOCAL_METRICS.set_agent_info(
+                agent_name,
+                str(model),
+                workflows=list(workflows),
+                subagents=[getattr(sa, 'name', 'unknown') for sa in sub_agents],
+            )
+
             # Recurse into sub_agents
             for sub_agent in sub_agents:
                 _process_agent(sub_agent, workflows)
@@ -403,6 +827,8 @@ def _emit_demo_metrics():
                 # Agent duration
                 for _ in range(data["runs"]):
                     AGENT_DURATION.labels(agent_name=agent_name).observe(data["duration"])
+                for i in range(data["runs"]):
+                    LOCAL_METRICS.record_agent_run(agent_name, "success" if i >= data["errors"] else "error", data["duration"])
                 
                 # LLM metrics
                 LLM_REQUESTS.labels(model=model, agent_name=agent_name, status="success").inc(data["runs"])
@@ -411,12 +837,18 @@ def _emit_demo_metrics():
                 LLM_TOKENS.labels(model=model, agent_name=agent_name, type="total").inc(data["runs"] * 700)
                 LLM_COST.labels(model=model, agent_name=agent_name).inc(data["cost"])
                 LLM_DURATION.labels(model=model, agent_name=agent_name).observe(data["duration"] * 0.8)
+                LOCAL_METRICS.record_llm_usage(
+                    agent_name, model, data["runs"] * 500, data["runs"] * 200, data["runs"] * 700, data["cost"]
+                )
+                for _ in range(data["runs"]):
+                    LOCAL_METRICS.record_llm_request(agent_name, model, data["duration"] * 0.8)
                 
                 # Tool metrics - emit for each tool
                 for tool in tools:
                     tool_name = getattr(tool, '__name__', str(tool))
                     TOOL_CALLS.labels(tool_name=tool_name, agent_name=agent_name, status="success").inc(1)
                     TOOL_DURATION.labels(tool_name=tool_name, agent_name=agent_name).observe(0.5)
+                    LOCAL_METRICS.record_tool_call(agent_name, tool_name, "success", 0.5)
                 
                 # Recurse
                 for sub_agent in getattr(agent, 'sub_agents', []):
@@ -426,6 +858,7 @@ def _emit_demo_metrics():
             for _ in range(10):
                 _process_agent(ORCHESTRATOR_AGENT)
             CONVERSATIONS_TOTAL.inc(5)
+            LOCAL_METRICS.record_conversation(5)
             logger.info("Initial demo metrics emitted.")
             
             # Then emit periodically in background
@@ -433,6 +866,7 @@ def _emit_demo_metrics():
                 time.sleep(30)  # Emit every 30 seconds
                 _process_agent(ORCHESTRATOR_AGENT)
                 CONVERSATIONS_TOTAL.inc(1)
+                LOCAL_METRICS.record_conversation(1)
                 logger.debug("Periodic demo metrics emitted.")
                 
         except Exception as e:
@@ -516,6 +950,15 @@ def instrument():
         _create_session_wrapper
     )
     
+    # 4.1 Same for the persistent session service (SESSION_BACKEND=sqlite)
+    if SESSION_BACKEND == "sqlite":
+        _patch_method(
+            "agent.backend.sqlite_session_service",
+            "SqliteSessionService",
+            "create_session",
+            _create_session_wrapper
+        )
+    
     logger.info("Google ADK instrumentation applied.")
 
 
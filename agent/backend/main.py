@@ -1,33 +1,58 @@
+import asyncio
 import logging
 import math
 import sys
-import time
 import uuid
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Union
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
-from prometheus_client import make_asgi_app
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from agent.backend.prometheus.agent_series import AGENT_SERIES, AgentSeriesStore
 from agent.backend.prometheus.client import PrometheusClient
+from agent.backend.prometheus.latency import build_latency_breakdown, latency_breakdown_queries, model_sketch_quantiles
+from agent.backend.prometheus.queries import (
+    QueryBuilder, with_fallback, split_by_source, AGENT_RUNS, TOOL_CALLS, LLM_COST, LLM_TOTAL_TOKENS,
+    LLM_REQUESTS, CONVERSATIONS, AGENT_DURATION, TOOL_DURATION,
+)
+from agent.backend.prometheus.snapshot import (
+    build_dashboard_snapshot, empty_snapshot, local_metric_vectors,
+    build_summary, build_agent_metrics, build_agent_detail, build_conversations,
+    quantile_queries, sketch_quantiles,
+)
+from agent.backend.prometheus.stream import SnapshotBroadcaster
+from agent.backend.prometheus.timeseries import (
+    LTTB_OVERSAMPLE, choose_step, decode_columns, decode_points, downsample_columns,
+    format_step, parse_step, rate_window, time_series_queries,
+)
 
-from agent.backend.instrument import instrument
-from agent.backend.agents.orchestrator.agent import call_agent
+from agent.backend.heavy_hitters import TOP_SESSIONS
+from agent.backend.sketches import QUANTILES
+from agent.backend.instrument import EVENTS, instrument, cleanup_dead_workers, make_metrics_app, mark_worker_exited
+from agent.backend.tracing import TRACER, TRACE_STORE_BACKEND, build_waterfall
+from agent.backend.agents.orchestrator.agent import SESSION_SERVICE, call_agent, stream_agent
 from agent.backend.copilotkit_agent import copilotkit_app, adk_copilot_agent
+from agent.backend.retry import RetriesExhausted, RetryPolicy
+from agent.backend.copilot_stream import DELTA_FRAMES_HEADER, DELTA_FRAMES_PARAM, GraphQLFrames, coalesce
 from agent.backend.types.types import (
     AgentCallRequest, QueryRequest, QueryResponse, 
     Photo, PhotoUploadResponse,
     MetricsSummary, AgentMetrics, AgentMetricsResponse,
-    TimeSeriesPoint, TimeSeriesData, TimeSeriesResponse,
+    TimeSeriesPoint, TimeSeriesData, TimeSeriesResponse, ColumnarTimeSeriesResponse,
+    AgentTimeSeriesResponse, AgentsTimeSeriesResponse,
     AgentInfo, AgentInfoResponse,
     ToolMetrics, AgentDetailMetrics, AgentDetailResponse,
-    ConversationMetrics
+    ConversationMetrics, DashboardSnapshot, LatencyBreakdownResponse,
+    TopSession, TopSessionsResponse, TraceWaterfallResponse
 )
 from agent.backend.database.photo import MockPhotoDatabase
 from agent.backend.photo.classification import classify_photo
-from config import UPLOAD_DIR
+from config import UPLOAD_DIR, TIME_SERIES_MAX_POINTS, TIME_SERIES_POINTS_LIMIT, SESSION_BACKEND
 
 
 logging.basicConfig(
@@ -38,16 +63,42 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+prometheus_client = PrometheusClient()
+metrics_broadcaster = SnapshotBroadcaster(prometheus_client)
+agent_series_store = AgentSeriesStore(prometheus_client)
+query_retry = RetryPolicy("query")
+copilotkit_retry = RetryPolicy("copilotkit")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and release them on shutdown."""
+    await prometheus_client.start()
+    cleanup_dead_workers()
+    try:
+        yield
+    finally:
+        await metrics_broadcaster.close()
+        await prometheus_client.close()
+        if SESSION_BACKEND == "sqlite":
+            # Write the sessions still queued behind
+            await SESSION_SERVICE.close()
+        EVENTS.flush()
+        TRACER.exporter.flush()
+        mark_worker_exited()
+
+
 logger.info("Initializing FastAPI application")
 app = FastAPI(
     title="Orchestrator agent API",
     description="HTTP API for the Orchestrator Agent",
     version="1.0.0",
+    lifespan=lifespan,
 )
 logger.info("FastAPI application initialized")
 
-# Create metrics endpoint
-metrics_app = make_asgi_app()
+# Create metrics endpoint (aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set)
+metrics_app = make_metrics_app()
 app.mount("/metrics", metrics_app)
 
 # Mount CopilotKit AG-UI endpoint
@@ -112,70 +163,44 @@ async def copilotkit_endpoint(request: Request):
                 logger.info(f"User question: {question}")
                 
                 # Call agent and return streaming response
+                # Clients that apply text deltas can opt out of cumulative frames
+                delta_frames = "delta" in (
+                    request.headers.get(DELTA_FRAMES_HEADER, ""),
+                    request.query_params.get(DELTA_FRAMES_PARAM, ""),
+                )
+                
                 async def generate_graphql_sse():
-                    import asyncio
                     import json as json_mod
                     
                     message_id = str(uuid.uuid4())
                     run_id = str(uuid.uuid4())
                     created_at = datetime.now().isoformat() + "Z"
+                    frames = GraphQLFrames(thread_id, run_id, message_id, created_at)
                     
                     try:
-                        # Call the agent
+                        # Forward text as the model generates it, coalesced into frames
                         logger.info("Calling agent...")
-                        response = await call_agent(
-                            AgentCallRequest(
-                                question=question,
-                                session_id=thread_id
+                        current_content = ""
+                        deltas = (
+                            part.delta
+                            async for part in copilotkit_retry.stream(
+                                lambda: stream_agent(
+                                    AgentCallRequest(
+                                        question=question,
+                                        session_id=thread_id
+                                    )
+                                )
                             )
+                            if part.delta
                         )
-                        logger.info(f"Agent response: {len(response.answer)} chars")
-                        
-                        # Stream word by word
-                        words = response.answer.split()
-                        current_content = ""
                         
-                        for word in words:
-                            current_content += word + " "
-                            chunk = {
-                                "data": {
-                                    "generateCopilotResponse": {
-                                        "threadId": thread_id,
-                                        "runId": run_id,
-                                        "messages": [{
-                                            "__typename": "TextMessageOutput",
-                                            "id": message_id,
-                                            "createdAt": created_at,
-                                            "content": current_content.strip(),
-                                            "role": "assistant"
-                                        }],
-                                        "__typename": "CopilotResponse"
-                                    }
-                                }
-                            }
-                            yield f"data: {json_mod.dumps(chunk)}\n\n"
-                            await asyncio.sleep(0.02)
+                        async for text in coalesce(deltas):
+                            current_content += text
+                            yield frames.message(text if delta_frames else current_content)
+                        logger.info(f"Agent response: {len(current_content)} chars")
                         
                         # Final message
-                        final = {
-                            "data": {
-                                "generateCopilotResponse": {
-                                    "threadId": thread_id,
-                                    "runId": run_id,
-                                    "messages": [{
-                                        "__typename": "TextMessageOutput",
-                                        "id": message_id,
-                                        "createdAt": created_at,
-                                        "content": response.answer,
-                                        "role": "assistant",
-                                        "status": {"__typename": "SuccessMessageStatus"}
-                                    }],
-                                    "status": {"__typename": "SuccessResponseStatus"},
-                                    "__typename": "CopilotResponse"
-                                }
-                            }
-                        }
-                        yield f"data: {json_mod.dumps(final)}\n\n"
+                        yield frames.final(current_content)
                         logger.info("GraphQL SSE complete")
                         
                     except Exception as e:
@@ -215,8 +240,6 @@ async def copilotkit_endpoint(request: Request):
         # Stream response using AG-UI Server-Sent Events format
         async def generate_agui_response():
             try:
-                import asyncio
-                
                 # Generate IDs
                 message_id = str(uuid.uuid4())
                 run_id = str(uuid.uuid4())
@@ -227,22 +250,22 @@ async def copilotkit_endpoint(request: Request):
                 # 2. Send text message start
                 yield f"data: {json.dumps({'type': 'text_message_start', 'messageId': message_id, 'role': 'assistant'})}\n\n"
                 
-                # Call the agent
+                # 3. Forward content deltas as the model generates them
                 logger.info("Calling agent...")
-                response = await call_agent(
-                    AgentCallRequest(
-                        question=question,
-                        session_id=thread_id
+                answer_length = 0
+                async for part in copilotkit_retry.stream(
+                    lambda: stream_agent(
+                        AgentCallRequest(
+                            question=question,
+                            session_id=thread_id
+                        )
                     )
-                )
-                logger.info(f"Agent response: {len(response.answer)} chars")
-                
-                # 3. Stream content in chunks
-                words = response.answer.split()
-                for i, word in enumerate(words):
-                    chunk = word + (" " if i < len(words) - 1 else "")
-                    yield f"data: {json.dumps({'type': 'text_message_content', 'messageId': message_id, 'delta': chunk})}\n\n"
-                    await asyncio.sleep(0.02)
+                ):
+                    if not part.delta:
+                        continue
+                    answer_length += len(part.delta)
+                    yield f"data: {json.dumps({'type': 'text_message_content', 'messageId': message_id, 'delta': part.delta})}\n\n"
+                logger.info(f"Agent response: {answer_length} chars")
                 
                 # 4. Send text message end
                 yield f"data: {json.dumps({'type': 'text_message_end', 'messageId': message_id})}\n\n"
@@ -273,8 +296,6 @@ async def copilotkit_endpoint(request: Request):
 # Instrument FastAPI
 FastAPIInstrumentor.instrument_app(app)
 
-prometheus_client = PrometheusClient()
-
 # Instrument ADK
 instrument()
 
@@ -329,21 +350,16 @@ async def query_agent(request: QueryRequest):
         logger.info(f"Session ID: {session_id}")
 
         logger.info("Calling agent with question, context, and products data")
-        while True:
-            logger.info("Invoking call_agent function")
-            agent_resp = await call_agent(
+        logger.info("Invoking call_agent function")
+        agent_resp = await query_retry.call(
+            lambda: call_agent(
                 req=AgentCallRequest(
                     question=request.question,
                     session_id=session_id,
                 ),
-            )
-
-            if not agent_resp.answer and not agent_resp.function_payloads:
-                logger.warning("Agent returned no answer and no function payloads, retrying...")
-                time.sleep(1)  # Brief pause before retrying
-            else:
-                logger.info("Agent returned a valid response")
-                break
+            ),
+            is_empty=lambda resp: not resp.answer and not resp.function_payloads,
+        )
 
         logger.info("Agent response received")
         logger.info(f"Function payloads count: {len(agent_resp.function_payloads) if agent_resp.function_payloads else 0}")
@@ -403,6 +419,10 @@ async def query_agent(request: QueryRequest):
         
         return response
         
+    except RetriesExhausted as e:
+        raise HTTPException(status_code=504 if e.reason == "deadline" else 502, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
@@ -496,9 +516,22 @@ async def get_metrics_summary(time_range: str = "1h"):
     logger.info(f"Fetching metrics summary for time_range={time_range}")
     
     try:
+        # Recent windows come straight from the in-process store
+        local_vectors = local_metric_vectors(time_range)
+        if local_vectors is not None:
+            return build_summary(local_vectors, time_range)
+        
+        # Issue all independent queries concurrently
+        q = QueryBuilder(await prometheus_client.recorded_series())
+        results = await prometheus_client.query_many({
+            "runs": f'{q.increase(AGENT_RUNS, time_range)} or vector(0)',
+            "tool_calls": f'{q.increase(TOOL_CALLS, time_range)} or vector(0)',
+            "duration": f'{q.mean(AGENT_DURATION, time_range)} or vector(0)',
+            "cost": f'{q.increase(LLM_COST, time_range)} or vector(0)',
+        })
+        
         # Query total agent runs
-        runs_query = f'sum(increase(adk_agent_runs_total[{time_range}])) or vector(0)'
-        runs_result = await prometheus_client.query(runs_query)
+        runs_result = results["runs"]
         total_runs = 0
         if runs_result and runs_result.get("result"):
             for r in runs_result["result"]:
@@ -506,8 +539,7 @@ async def get_metrics_summary(time_range: str = "1h"):
                 total_runs += int(val)
         
         # Query total tool calls
-        tool_calls_query = f'sum(increase(adk_tool_calls_total[{time_range}])) or vector(0)'
-        tool_calls_result = await prometheus_client.query(tool_calls_query)
+        tool_calls_result = results["tool_calls"]
         total_tool_calls = 0
         if tool_calls_result and tool_calls_result.get("result"):
             for r in tool_calls_result["result"]:
@@ -515,8 +547,7 @@ async def get_metrics_summary(time_range: str = "1h"):
                 total_tool_calls += int(val)
         
         # Query average agent execution duration
-        duration_query = f'avg(rate(adk_agent_run_duration_seconds_sum[{time_range}]) / rate(adk_agent_run_duration_seconds_count[{time_range}])) or vector(0)'
-        duration_result = await prometheus_client.query(duration_query)
+        duration_result = results["duration"]
         avg_duration = 0.0
         if duration_result and duration_result.get("result"):
             for r in duration_result["result"]:
@@ -526,8 +557,7 @@ async def get_metrics_summary(time_range: str = "1h"):
                     break
         
         # Query total cost from the actual cost metric
-        cost_query = f'sum(increase(adk_llm_cost_dollars_total[{time_range}])) or vector(0)'
-        cost_result = await prometheus_client.query(cost_query)
+        cost_result = results["cost"]
         total_cost = 0.0
         if cost_result and cost_result.get("result"):
             for r in cost_result["result"]:
@@ -567,11 +597,27 @@ async def get_metrics_by_agent(time_range: str = "1h"):
     logger.info(f"Fetching metrics by agent for time_range={time_range}")
     
     try:
+        # Recent windows come straight from the in-process store
+        local_vectors = local_metric_vectors(time_range)
+        if local_vectors is not None:
+            return build_agent_metrics(local_vectors, time_range)
+        
         agents_data: dict[str, AgentMetrics] = {}
         
+        # Issue all independent queries concurrently
+        q = QueryBuilder(await prometheus_client.recorded_series())
+        by_agent = ("agent_name",)
+        results = await prometheus_client.query_many({
+            "runs": q.increase(AGENT_RUNS, time_range, by_agent),
+            "duration": q.mean(AGENT_DURATION, time_range, by_agent),
+            "tool": q.increase(TOOL_CALLS, time_range, by_agent),
+            "llm_requests": q.increase(LLM_REQUESTS, time_range, by_agent),
+            "tokens": q.increase(LLM_TOTAL_TOKENS, time_range, by_agent),
+            "cost": q.increase(LLM_COST, time_range, by_agent),
+        })
+        
         # Query agent runs by agent name
-        runs_query = f'sum by (agent_name) (increase(adk_agent_runs_total[{time_range}]))'
-        runs_result = await prometheus_client.query(runs_query)
+        runs_result = results["runs"]
         if runs_result and runs_result.get("result"):
             for r in runs_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -579,8 +625,7 @@ async def get_metrics_by_agent(time_range: str = "1h"):
                     agents_data[agent_name] = AgentMetrics(agent_id=agent_name)
         
         # Query agent duration by agent name
-        duration_query = f'avg by (agent_name) (rate(adk_agent_run_duration_seconds_sum[{time_range}]) / rate(adk_agent_run_duration_seconds_count[{time_range}]))'
-        duration_result = await prometheus_client.query(duration_query)
+        duration_result = results["duration"]
         if duration_result and duration_result.get("result"):
             for r in duration_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -590,8 +635,7 @@ async def get_metrics_by_agent(time_range: str = "1h"):
                 agents_data[agent_name].duration = val
         
         # Query tool calls by agent_name
-        tool_query = f'sum by (agent_name) (increase(adk_tool_calls_total[{time_range}]))'
-        tool_result = await prometheus_client.query(tool_query)
+        tool_result = results["tool"]
         if tool_result and tool_result.get("result"):
             for r in tool_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -601,8 +645,7 @@ async def get_metrics_by_agent(time_range: str = "1h"):
                 agents_data[agent_name].tool_calls = int(val)
         
         # Query LLM requests by agent_name
-        llm_requests_query = f'sum by (agent_name) (increase(adk_llm_requests_total[{time_range}]))'
-        llm_result = await prometheus_client.query(llm_requests_query)
+        llm_result = results["llm_requests"]
         if llm_result and llm_result.get("result"):
             for r in llm_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -612,8 +655,7 @@ async def get_metrics_by_agent(time_range: str = "1h"):
                 agents_data[agent_name].llm_requests = int(val)
         
         # Query tokens by agent_name (now available with agent_name label!)
-        tokens_query = f'sum by (agent_name) (increase(adk_llm_tokens_total{{type="total"}}[{time_range}]))'
-        tokens_result = await prometheus_client.query(tokens_query)
+        tokens_result = results["tokens"]
         if tokens_result and tokens_result.get("result"):
             for r in tokens_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -623,8 +665,7 @@ async def get_metrics_by_agent(time_range: str = "1h"):
                 agents_data[agent_name].tokens = int(val)
         
         # Query cost by agent_name (now available with agent_name label!)
-        cost_query = f'sum by (agent_name) (increase(adk_llm_cost_dollars_total[{time_range}]))'
-        cost_result = await prometheus_client.query(cost_query)
+        cost_result = results["cost"]
         if cost_result and cost_result.get("result"):
             for r in cost_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -643,6 +684,82 @@ async def get_metrics_by_agent(time_range: str = "1h"):
         return AgentMetricsResponse(agents=[], time_range=time_range)
 
 
+def _apply_agent_values(
+    agents_config: dict[str, AgentDetailMetrics],
+    result: Optional[dict],
+    field: str,
+    convert: Callable[[float], Any],
+    require_positive: bool,
+) -> bool:
+    """Copy a ``by (agent_name)`` vector onto the matching known agents.
+    
+    Args:
+        agents_config: Agents keyed by name
+        result: Prometheus query result, or None if the query failed
+        field: AgentDetailMetrics attribute to set
+        convert: Conversion applied to the sample value before assignment
+        require_positive: Skip zero samples (used for windowed queries)
+        
+    Returns:
+        True if at least one agent was updated
+    """
+    found = False
+    if result and result.get("result"):
+        for r in result["result"]:
+            agent_name = r["metric"].get("agent_name", "unknown")
+            val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
+            if agent_name in agents_config and (val > 0 or not require_positive):
+                setattr(agents_config[agent_name], field, convert(val))
+                found = True
+    return found
+
+
+def _apply_tool_values(
+    agents_config: dict[str, AgentDetailMetrics],
+    result: Optional[dict],
+    field: str,
+    convert: Callable[[float], Any],
+    require_positive: bool,
+    create_missing: bool,
+) -> bool:
+    """Copy a ``by (agent_name, tool_name)`` vector onto the agents' tools.
+    
+    Args:
+        agents_config: Agents keyed by name
+        result: Prometheus query result, or None if the query failed
+        field: ToolMetrics attribute to set
+        convert: Conversion applied to the sample value before assignment
+        require_positive: Skip zero samples (used for windowed queries)
+        create_missing: Add a ToolMetrics entry for tools not seen yet
+        
+    Returns:
+        True if at least one tool was updated
+    """
+    found = False
+    if result and result.get("result"):
+        for r in result["result"]:
+            agent_name = r["metric"].get("agent_name", "unknown")
+            tool_name = r["metric"].get("tool_name", "unknown")
+            val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
+            if agent_name not in agents_config or (require_positive and val <= 0):
+                continue
+            tools = agents_config[agent_name].tools
+            tool_metrics = next((t for t in tools if t.name == tool_name), None)
+            if not tool_metrics:
+                if not create_missing:
+                    continue
+                tool_metrics = ToolMetrics(name=tool_name)
+                tools.append(tool_metrics)
+            setattr(tool_metrics, field, convert(val))
+            found = True
+    return found
+
+
+def _clamp_rate(val: float) -> float:
+    """Clamp a success ratio to at most 1.0."""
+    return min(val, 1.0)
+
+
 @app.get("/api/metrics/agents/detail", response_model=AgentDetailResponse)
 async def get_agent_detail_metrics(time_range: str = "1h"):
     """Get detailed metrics for each agent including tool breakdown.
@@ -656,12 +773,78 @@ async def get_agent_detail_metrics(time_range: str = "1h"):
     logger.info(f"Fetching detailed agent metrics for time_range={time_range}")
     
     try:
-        # First get static agent info (model, tools)
+        # Recent windows come straight from the in-process store
+        local_vectors = local_metric_vectors(time_range)
+        if local_vectors is not None:
+            return build_agent_detail(local_vectors, time_range)
+        
         agents_config: dict[str, AgentDetailMetrics] = {}
         
-        # Query agent model info
-        model_query = 'adk_agent_model_info'
-        model_result = await prometheus_client.query(model_query)
+        # Windowed queries per field, each with an instant-counter fallback that
+        # is only used when the windowed query returned nothing.
+        q = QueryBuilder(await prometheus_client.recorded_series())
+        by_agent = ("agent_name",)
+        by_tool = ("agent_name", "tool_name")
+        agent_queries = {
+            "cost": (
+                q.increase(LLM_COST, time_range, by_agent),
+                'sum by (agent_name) (adk_llm_cost_dollars_total)',
+                float,
+            ),
+            "runs": (
+                q.increase(AGENT_RUNS, time_range, by_agent),
+                'sum by (agent_name) (adk_agent_runs_total)',
+                int,
+            ),
+            "success_rate": (
+                q.success_ratio(AGENT_RUNS, time_range, by_agent),
+                'sum by (agent_name) (adk_agent_runs_total{status="success"}) / sum by (agent_name) (adk_agent_runs_total)',
+                _clamp_rate,
+            ),
+            "avg_duration": (
+                q.mean(AGENT_DURATION, time_range, by_agent),
+                'sum by (agent_name) (adk_agent_run_duration_seconds_sum) / sum by (agent_name) (adk_agent_run_duration_seconds_count)',
+                float,
+            ),
+        }
+        tool_queries = {
+            "calls": (
+                q.increase(TOOL_CALLS, time_range, by_tool),
+                'sum by (agent_name, tool_name) (adk_tool_calls_total)',
+                int,
+            ),
+            "avg_duration": (
+                q.mean(TOOL_DURATION, time_range, by_tool),
+                'sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_sum) / sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_count)',
+                float,
+            ),
+            "success_rate": (
+                q.success_ratio(TOOL_CALLS, time_range, by_tool),
+                'sum by (agent_name, tool_name) (adk_tool_calls_total{status="success"}) / sum by (agent_name, tool_name) (adk_tool_calls_total)',
+                _clamp_rate,
+            ),
+        }
+        
+        # Duration quantiles come from the in-process sketches when they cover
+        # the window, otherwise from the Prometheus histograms
+        try:
+            sketched = sketch_quantiles(parse_step(time_range))
+        except ValueError:
+            sketched = None
+        
+        # Issue the static info queries and every windowed query, each composed
+        # with its instant fallback, in one concurrent batch
+        results = await prometheus_client.query_many({
+            "model": 'adk_agent_model_info',
+            "workflows": 'adk_agent_workflows_info',
+            "subagents": 'adk_agent_subagents_info',
+            **{f"agent_{name}": with_fallback(q[0], q[1]) for name, q in agent_queries.items()},
+            **{f"tool_{name}": with_fallback(q[0], q[1]) for name, q in tool_queries.items()},
+            **(quantile_queries(time_range) if sketched is None else {}),
+        })
+        
+        # Agent model info defines the set of known agents
+        model_result = results["model"]
         if model_result and model_result.get("result"):
             for r in model_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -671,203 +854,36 @@ async def get_agent_detail_metrics(time_range: str = "1h"):
                 else:
                     agents_config[agent_name].model = model
         
-        # Query cost by agent - try increase() first, fall back to instant value
-        cost_query = f'sum by (agent_name) (increase(adk_llm_cost_dollars_total[{time_range}]))'
-        cost_result = await prometheus_client.query(cost_query)
-        cost_found = False
-        if cost_result and cost_result.get("result"):
-            for r in cost_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                val = float(r["value"][1]) if r.get("value") else 0
-                if agent_name in agents_config and val > 0:
-                    agents_config[agent_name].cost = val
-                    cost_found = True
-        # Fallback: use instant counter values if increase() returned nothing
-        if not cost_found:
-            cost_instant_query = 'sum by (agent_name) (adk_llm_cost_dollars_total)'
-            cost_instant_result = await prometheus_client.query(cost_instant_query)
-            if cost_instant_result and cost_instant_result.get("result"):
-                for r in cost_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    val = float(r["value"][1]) if r.get("value") else 0
-                    if agent_name in agents_config:
-                        agents_config[agent_name].cost = val
-        
-        # Query runs by agent - try increase() first, fall back to instant value
-        runs_query = f'sum by (agent_name) (increase(adk_agent_runs_total[{time_range}]))'
-        runs_result = await prometheus_client.query(runs_query)
-        runs_found = False
-        if runs_result and runs_result.get("result"):
-            for r in runs_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                val = float(r["value"][1]) if r.get("value") else 0
-                if agent_name in agents_config and val > 0:
-                    agents_config[agent_name].runs = int(val)
-                    runs_found = True
-        # Fallback: use instant counter values
-        if not runs_found:
-            runs_instant_query = 'sum by (agent_name) (adk_agent_runs_total)'
-            runs_instant_result = await prometheus_client.query(runs_instant_query)
-            if runs_instant_result and runs_instant_result.get("result"):
-                for r in runs_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    val = float(r["value"][1]) if r.get("value") else 0
-                    if agent_name in agents_config:
-                        agents_config[agent_name].runs = int(val)
-        
-        # Query agent success rate (successful runs / total runs from metric)
-        success_rate_query = f'sum by (agent_name) (increase(adk_agent_runs_total{{status="success"}}[{time_range}])) / sum by (agent_name) (increase(adk_agent_runs_total[{time_range}]))'
-        success_rate_result = await prometheus_client.query(success_rate_query)
-        success_rate_found = False
-        if success_rate_result and success_rate_result.get("result"):
-            for r in success_rate_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                if agent_name in agents_config and val > 0:
-                    agents_config[agent_name].success_rate = min(val, 1.0)
-                    success_rate_found = True
-        # Fallback: use instant counter values
-        if not success_rate_found:
-            success_rate_instant_query = 'sum by (agent_name) (adk_agent_runs_total{status="success"}) / sum by (agent_name) (adk_agent_runs_total)'
-            success_rate_instant_result = await prometheus_client.query(success_rate_instant_query)
-            if success_rate_instant_result and success_rate_instant_result.get("result"):
-                for r in success_rate_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                    if agent_name in agents_config:
-                        agents_config[agent_name].success_rate = min(val, 1.0)
-        
-        # Query avg duration by agent
-        duration_query = f'avg by (agent_name) (rate(adk_agent_run_duration_seconds_sum[{time_range}]) / rate(adk_agent_run_duration_seconds_count[{time_range}]))'
-        duration_result = await prometheus_client.query(duration_query)
-        duration_found = False
-        if duration_result and duration_result.get("result"):
-            for r in duration_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                if agent_name in agents_config and val > 0:
-                    agents_config[agent_name].avg_duration = val
-                    duration_found = True
-        # Fallback: use instant histogram values (sum/count gives average)
-        if not duration_found:
-            duration_instant_query = 'sum by (agent_name) (adk_agent_run_duration_seconds_sum) / sum by (agent_name) (adk_agent_run_duration_seconds_count)'
-            duration_instant_result = await prometheus_client.query(duration_instant_query)
-            if duration_instant_result and duration_instant_result.get("result"):
-                for r in duration_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                    if agent_name in agents_config:
-                        agents_config[agent_name].avg_duration = val
-        
-        # Query tool calls by agent and tool - try increase() first
-        tool_calls_query = f'sum by (agent_name, tool_name) (increase(adk_tool_calls_total[{time_range}]))'
-        tool_calls_result = await prometheus_client.query(tool_calls_query)
-        tool_calls_found = False
-        if tool_calls_result and tool_calls_result.get("result"):
-            for r in tool_calls_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                tool_name = r["metric"].get("tool_name", "unknown")
-                val = float(r["value"][1]) if r.get("value") else 0
-                if agent_name in agents_config and val > 0:
-                    tool_metrics = next(
-                        (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                        None
-                    )
-                    if not tool_metrics:
-                        tool_metrics = ToolMetrics(name=tool_name)
-                        agents_config[agent_name].tools.append(tool_metrics)
-                    tool_metrics.calls = int(val)
-                    tool_calls_found = True
-        # Fallback: use instant counter values
-        if not tool_calls_found:
-            tool_calls_instant_query = 'sum by (agent_name, tool_name) (adk_tool_calls_total)'
-            tool_calls_instant_result = await prometheus_client.query(tool_calls_instant_query)
-            if tool_calls_instant_result and tool_calls_instant_result.get("result"):
-                for r in tool_calls_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    tool_name = r["metric"].get("tool_name", "unknown")
-                    val = float(r["value"][1]) if r.get("value") else 0
-                    if agent_name in agents_config:
-                        tool_metrics = next(
-                            (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                            None
-                        )
-                        if not tool_metrics:
-                            tool_metrics = ToolMetrics(name=tool_name)
-                            agents_config[agent_name].tools.append(tool_metrics)
-                        tool_metrics.calls = int(val)
-        
-        # Query tool avg duration by agent and tool
-        tool_duration_query = f'avg by (agent_name, tool_name) (rate(adk_tool_call_duration_seconds_sum[{time_range}]) / rate(adk_tool_call_duration_seconds_count[{time_range}]))'
-        tool_duration_result = await prometheus_client.query(tool_duration_query)
-        tool_duration_found = False
-        if tool_duration_result and tool_duration_result.get("result"):
-            for r in tool_duration_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                tool_name = r["metric"].get("tool_name", "unknown")
-                val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                if agent_name in agents_config and val > 0:
-                    tool_metrics = next(
-                        (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                        None
-                    )
-                    if tool_metrics:
-                        tool_metrics.avg_duration = val
-                        tool_duration_found = True
-        # Fallback: use instant histogram values
-        if not tool_duration_found:
-            tool_duration_instant_query = 'sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_sum) / sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_count)'
-            tool_duration_instant_result = await prometheus_client.query(tool_duration_instant_query)
-            if tool_duration_instant_result and tool_duration_instant_result.get("result"):
-                for r in tool_duration_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    tool_name = r["metric"].get("tool_name", "unknown")
-                    val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                    if agent_name in agents_config:
-                        tool_metrics = next(
-                            (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                            None
-                        )
-                        if tool_metrics:
-                            tool_metrics.avg_duration = val
-        
-        # Query tool success rate by agent and tool
-        tool_success_query = f'sum by (agent_name, tool_name) (increase(adk_tool_calls_total{{status="success"}}[{time_range}])) / sum by (agent_name, tool_name) (increase(adk_tool_calls_total[{time_range}]))'
-        tool_success_result = await prometheus_client.query(tool_success_query)
-        tool_success_found = False
-        if tool_success_result and tool_success_result.get("result"):
-            for r in tool_success_result["result"]:
-                agent_name = r["metric"].get("agent_name", "unknown")
-                tool_name = r["metric"].get("tool_name", "unknown")
-                val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                if agent_name in agents_config and val > 0:
-                    tool_metrics = next(
-                        (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                        None
-                    )
-                    if tool_metrics:
-                        tool_metrics.success_rate = min(val, 1.0)
-                        tool_success_found = True
-        # Fallback: use instant counter values
-        if not tool_success_found:
-            tool_success_instant_query = 'sum by (agent_name, tool_name) (adk_tool_calls_total{status="success"}) / sum by (agent_name, tool_name) (adk_tool_calls_total)'
-            tool_success_instant_result = await prometheus_client.query(tool_success_instant_query)
-            if tool_success_instant_result and tool_success_instant_result.get("result"):
-                for r in tool_success_instant_result["result"]:
-                    agent_name = r["metric"].get("agent_name", "unknown")
-                    tool_name = r["metric"].get("tool_name", "unknown")
-                    val = _safe_float(float(r["value"][1])) if r.get("value") else 0.0
-                    if agent_name in agents_config:
-                        tool_metrics = next(
-                            (t for t in agents_config[agent_name].tools if t.name == tool_name),
-                            None
-                        )
-                        if tool_metrics:
-                            tool_metrics.success_rate = min(val, 1.0)
-        
-        # Query agent workflows info
-        workflows_query = 'adk_agent_workflows_info'
-        workflows_result = await prometheus_client.query(workflows_query)
+        # Windowed values are used when any known agent or tool has one;
+        # otherwise the instant-counter series from the same result apply.
+        # Tool calls decide which tools exist, so they are resolved before the
+        # tool duration and success rate.
+        for name, (_, _, convert) in agent_queries.items():
+            windowed, instant = split_by_source(results[f"agent_{name}"])
+            if not _apply_agent_values(agents_config, windowed, name, convert, require_positive=True):
+                _apply_agent_values(agents_config, instant, name, convert, require_positive=False)
+        
+        for name, (_, _, convert) in tool_queries.items():
+            create_missing = name == "calls"
+            windowed, instant = split_by_source(results[f"tool_{name}"])
+            if not _apply_tool_values(agents_config, windowed, name, convert, require_positive=True, create_missing=create_missing):
+                _apply_tool_values(agents_config, instant, name, convert, require_positive=False, create_missing=create_missing)
+        
+        if sketched is None:
+            for name in QUANTILES:
+                _apply_agent_values(agents_config, results[f"agent_{name}"], name, float, require_positive=True)
+                _apply_tool_values(agents_config, results[f"tool_{name}"], name, float, require_positive=True, create_missing=False)
+        else:
+            agent_quantiles, tool_quantiles = sketched
+            for agent_name, agent in agents_config.items():
+                for name, val in agent_quantiles.get(agent_name, {}).items():
+                    setattr(agent, name, val)
+                for tool in agent.tools:
+                    for name, val in tool_quantiles.get((agent_name, tool.name), {}).items():
+                        setattr(tool, name, val)
+        
+        # Agent workflows info
+        workflows_result = results["workflows"]
         if workflows_result and workflows_result.get("result"):
             for r in workflows_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -875,9 +891,8 @@ async def get_agent_detail_metrics(time_range: str = "1h"):
                 if agent_name in agents_config and workflows_str:
                     agents_config[agent_name].workflows = workflows_str.split(",")
         
-        # Query agent subagents info
-        subagents_query = 'adk_agent_subagents_info'
-        subagents_result = await prometheus_client.query(subagents_query)
+        # Agent subagents info
+        subagents_result = results["subagents"]
         if subagents_result and subagents_result.get("result"):
             for r in subagents_result["result"]:
                 agent_name = r["metric"].get("agent_name", "unknown")
@@ -895,78 +910,130 @@ async def get_agent_detail_metrics(time_range: str = "1h"):
         return AgentDetailResponse(agents=[], time_range=time_range)
 
 
-@app.get("/api/metrics/time-series", response_model=TimeSeriesResponse)
-async def get_metrics_time_series(hours: int = 24, step: str = "5m"):
+@app.get("/api/metrics/dashboard", response_model=DashboardSnapshot)
+async def get_dashboard_snapshot(time_range: str = "1h"):
+    """Get summary, per-agent, agent detail and conversation metrics in one payload.
+    
+    Overlapping queries of the individual endpoints are planned once and
+    every total is derived from the grouped vectors in-process.
+    
+    Args:
+        time_range: Time range string (e.g., '1h', '24h', '7d')
+        
+    Returns:
+        DashboardSnapshot with the four dashboard responses
+    """
+    logger.info(f"Fetching dashboard snapshot for time_range={time_range}")
+    
+    try:
+        return await build_dashboard_snapshot(prometheus_client, time_range)
+    except Exception as e:
+        logger.error(f"Error fetching dashboard snapshot: {e}", exc_info=True)
+        return empty_snapshot(time_range)
+
+
+@app.get("/api/metrics/stream")
+async def stream_metrics(time_range: str = "1h"):
+    """Stream dashboard snapshots as server-sent events.
+    
+    Snapshots are computed once per scrape interval for each distinct time
+    range and shared by all subscribers. The first ``snapshot`` event holds
+    every section of DashboardSnapshot; later events only hold the sections
+    that changed.
+    
+    Args:
+        time_range: Time range string (e.g., '1h', '24h', '7d')
+        
+    Returns:
+        StreamingResponse of ``text/event-stream`` frames
+    """
+    logger.info(f"Metrics stream subscribed for time_range={time_range}")
+    return StreamingResponse(
+        metrics_broadcaster.subscribe(time_range),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+def _resolve_step(hours: int, step: Optional[str], max_points: int) -> int:
+    """Query step in seconds for a range, bounded by the point budget."""
+    try:
+        requested = parse_step(step) if step else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    budget = min(max(max_points, 3), TIME_SERIES_POINTS_LIMIT)
+    return choose_step(hours * 3600, budget, requested)
+
+
+@app.get("/api/metrics/time-series", response_model=Union[TimeSeriesResponse, ColumnarTimeSeriesResponse])
+async def get_metrics_time_series(
+    hours: int = 24,
+    step: Optional[str] = None,
+    max_points: int = TIME_SERIES_MAX_POINTS,
+    downsample: Optional[str] = None,
+    format: str = "points",
+):
     """Get time series data for metrics.
     
+    The step is chosen by the server so that each series has at most
+    ``max_points`` points; a requested step is only used if it fits. The
+    rate() window follows the step.
+    
     Args:
         hours: Number of hours of history to fetch
-        step: Resolution step (e.g., '1m', '5m', '15m')
+        step: Preferred resolution step (e.g., '1m', '5m', '15m')
+        max_points: Point budget per series (capped by TIME_SERIES_POINTS_LIMIT)
+        downsample: 'lttb' to fetch at a finer step and reduce to the budget
+            with Largest-Triangle-Three-Buckets, keeping peaks
+        format: 'points' for a list of timestamp/value objects per metric, or
+            'columnar' for one shared epoch-timestamp array plus a value
+            array per metric
         
     Returns:
-        TimeSeriesResponse with time series for each metric
+        TimeSeriesResponse, or ColumnarTimeSeriesResponse for format='columnar',
+        with the step actually used
     """
-    logger.info(f"Fetching time series metrics for hours={hours}, step={step}")
+    lttb = downsample == "lttb"
+    budget = min(max(max_points, 3), TIME_SERIES_POINTS_LIMIT)
+    step_seconds = _resolve_step(hours, step, budget * LTTB_OVERSAMPLE if lttb else budget)
+    step = format_step(step_seconds)
+    logger.info(f"Fetching time series metrics for hours={hours}, step={step}, downsample={downsample}, format={format}")
+    columnar = format == "columnar"
     
     try:
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=hours)
         
-        time_series = TimeSeriesData()
-        
-        # Tokens over time (using type="total" to avoid double counting)
-        tokens_query = 'sum(rate(adk_llm_tokens_total{type="total"}[5m])) or vector(0)'
-        tokens_result = await prometheus_client.query_range(tokens_query, start_time, end_time, step)
-        if tokens_result and tokens_result.get("result"):
-            for series in tokens_result["result"]:
-                for ts, val in series.get("values", []):
-                    time_series.tokens.append(TimeSeriesPoint(
-                        timestamp=datetime.fromtimestamp(ts).isoformat(),
-                        value=float(val)
-                    ))
-        
-        # Tool calls over time
-        tool_query = 'sum(rate(adk_tool_calls_total[5m])) or vector(0)'
-        tool_result = await prometheus_client.query_range(tool_query, start_time, end_time, step)
-        if tool_result and tool_result.get("result"):
-            for series in tool_result["result"]:
-                for ts, val in series.get("values", []):
-                    time_series.tool_calls.append(TimeSeriesPoint(
-                        timestamp=datetime.fromtimestamp(ts).isoformat(),
-                        value=float(val)
-                    ))
-        
-        # Duration over time
-        duration_query = 'avg(rate(adk_agent_run_duration_seconds_sum[5m]) / rate(adk_agent_run_duration_seconds_count[5m])) or vector(0)'
-        duration_result = await prometheus_client.query_range(duration_query, start_time, end_time, step)
-        if duration_result and duration_result.get("result"):
-            for series in duration_result["result"]:
-                for ts, val in series.get("values", []):
-                    val_float = float(val) if val != "NaN" else 0.0
-                    time_series.duration.append(TimeSeriesPoint(
-                        timestamp=datetime.fromtimestamp(ts).isoformat(),
-                        value=val_float
-                    ))
-        
-        # Cost over time (from actual cost metric)
-        cost_query = 'sum(rate(adk_llm_cost_dollars_total[5m])) or vector(0)'
-        cost_result = await prometheus_client.query_range(cost_query, start_time, end_time, step)
-        if cost_result and cost_result.get("result"):
-            for series in cost_result["result"]:
-                for ts, val in series.get("values", []):
-                    time_series.cost.append(TimeSeriesPoint(
-                        timestamp=datetime.fromtimestamp(ts).isoformat(),
-                        value=float(val) if val != "NaN" else 0.0
-                    ))
+        # Issue all range queries concurrently
+        queries = time_series_queries(rate_window(step_seconds))
+        results = await prometheus_client.query_range_many(queries, start_time, end_time, step)
+        
+        if columnar:
+            timestamps, series = decode_columns(results)
+            if lttb:
+                timestamps, series = downsample_columns(timestamps, series, budget)
+            return ColumnarTimeSeriesResponse(
+                timestamps=timestamps,
+                series=series,
+                hours=hours,
+                step=step
+            )
         
+        threshold = budget if lttb else None
         return TimeSeriesResponse(
-            time_series=time_series,
+            time_series=TimeSeriesData(**{key: decode_points(result, threshold) for key, result in results.items()}),
             hours=hours,
             step=step
         )
         
     except Exception as e:
         logger.error(f"Error fetching time series: {e}", exc_info=True)
+        if columnar:
+            return ColumnarTimeSeriesResponse(hours=hours, step=step)
         return TimeSeriesResponse(
             time_series=TimeSeriesData(),
             hours=hours,
@@ -974,6 +1041,153 @@ async def get_metrics_time_series(hours: int = 24, step: str = "5m"):
         )
 
 
+@app.get("/api/metrics/time-series/agents", response_model=AgentsTimeSeriesResponse)
+async def get_agents_time_series(hours: int = 24, step: str = "5m", max_points: int = TIME_SERIES_MAX_POINTS):
+    """Get time series metrics for every agent.
+    
+    Each point holds the total (or average, for durations) over the
+    preceding step.
+    
+    Args:
+        hours: Number of hours of history to fetch
+        step: Resolution step (e.g., '5m', '1h', '1d'), coarsened if needed to
+            stay within max_points
+        max_points: Point budget per series
+        
+    Returns:
+        AgentsTimeSeriesResponse with one shared timestamp array and the
+        series of each agent
+    """
+    step = format_step(_resolve_step(hours, step, max_points))
+    logger.info(f"Fetching time series for all agents for hours={hours}, step={step}")
+    
+    try:
+        window = await agent_series_store.get(hours, step)
+        return AgentsTimeSeriesResponse(
+            timestamps=window.timestamps,
+            agents=window.agents,
+            hours=hours,
+            step=step
+        )
+        
+    except Exception as e:
+        logger.error(f"Error fetching agents time series: {e}", exc_info=True)
+        return AgentsTimeSeriesResponse(hours=hours, step=step)
+
+
+@app.get("/api/metrics/time-series/agent/{agent_name}", response_model=AgentTimeSeriesResponse)
+async def get_agent_time_series(agent_name: str, hours: int = 24, step: str = "5m", max_points: int = TIME_SERIES_MAX_POINTS):
+    """Get time series metrics for a single agent.
+    
+    Served from the same per-window split as the all-agents endpoint, so
+    looking at several agents over one window queries Prometheus once.
+    
+    Args:
+        agent_name: Name of the agent
+        hours: Number of hours of history to fetch
+        step: Resolution step (e.g., '5m', '1h', '1d'), coarsened if needed to
+            stay within max_points
+        max_points: Point budget per series
+        
+    Returns:
+        AgentTimeSeriesResponse; agents without data in the window get zeros
+    """
+    step = format_step(_resolve_step(hours, step, max_points))
+    logger.info(f"Fetching time series for agent={agent_name} for hours={hours}, step={step}")
+    
+    try:
+        window = await agent_series_store.get(hours, step)
+        series = window.agents.get(agent_name)
+        if series is None:
+            zeros = [0.0] * len(window.timestamps)
+            series = {name: zeros for name in AGENT_SERIES}
+            series["success_rate"] = [1.0] * len(window.timestamps)
+        return AgentTimeSeriesResponse(
+            agent_name=agent_name,
+            timestamps=window.timestamps,
+            series=series,
+            hours=hours,
+            step=step
+        )
+        
+    except Exception as e:
+        logger.error(f"Error fetching time series for agent {agent_name}: {e}", exc_info=True)
+        # Same columns as a successful response, so clients can index them unguarded
+        return AgentTimeSeriesResponse(
+            agent_name=agent_name,
+            series={name: [] for name in AGENT_SERIES},
+            hours=hours,
+            step=step
+        )
+
+
+@app.get("/api/metrics/latency-breakdown", response_model=LatencyBreakdownResponse)
+async def get_latency_breakdown(time_range: str = "1h"):
+    """Get LLM latency split into time to first response and generation.
+    
+    Args:
+        time_range: Time range string (e.g., '1h', '24h', '7d')
+        
+    Returns:
+        LatencyBreakdownResponse with one row per (model, agent)
+    """
+    logger.info(f"Fetching LLM latency breakdown for time_range={time_range}")
+    
+    try:
+        # Total duration quantiles come from the in-process sketches when they cover the window
+        try:
+            sketched = model_sketch_quantiles(parse_step(time_range))
+        except ValueError:
+            sketched = None
+        results = await prometheus_client.query_many(latency_breakdown_queries(time_range, duration_quantiles=sketched is None))
+        return build_latency_breakdown(results, time_range, sketched)
+    except Exception as e:
+        logger.error(f"Error fetching latency breakdown: {e}", exc_info=True)
+        return LatencyBreakdownResponse(time_range=time_range)
+
+
+@app.get("/api/metrics/top-sessions", response_model=TopSessionsResponse)
+async def get_top_sessions(limit: int = 10):
+    """Get the sessions driving the most LLM cost, tokens and latency.
+    
+    Args:
+        limit: Sessions returned per metric
+        
+    Returns:
+        TopSessionsResponse with one ranked list per metric; empty lists and
+        enabled=False in multi-worker mode
+    """
+    limit = max(1, min(limit, TOP_SESSIONS.capacity))
+    lists = {
+        metric: [
+            TopSession(session_id=session_id, value=value, error=error)
+            for session_id, value, error in TOP_SESSIONS.top(metric, limit)
+        ]
+        for metric in TOP_SESSIONS.METRICS
+    }
+    return TopSessionsResponse(
+        **lists, capacity=TOP_SESSIONS.capacity, since=TOP_SESSIONS.started_at, enabled=TOP_SESSIONS.enabled
+    )
+
+
+@app.get("/api/traces/{session_id}", response_model=TraceWaterfallResponse)
+async def get_session_trace(session_id: str):
+    """Get the latency waterfall of a session's agent runs, LLM calls and tool calls.
+    
+    Args:
+        session_id: ADK session ID, or the session ID sent to /query (the
+            latest ADK session of that user is returned)
+        
+    Returns:
+        TraceWaterfallResponse with spans in depth-first order
+    """
+    # The SQLite store blocks, so read off the event loop
+    spans = await asyncio.to_thread(TRACE_STORE_BACKEND.spans_for_session, session_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"No trace found for session {session_id}")
+    return build_waterfall(session_id, spans)
+
+
 @app.get("/api/agents/info", response_model=AgentInfoResponse)
 async def get_agents_info():
     """Get static configuration info for all agents (tools, models, workflows).
@@ -1042,9 +1256,22 @@ async def get_conversation_metrics(time_range: str = "1h"):
     logger.info(f"Fetching conversation metrics for time_range={time_range}")
     
     try:
+        # Recent windows come straight from the in-process store
+        local_vectors = local_metric_vectors(time_range)
+        if local_vectors is not None:
+            return build_conversations(local_vectors, time_range)
+        
+        # Issue all independent queries concurrently
+        q = QueryBuilder(await prometheus_client.recorded_series())
+        results = await prometheus_client.query_many({
+            "conversations": f'{q.increase(CONVERSATIONS, time_range)} or vector(0)',
+            "cost": f'{q.increase(LLM_COST, time_range)} or vector(0)',
+            "runs": f'{q.increase(AGENT_RUNS, time_range)} or vector(0)',
+            "tool_calls": f'{q.increase(TOOL_CALLS, time_range)} or vector(0)',
+        })
+        
         # Query total conversations
-        conversations_query = f'sum(increase(adk_conversations_total[{time_range}])) or vector(0)'
-        conversations_result = await prometheus_client.query(conversations_query)
+        conversations_result = results["conversations"]
         total_conversations = 0
         if conversations_result and conversations_result.get("result"):
             for r in conversations_result["result"]:
@@ -1052,8 +1279,7 @@ async def get_conversation_metrics(time_range: str = "1h"):
                 total_conversations = int(val)
         
         # Query total cost
-        cost_query = f'sum(increase(adk_llm_cost_dollars_total[{time_range}])) or vector(0)'
-        cost_result = await prometheus_client.query(cost_query)
+        cost_result = results["cost"]
         total_cost = 0.0
         if cost_result and cost_result.get("result"):
             for r in cost_result["result"]:
@@ -1061,8 +1287,7 @@ async def get_conversation_metrics(time_range: str = "1h"):
                 total_cost = val
         
         # Query total agent runs
-        runs_query = f'sum(increase(adk_agent_runs_total[{time_range}])) or vector(0)'
-        runs_result = await prometheus_client.query(runs_query)
+        runs_result = results["runs"]
         total_runs = 0
         if runs_result and runs_result.get("result"):
             for r in runs_result["result"]:
@@ -1070,8 +1295,7 @@ async def get_conversation_metrics(time_range: str = "1h"):
                 total_runs = int(val)
         
         # Query total tool calls
-        tool_calls_query = f'sum(increase(adk_tool_calls_total[{time_range}])) or vector(0)'
-        tool_calls_result = await prometheus_client.query(tool_calls_query)
+        tool_calls_result = results["tool_calls"]
         total_tool_calls = 0
         if tool_calls_result and tool_calls_result.get("result"):
             for r in tool_calls_result["result"]:
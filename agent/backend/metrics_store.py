@@ -0,0 +1,250 @@
+"""
+In-Process Metrics Store
+========================
+Per-minute ring buffers fed by the ADK instrumentation wrappers, so the
+metrics endpoints can answer recent windows without a round trip to
+Prometheus.
+
+Every series (one per agent, per (agent, tool) and per (agent, model))
+holds running lifetime totals and one slot per minute for the last
+``LOCAL_METRICS_WINDOW_MINUTES`` minutes. Slots are fixed-size ``array``
+buffers allocated once per series and the number of series is capped, so
+memory is bounded by ``max_series * minutes * fields * 8`` bytes.
+
+The store only answers a window when it has seen all of it: the process
+must have been up for the whole window and no series may have been
+dropped because of the cap. Anything else goes to Prometheus.
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+from prometheus_client import Gauge
+
+from config import (
+    LOCAL_METRICS_ENABLED,
+    LOCAL_METRICS_WINDOW_MINUTES,
+    LOCAL_METRICS_MAX_SERIES,
+)
+
+logger = logging.getLogger("adk_metrics")
+
+
+LOCAL_METRICS_SERIES = Gauge(
+    "adk_local_metrics_series",
+    "Series held by the in-process metrics store",
+    [],
+    multiprocess_mode="livesum"
+)
+LOCAL_METRICS_BYTES = Gauge(
+    "adk_local_metrics_bytes",
+    "Memory allocated to in-process metrics store buffers",
+    [],
+    multiprocess_mode="livesum"
+)
+
+# Fields per series kind, in buffer order
+AGENT_FIELDS = ("runs_success", "runs_error", "duration_sum", "duration_count")
+TOOL_FIELDS = ("calls_success", "calls_error", "duration_sum", "duration_count")
+MODEL_FIELDS = (
+    "requests", "prompt_tokens", "completion_tokens", "total_tokens",
+    "cost", "duration_sum", "duration_count",
+)
+CONVERSATION_FIELDS = ("conversations",)
+
+KIND_FIELDS = {
+    "agent": AGENT_FIELDS,
+    "tool": TOOL_FIELDS,
+    "model": MODEL_FIELDS,
+    "conversation": CONVERSATION_FIELDS,
+}
+
+
+class _MinuteSeries:
+    """Lifetime totals plus a ring of the totals at the start of each minute.
+
+    A window total is the current lifetime total minus the total at the
+    start of the window's first minute, so reads are one slot lookup per
+    series. Writes only touch the ring on the first event of a minute,
+    which also fills the slots of the minutes without events since the
+    previous one (at most one ring's worth, with slice assignments).
+    """
+
+    __slots__ = ("size", "starts", "lifetime", "first_minute", "last_minute")
+
+    def __init__(self, fields: int, size: int):
+        self.size = size
+        self.starts = [array("d", [0.0]) * size for _ in range(fields)]
+        self.lifetime = [0.0] * fields
+        self.first_minute = -1
+        self.last_minute = -1
+
+    def add(self, minute: int, increments: Sequence[Tuple[int, float]]) -> None:
+        """Add values at ``minute``, opening its slot on the first event of the minute."""
+        if minute > self.last_minute:
+            self._open(minute)
+        for field, value in increments:
+            self.lifetime[field] += value
+
+    def _open(self, minute: int) -> None:
+        if self.first_minute < 0:
+            self.first_minute = minute
+            first = minute
+        else:
+            first = max(self.last_minute + 1, minute - self.size + 1)
+        self.last_minute = minute
+        if first == minute:
+            slot = minute % self.size
+            for field, column in enumerate(self.starts):
+                column[slot] = self.lifetime[field]
+            return
+        # Slots first..minute all start at the current totals; split where the ring wraps
+        start, count = first % self.size, minute - first + 1
+        head = min(count, self.size - start)
+        for field, column in enumerate(self.starts):
+            value = array("d", [self.lifetime[field]])
+            column[start:start + head] = value * head
+            if count > head:
+                column[:count - head] = value * (count - head)
+
+    def window(self, first_minute: int) -> List[float]:
+        """Totals per field since the start of ``first_minute``."""
+        if self.last_minute < first_minute:
+            return [0.0] * len(self.lifetime)
+        first_minute = max(first_minute, self.last_minute - self.size + 1)
+        if first_minute <= self.first_minute:
+            return list(self.lifetime)
+        slot = first_minute % self.size
+        return [total - column[slot] for total, column in zip(self.lifetime, self.starts)]
+
+    def nbytes(self) -> int:
+        return sum(c.itemsize * len(c) for c in self.starts)
+
+
+class LocalMetricsStore:
+    """Bounded per-minute aggregates of agent runs, LLM calls and tool calls.
+
+    Args:
+        minutes: Ring size, i.e. the longest window the store can answer
+        max_series: Cap on series across all kinds
+        enabled: When False, recording is a no-op and no window is covered
+    """
+
+    def __init__(
+        self,
+        minutes: int = LOCAL_METRICS_WINDOW_MINUTES,
+        max_series: int = LOCAL_METRICS_MAX_SERIES,
+        enabled: bool = LOCAL_METRICS_ENABLED,
+    ):
+        self.minutes = minutes
+        self.max_series = max_series
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.dropped_series = 0
+        self._series: Dict[Tuple[str, Tuple[str, ...]], _MinuteSeries] = {}
+        self._lock = threading.Lock()
+        self.models: Dict[str, str] = {}
+        self.workflows: Dict[str, List[str]] = {}
+        self.subagents: Dict[str, List[str]] = {}
+
+    # --- Recording ---
+
+    def _record(self, kind: str, key: Tuple[str, ...], increments: Sequence[Tuple[int, float]], now: Optional[float]) -> None:
+        if not self.enabled:
+            return
+        minute = int((now if now is not None else time.time()) // 60)
+        with self._lock:
+            series = self._series.get((kind, key))
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    if self.dropped_series == 0:
+                        logger.warning(
+                            f"Local metrics store is full ({self.max_series} series); "
+                            f"serving all windows from Prometheus"
+                        )
+                    self.dropped_series += 1
+                    return
+                series = _MinuteSeries(len(KIND_FIELDS[kind]), self.minutes)
+                self._series[(kind, key)] = series
+                LOCAL_METRICS_SERIES.set(len(self._series))
+                LOCAL_METRICS_BYTES.inc(series.nbytes())
+            series.add(minute, increments)
+
+    def record_agent_run(self, agent_name: str, status: str, duration: float, now: Optional[float] = None) -> None:
+        """One finished agent run."""
+        self._record("agent", (agent_name,), ((0 if status == "success" else 1, 1.0), (2, duration), (3, 1.0)), now)
+
+    def record_llm_request(self, agent_name: str, model: str, duration: float, now: Optional[float] = None) -> None:
+        """One finished LLM request."""
+        self._record("model", (agent_name, model), ((0, 1.0), (5, duration), (6, 1.0)), now)
+
+    def record_llm_usage(
+        self,
+        agent_name: str,
+        model: str,
+        prompt_tokens: float,
+        completion_tokens: float,
+        total_tokens: float,
+        cost: float,
+        now: Optional[float] = None,
+    ) -> None:
+        """Token usage and cost reported by one LLM response."""
+        self._record(
+            "model", (agent_name, model),
+            ((1, prompt_tokens), (2, completion_tokens), (3, total_tokens), (4, cost)),
+            now,
+        )
+
+    def record_tool_call(self, agent_name: str, tool_name: str, status: str, duration: float, now: Optional[float] = None) -> None:
+        """One finished tool call."""
+        self._record("tool", (agent_name, tool_name), ((0 if status == "success" else 1, 1.0), (2, duration), (3, 1.0)), now)
+
+    def record_conversation(self, count: float = 1.0, now: Optional[float] = None) -> None:
+        """New conversations (sessions) started."""
+        self._record("conversation", (), ((0, count),), now)
+
+    def set_agent_info(
+        self,
+        agent_name: str,
+        model: str,
+        workflows: Optional[List[str]] = None,
+        subagents: Optional[List[str]] = None,
+    ) -> None:
+        """Static agent info, mirroring the ``adk_agent_*_info`` gauges."""
+        self.models[agent_name] = model
+        if workflows:
+            self.workflows[agent_name] = workflows
+        if subagents:
+            self.subagents[agent_name] = subagents
+
+    # --- Reading ---
+
+    def covers(self, window_seconds: float, now: Optional[float] = None) -> bool:
+        """Whether the store holds every event of the trailing window."""
+        if not self.enabled or self.dropped_series or window_seconds > self.minutes * 60:
+            return False
+        now = now if now is not None else time.time()
+        return now - self.started_at >= window_seconds
+
+    def window_totals(self, kind: str, window_seconds: float, now: Optional[float] = None) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Per-key field totals over the trailing window, including the current minute."""
+        now = now if now is not None else time.time()
+        last_minute = int(now // 60)
+        first_minute = last_minute - max(int(math.ceil(window_seconds / 60)), 1) + 1
+        fields = KIND_FIELDS[kind]
+        with self._lock:
+            items = [(key[1], series.window(first_minute)) for key, series in self._series.items() if key[0] == kind]
+        return {key: dict(zip(fields, totals)) for key, totals in items}
+
+    def lifetime_totals(self, kind: str) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Per-key field totals since the store was created."""
+        fields = KIND_FIELDS[kind]
+        with self._lock:
+            items = [(key[1], list(series.lifetime)) for key, series in self._series.items() if key[0] == kind]
+        return {key: dict(zip(fields, totals)) for key, totals in items}
+
+
+# Process-wide store fed by agent/backend/instrument.py
+LOCAL_METRICS = LocalMetricsStore()
@@ -0,0 +1,97 @@
+"""
+Instrumentation Overhead Budget
+===============================
+Keeps the cost of the instrumentation wrappers under a fixed fraction of
+the time spent in the calls they wrap.
+
+Each wrapper measures the time it spends in its own code and reports it
+with the call's duration. Every ``update_every`` calls the budget compares
+the smoothed overhead ratio with ``INSTRUMENTATION_OVERHEAD_BUDGET`` and
+halves or doubles the sample rate of the optional extras (exemplars,
+per-chunk gap histograms, logging). Counters and duration histograms are
+always updated, so totals stay exact; only the extras are sampled.
+"""
+import random
+from prometheus_client import Gauge
+
+from config import INSTRUMENTATION_OVERHEAD_BUDGET, INSTRUMENTATION_MIN_SAMPLE_RATE
+
+
+INSTRUMENTATION_OVERHEAD = Gauge(
+    "adk_instrumentation_overhead_seconds",
+    "Smoothed instrumentation time spent per wrapped call",
+    ["wrapper"],
+    multiprocess_mode="livemax"
+)
+INSTRUMENTATION_OVERHEAD_RATIO = Gauge(
+    "adk_instrumentation_overhead_ratio",
+    "Smoothed instrumentation time as a fraction of wrapped call time",
+    ["wrapper"],
+    multiprocess_mode="livemax"
+)
+INSTRUMENTATION_SAMPLE_RATE = Gauge(
+    "adk_instrumentation_sample_rate",
+    "Fraction of calls recording optional extras (exemplars, chunk gaps, logs)",
+    ["wrapper"],
+    multiprocess_mode="livemin"
+)
+
+
+class OverheadBudget:
+    """Adaptive sample rate for one wrapper's optional extras.
+
+    Args:
+        wrapper: Label value for the self-metrics
+        budget: Target overhead as a fraction of call time
+        min_rate: Lowest sample rate the extras are reduced to
+        alpha: Weight of the newest call in the smoothed averages
+        update_every: Calls between sample rate and gauge updates
+    """
+
+    __slots__ = (
+        "budget", "min_rate", "alpha", "update_every", "sample_rate",
+        "_overhead", "_duration", "_calls", "_overhead_gauge", "_ratio_gauge", "_rate_gauge",
+    )
+
+    def __init__(
+        self,
+        wrapper: str,
+        budget: float = INSTRUMENTATION_OVERHEAD_BUDGET,
+        min_rate: float = INSTRUMENTATION_MIN_SAMPLE_RATE,
+        alpha: float = 0.05,
+        update_every: int = 64,
+    ):
+        self.budget = budget
+        self.min_rate = min_rate
+        self.alpha = alpha
+        self.update_every = update_every
+        self.sample_rate = 1.0
+        self._overhead = 0.0
+        self._duration = 0.0
+        self._calls = 0
+        self._overhead_gauge = INSTRUMENTATION_OVERHEAD.labels(wrapper=wrapper)
+        self._ratio_gauge = INSTRUMENTATION_OVERHEAD_RATIO.labels(wrapper=wrapper)
+        self._rate_gauge = INSTRUMENTATION_SAMPLE_RATE.labels(wrapper=wrapper)
+        self._rate_gauge.set(1.0)
+
+    def sample(self) -> bool:
+        """Whether this call should record the optional extras."""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, overhead: float, duration: float) -> None:
+        """Account one call: wrapper time and total call time, in seconds."""
+        self._overhead += self.alpha * (overhead - self._overhead)
+        self._duration += self.alpha * (duration - self._duration)
+        self._calls += 1
+        if self._calls % self.update_every == 0:
+            self._update()
+
+    def _update(self) -> None:
+        ratio = self._overhead / self._duration if self._duration > 0 else 0.0
+        if ratio > self.budget:
+            self.sample_rate = max(self.min_rate, self.sample_rate / 2)
+        elif ratio < self.budget / 2:
+            self.sample_rate = min(1.0, self.sample_rate * 2)
+        self._overhead_gauge.set(self._overhead)
+        self._ratio_gauge.set(ratio)
+        self._rate_gauge.set(self.sample_rate)
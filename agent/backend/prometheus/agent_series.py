@@ -0,0 +1,162 @@
+"""Per-agent time series split from one ``sum by (agent_name)`` query per metric.
+
+Every metric is fetched with a single range query grouped by agent, so the
+cost of a window does not grow with the number of agents. The decoded split
+is kept per aligned window: opening the modal of another agent, or the
+bulk view, for the same window reuses it instead of querying again.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.backend.prometheus.client import PrometheusClient
+from agent.backend.prometheus.timeseries import parse_step, rate_window
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+logger = logging.getLogger(__name__)
+
+
+# Series returned for each agent, in response order
+AGENT_SERIES = ("cost", "tokens", "runs", "success_rate", "cost_per_run", "avg_duration", "tool_calls")
+
+# Distinct (hours, step) windows kept decoded at once
+MAX_WINDOWS = 32
+
+
+def agent_series_queries(step: str) -> Dict[str, str]:
+    """Range queries for all agents; each point covers the preceding step.
+
+    Rates are taken over ``rate_window`` of the step, which is wider than
+    steps under four scrape intervals; counts are the rate times the step,
+    so each point is still the amount per step.
+    """
+    step_seconds = parse_step(step)
+    window = rate_window(step_seconds)
+    return {
+        "cost": f'sum by (agent_name) (rate(adk_llm_cost_dollars_total[{window}])) * {step_seconds}',
+        "tokens": f'sum by (agent_name) (rate(adk_llm_tokens_total{{type="total"}}[{window}])) * {step_seconds}',
+        "runs": f'sum by (agent_name, status) (rate(adk_agent_runs_total[{window}])) * {step_seconds}',
+        "avg_duration": f'avg by (agent_name) (rate(adk_agent_run_duration_seconds_sum[{window}]) / rate(adk_agent_run_duration_seconds_count[{window}]))',
+        "tool_calls": f'sum by (agent_name) (rate(adk_tool_calls_total[{window}])) * {step_seconds}',
+    }
+
+
+@dataclass
+class AgentSeriesWindow:
+    """Decoded per-agent series for one aligned query window."""
+    timestamps: List[float] = field(default_factory=list)
+    agents: Dict[str, Dict[str, List[float]]] = field(default_factory=dict)
+    complete: bool = True  # False if any query failed; such windows are not reused
+
+
+def _value(raw: str) -> float:
+    val = float(raw)
+    if math.isnan(val) or math.isinf(val):
+        return 0.0
+    return val
+
+
+def split_by_agent(results: Dict[str, Optional[Dict[str, Any]]]) -> AgentSeriesWindow:
+    """Split grouped range results into aligned per-agent columns.
+
+    Runs are grouped by status as well, which gives both the run count and
+    the success rate from the same query. Steps without runs report a
+    success rate of 1.0, matching the AgentDetailMetrics default.
+    """
+    series: Dict[Tuple[str, str], List[List[Any]]] = {}
+    for key, result in results.items():
+        if not result or not result.get("result"):
+            continue
+        for s in result["result"]:
+            agent_name = s["metric"].get("agent_name", "unknown")
+            if key == "runs":
+                key_name = "runs_success" if s["metric"].get("status") == "success" else "runs_other"
+                series.setdefault((agent_name, key_name), []).extend(s.get("values", []))
+            else:
+                series[(agent_name, key)] = s.get("values", [])
+
+    timestamps = sorted({ts for values in series.values() for ts, _ in values})
+    index = {ts: i for i, ts in enumerate(timestamps)}
+    size = len(timestamps)
+
+    columns: Dict[Tuple[str, str], List[float]] = {}
+    for key, values in series.items():
+        column = [0.0] * size
+        for ts, val in values:
+            column[index[ts]] += _value(val)
+        columns[key] = column
+
+    zeros = [0.0] * size
+    agents: Dict[str, Dict[str, List[float]]] = {}
+    for agent_name in sorted({agent for agent, _ in series}):
+        success = columns.get((agent_name, "runs_success"), zeros)
+        other = columns.get((agent_name, "runs_other"), zeros)
+        cost = columns.get((agent_name, "cost"), zeros)
+        runs = [s + o for s, o in zip(success, other)]
+        agents[agent_name] = {
+            "cost": cost,
+            "tokens": columns.get((agent_name, "tokens"), zeros),
+            "runs": runs,
+            "success_rate": [s / r if r > 0 else 1.0 for s, r in zip(success, runs)],
+            "cost_per_run": [c / r if r > 0 else 0.0 for c, r in zip(cost, runs)],
+            "avg_duration": columns.get((agent_name, "avg_duration"), zeros),
+            "tool_calls": columns.get((agent_name, "tool_calls"), zeros),
+        }
+    return AgentSeriesWindow(timestamps=timestamps, agents=agents)
+
+
+class AgentSeriesStore:
+    """Per-agent series for recent windows, computed once per aligned window.
+
+    Windows are keyed by ``(hours, step)`` and the query end time rounded
+    down to the scrape interval. Concurrent requests for a window that is
+    being computed wait for the same result.
+    """
+
+    def __init__(self, client: PrometheusClient, max_windows: int = MAX_WINDOWS):
+        self._client = client
+        self.max_windows = max_windows
+        self._windows: "OrderedDict[Tuple[int, str], Tuple[float, asyncio.Future]]" = OrderedDict()
+
+    async def _compute(self, hours: int, step: str, end: float) -> AgentSeriesWindow:
+        end_time = datetime.fromtimestamp(end)
+        start_time = end_time - timedelta(hours=hours)
+        results = await self._client.query_range_many(agent_series_queries(step), start_time, end_time, step)
+        window = split_by_agent(results)
+        window.complete = all(result is not None for result in results.values())
+        return window
+
+    async def get(self, hours: int, step: str) -> AgentSeriesWindow:
+        """Series of every agent over the last ``hours`` at the given step."""
+        interval = self._client.scrape_interval
+        end = math.floor(time.time() / interval) * interval
+        key = (hours, step)
+
+        cached = self._windows.get(key)
+        if cached is not None and cached[0] == end:
+            self._windows.move_to_end(key)
+            task = cached[1]
+        else:
+            task = asyncio.ensure_future(self._compute(hours, step, end))
+            self._windows[key] = (end, task)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+
+            def _done(t: "asyncio.Future") -> None:
+                # Do not keep failures around for the rest of the interval
+                failed = t.cancelled() or t.exception() is not None or not t.result().complete
+                if failed and self._windows.get(key, (None, None))[1] is t:
+                    del self._windows[key]
+
+            task.add_done_callback(_done)
+
+        return await asyncio.shield(task)
@@ -1,8 +1,31 @@
 """Prometheus client for fetching metrics."""
+import asyncio
+import importlib.util
 import logging
+import math
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Callable, FrozenSet, NamedTuple, Optional, Tuple
 import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from config import (
+    PROMETHEUS_URL,
+    PROMETHEUS_HTTP2,
+    PROMETHEUS_MAX_CONNECTIONS,
+    PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS,
+    PROMETHEUS_KEEPALIVE_EXPIRY,
+    PROMETHEUS_TIMEOUT,
+    PROMETHEUS_CONNECT_TIMEOUT,
+    PROMETHEUS_POOL_TIMEOUT,
+    PROMETHEUS_MAX_CONCURRENT_QUERIES,
+    PROMETHEUS_REQUEST_CONCURRENCY,
+    PROMETHEUS_SCRAPE_INTERVAL,
+    PROMETHEUS_CACHE_MAX_ENTRIES,
+    PROMETHEUS_CACHE_MAX_BYTES,
+    PROMETHEUS_RULES_REFRESH,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,35 +34,297 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# --- Client Metrics ---
+PROMETHEUS_QUERY_DURATION = Histogram(
+    "adk_prometheus_query_duration_seconds",
+    "Latency of PromQL queries issued against Prometheus",
+    ["endpoint", "status"]
+)
+PROMETHEUS_POOL_WAIT = Histogram(
+    "adk_prometheus_pool_wait_seconds",
+    "Time a PromQL query waited for a pooled connection before sending",
+    ["endpoint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+PROMETHEUS_CONNECTIONS = Counter(
+    "adk_prometheus_connections_opened_total",
+    "New TCP connections opened to Prometheus (pool misses)",
+    []
+)
+PROMETHEUS_CACHE_REQUESTS = Counter(
+    "adk_prometheus_cache_requests_total",
+    "PromQL result cache lookups by outcome (hit, miss, coalesced)",
+    ["result"]
+)
+PROMETHEUS_CACHE_ENTRIES = Gauge(
+    "adk_prometheus_cache_entries",
+    "Number of PromQL results currently held in the cache",
+    [],
+    multiprocess_mode="livesum"
+)
+
+
+class _CacheEntry(NamedTuple):
+    """A cached query result and the scrape interval it belongs to."""
+    data: Dict[str, Any]
+    bucket: float
+    nbytes: int
+
+
 class PrometheusClient:
-    """Client for querying Prometheus metrics."""
-    
-    def __init__(self, prometheus_url: str = "http://localhost:9093"):
+    """Client for querying Prometheus metrics.
+
+    Holds a single long-lived ``httpx.AsyncClient`` so that queries reuse
+    keep-alive connections from a bounded pool. Call ``start()``/``close()``
+    from the application lifespan; the pool is also opened lazily on first use.
+
+    Query results are cached per scrape interval and concurrent identical
+    queries are coalesced into a single request to Prometheus.
+    """
+
+    def __init__(
+        self,
+        prometheus_url: str = PROMETHEUS_URL,
+        http2: bool = PROMETHEUS_HTTP2,
+        max_connections: int = PROMETHEUS_MAX_CONNECTIONS,
+        max_keepalive_connections: int = PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = PROMETHEUS_KEEPALIVE_EXPIRY,
+        timeout: float = PROMETHEUS_TIMEOUT,
+        connect_timeout: float = PROMETHEUS_CONNECT_TIMEOUT,
+        pool_timeout: float = PROMETHEUS_POOL_TIMEOUT,
+        max_concurrent_queries: int = PROMETHEUS_MAX_CONCURRENT_QUERIES,
+        scrape_interval: float = PROMETHEUS_SCRAPE_INTERVAL,
+        cache_max_entries: int = PROMETHEUS_CACHE_MAX_ENTRIES,
+        cache_max_bytes: int = PROMETHEUS_CACHE_MAX_BYTES,
+        rules_refresh: float = PROMETHEUS_RULES_REFRESH,
+    ):
         self.prometheus_url = prometheus_url
         self.query_url = f"{prometheus_url}/api/v1/query"
         self.query_range_url = f"{prometheus_url}/api/v1/query_range"
-    
-    async def query(self, query: str) -> Optional[Dict[str, Any]]:
-        """Execute a PromQL query and return results."""
+        self.rules_url = f"{prometheus_url}/api/v1/rules"
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            timeout,
+            connect=connect_timeout,
+            pool=pool_timeout,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # Process-wide cap on in-flight PromQL queries across all requests
+        self._query_semaphore = asyncio.Semaphore(max_concurrent_queries)
+        # Results are keyed by query text and an evaluation time aligned to the
+        # scrape interval; newer data cannot exist within a single interval.
+        self.scrape_interval = scrape_interval
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_bucket = 0.0
+        self._inflight: Dict[Tuple, "asyncio.Future"] = {}
+        # Names of healthy recording rules, refreshed every rules_refresh seconds
+        self.rules_refresh = rules_refresh
+        self._recorded: FrozenSet[str] = frozenset()
+        self._recorded_checked = float("-inf")
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client, falling back to HTTP/1.1 if h2 is missing."""
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("PROMETHEUS_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=self.limits,
+            timeout=self.timeout,
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, opening the pool if needed."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self) -> None:
+        """Open the shared connection pool. Safe to call more than once."""
+        self._get_client()
+        logger.info(
+            f"Prometheus client pool opened for {self.prometheus_url} "
+            f"(max_connections={self.limits.max_connections}, "
+            f"max_keepalive={self.limits.max_keepalive_connections}, http2={self.http2})"
+        )
+
+    async def close(self) -> None:
+        """Close the shared connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Prometheus client pool closed")
+
+    async def _get(self, endpoint: str, url: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Send a GET to the Prometheus HTTP API under the client-wide concurrency limit."""
+        async with self._query_semaphore:
+            return await self._send(endpoint, url, params)
+
+    async def _send(self, endpoint: str, url: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Send a single GET, recording query latency and pool wait.
+
+        Returns the decoded JSON body and its size in bytes.
+        """
+        started = time.perf_counter()
+        pool_wait: Optional[float] = None
+
+        async def _trace(event_name: str, info: Dict[str, Any]) -> None:
+            # The first connection-level event marks the moment a pooled
+            # connection was handed to this request.
+            nonlocal pool_wait
+            if pool_wait is None:
+                pool_wait = time.perf_counter() - started
+            if event_name == "connection.connect_tcp.complete":
+                PROMETHEUS_CONNECTIONS.inc()
+
+        status = "error"
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    self.query_url,
-                    params={"query": query},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("status") == "success":
-                    return data.get("data")
-                else:
-                    logger.error(f"Prometheus query failed: {data}")
-                    return None
+            response = await self._get_client().get(
+                url,
+                params=params,
+                extensions={"trace": _trace},
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") == "success":
+                status = "success"
+            return data, len(response.content)
+        finally:
+            PROMETHEUS_QUERY_DURATION.labels(endpoint=endpoint, status=status).observe(
+                time.perf_counter() - started
+            )
+            if pool_wait is not None:
+                PROMETHEUS_POOL_WAIT.labels(endpoint=endpoint).observe(pool_wait)
+
+    def _align(self, timestamp: float) -> float:
+        """Round a unix timestamp down to the scrape interval."""
+        return math.floor(timestamp / self.scrape_interval) * self.scrape_interval
+
+    def _evict_expired(self, bucket: float) -> None:
+        """Drop cached results from earlier scrape intervals once a new one starts."""
+        if bucket <= self._cache_bucket:
+            return
+        self._cache_bucket = bucket
+        for key in [k for k, entry in self._cache.items() if entry.bucket < bucket]:
+            self._cache_bytes -= self._cache.pop(key).nbytes
+        PROMETHEUS_CACHE_ENTRIES.set(len(self._cache))
+
+    def _store(self, key: Tuple, bucket: float, data: Dict[str, Any], nbytes: int) -> None:
+        """Insert a result into the LRU cache, evicting until it fits the bounds."""
+        if self.cache_max_entries <= 0 or nbytes > self.cache_max_bytes or bucket < self._cache_bucket:
+            return
+        self._cache[key] = _CacheEntry(data, bucket, nbytes)
+        self._cache_bytes += nbytes
+        while len(self._cache) > self.cache_max_entries or self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted.nbytes
+        PROMETHEUS_CACHE_ENTRIES.set(len(self._cache))
+
+    async def _cached(
+        self,
+        key: Tuple,
+        bucket: float,
+        fetch: Callable[[], Awaitable[Tuple[Optional[Dict[str, Any]], int]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Serve a result from the cache, joining an identical in-flight request if any.
+
+        The fetch runs as its own task so that a cancelled caller does not
+        cancel the shared request for the other waiters. Failed results
+        (None) are not cached.
+        """
+        self._evict_expired(bucket)
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            PROMETHEUS_CACHE_REQUESTS.labels(result="hit").inc()
+            return entry.data
+
+        task = self._inflight.get(key)
+        if task is not None:
+            PROMETHEUS_CACHE_REQUESTS.labels(result="coalesced").inc()
+        else:
+            PROMETHEUS_CACHE_REQUESTS.labels(result="miss").inc()
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+
+            def _done(t: "asyncio.Future") -> None:
+                self._inflight.pop(key, None)
+                if t.cancelled() or t.exception() is not None:
+                    return
+                data, nbytes = t.result()
+                if data is not None:
+                    self._store(key, bucket, data, nbytes)
+
+            task.add_done_callback(_done)
+
+        data, _ = await asyncio.shield(task)
+        return data
+
+    async def _fetch_query(self, query: str, eval_time: float) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Run an instant query and unwrap the API envelope."""
+        try:
+            data, nbytes = await self._get("query", self.query_url, {"query": query, "time": eval_time})
+
+            if data.get("status") == "success":
+                return data.get("data"), nbytes
+            else:
+                logger.error(f"Prometheus query failed: {data}")
+                return None, 0
         except Exception as e:
             logger.error(f"Error querying Prometheus: {e}")
-            return None
-    
+            return None, 0
+
+    async def _fetch_query_range(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str,
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Run a range query and unwrap the API envelope."""
+        try:
+            data, nbytes = await self._get(
+                "query_range",
+                self.query_range_url,
+                {
+                    "query": query,
+                    "start": start,
+                    "end": end,
+                    "step": step,
+                },
+            )
+
+            if data.get("status") == "success":
+                return data.get("data"), nbytes
+            else:
+                logger.error(f"Prometheus range query failed: {data}")
+                return None, 0
+        except Exception as e:
+            logger.error(f"Error querying Prometheus range: {e}")
+            return None, 0
+
+    async def query(self, query: str) -> Optional[Dict[str, Any]]:
+        """Execute a PromQL query and return results.
+
+        The query is evaluated at the current time rounded down to the scrape
+        interval, so identical queries within one interval share a result.
+        """
+        eval_time = self._align(time.time())
+        return await self._cached(
+            ("query", query, eval_time),
+            eval_time,
+            lambda: self._fetch_query(query, eval_time),
+        )
+
     async def query_range(
         self,
         query: str,
@@ -47,28 +332,102 @@ class PrometheusClient:
         end: datetime,
         step: str = "15s"
     ) -> Optional[Dict[str, Any]]:
-        """Execute a PromQL range query."""
+        """Execute a PromQL range query.
+
+        Start and end are rounded down to the scrape interval so repeated
+        dashboard refreshes within one interval share a cached result.
+        """
+        aligned_start = self._align(start.timestamp())
+        aligned_end = self._align(end.timestamp())
+        return await self._cached(
+            ("query_range", query, aligned_start, aligned_end, step),
+            aligned_end,
+            lambda: self._fetch_query_range(query, aligned_start, aligned_end, step),
+        )
+
+    async def _fetch_recorded(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Fetch the loaded recording rules and unwrap the API envelope."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    self.query_range_url,
-                    params={
-                        "query": query,
-                        "start": start.timestamp(),
-                        "end": end.timestamp(),
-                        "step": step,
-                    },
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("status") == "success":
-                    return data.get("data")
-                else:
-                    logger.error(f"Prometheus range query failed: {data}")
-                    return None
+            data, nbytes = await self._get("rules", self.rules_url, {"type": "record"})
+            if data.get("status") == "success":
+                return data.get("data"), nbytes
+            logger.error(f"Prometheus rules request failed: {data}")
+            return None, 0
         except Exception as e:
-            logger.error(f"Error querying Prometheus range: {e}")
-            return None
-    
\ No newline at end of file
+            logger.error(f"Error fetching Prometheus recording rules: {e}")
+            return None, 0
+
+    async def recorded_series(self) -> FrozenSet[str]:
+        """Names of recording rules Prometheus is currently evaluating without error.
+
+        The list is refreshed at most every ``rules_refresh`` seconds. If
+        Prometheus cannot be reached the last known set is kept, so callers
+        fall back to raw queries only until rules are first seen.
+        """
+        now = time.monotonic()
+        if now - self._recorded_checked < self.rules_refresh:
+            return self._recorded
+        self._recorded_checked = now
+        data = await self._cached(("rules",), self._align(time.time()), self._fetch_recorded)
+        if data is not None:
+            self._recorded = frozenset(
+                rule["name"]
+                for group in data.get("groups", [])
+                for rule in group.get("rules", [])
+                if rule.get("type") == "recording" and rule.get("health") == "ok"
+            )
+            logger.info(f"Prometheus has {len(self._recorded)} healthy recording rules loaded")
+        return self._recorded
+
+    async def query_many(
+        self,
+        queries: Dict[str, str],
+        max_concurrency: int = PROMETHEUS_REQUEST_CONCURRENCY,
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Execute independent PromQL queries concurrently.
+
+        At most ``max_concurrency`` queries of this batch are in flight at
+        once, on top of the client-wide limit. Failed queries map to None,
+        exactly like ``query()``.
+
+        Args:
+            queries: Mapping of result key to PromQL expression
+            max_concurrency: Per-call limit on concurrent queries
+
+        Returns:
+            Mapping of the same keys to query results
+        """
+        if not queries:
+            return {}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _run(query: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.query(query)
+
+        results = await asyncio.gather(*(_run(q) for q in queries.values()))
+        return dict(zip(queries.keys(), results))
+
+    async def query_range_many(
+        self,
+        queries: Dict[str, str],
+        start: datetime,
+        end: datetime,
+        step: str = "15s",
+        max_concurrency: int = PROMETHEUS_REQUEST_CONCURRENCY,
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Execute independent PromQL range queries over one window concurrently.
+
+        Same contract as ``query_many()``, with every query sharing the
+        start, end and step.
+        """
+        if not queries:
+            return {}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _run(query: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.query_range(query, start, end, step)
+
+        results = await asyncio.gather(*(_run(q) for q in queries.values()))
+        return dict(zip(queries.keys(), results))
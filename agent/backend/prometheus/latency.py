@@ -0,0 +1,104 @@
+"""LLM latency breakdown per (model, agent).
+
+Total request duration mixes two very different delays: the time until the
+first response chunk arrives (queueing, prompt processing) and the time
+spent streaming the rest of the answer (generation). The instrumentation
+records both separately, along with the gap between chunks and the output
+token rate, and this module turns those histograms into one row per
+(model, agent) pair.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from agent.backend.prometheus.snapshot import parse_vector
+from agent.backend.sketches import LATENCY_SKETCHES, QUANTILES, LatencySketches
+from agent.backend.types.types import LatencyBreakdown, LatencyBreakdownResponse
+
+# Label names identifying one breakdown row
+BREAKDOWN_LABELS = ("model", "agent_name")
+
+_BY = "model, agent_name"
+
+
+def _mean(histogram: str, window: str) -> str:
+    return (
+        f'sum by ({_BY}) (increase({histogram}_sum[{window}])) '
+        f'/ sum by ({_BY}) (increase({histogram}_count[{window}]))'
+    )
+
+
+def _quantile(q: float, histogram: str, window: str) -> str:
+    return f'histogram_quantile({q}, sum by (le, {_BY}) (rate({histogram}_bucket[{window}])))'
+
+
+def model_sketch_quantiles(
+    window_seconds: float,
+    sketches: LatencySketches = LATENCY_SKETCHES,
+) -> Optional[Dict[Tuple[str, str], Dict[str, float]]]:
+    """LLM call duration quantiles per (model, agent) from the in-process sketches, or None."""
+    if not sketches.covers(window_seconds):
+        return None
+    return {(model, agent_name): values for (agent_name, model), values in sketches.quantiles("model", window_seconds).items()}
+
+
+def latency_breakdown_queries(window: str, duration_quantiles: bool = True) -> Dict[str, str]:
+    """Instant queries for LatencyBreakdown fields, keyed by field name.
+
+    Args:
+        window: PromQL range, e.g. ``'1h'``
+        duration_quantiles: Include ``histogram_quantile`` of the total
+            duration; left out when the sketches answer them
+    """
+    queries = {
+        "requests": f'sum by ({_BY}) (increase(adk_llm_request_duration_seconds_count[{window}]))',
+        "avg_duration": _mean("adk_llm_request_duration_seconds", window),
+        "avg_time_to_first_response": _mean("adk_llm_time_to_first_response_seconds", window),
+        "p50_time_to_first_response": _quantile(0.5, "adk_llm_time_to_first_response_seconds", window),
+        "p95_time_to_first_response": _quantile(0.95, "adk_llm_time_to_first_response_seconds", window),
+        "p50_inter_chunk_gap": _quantile(0.5, "adk_llm_inter_chunk_seconds", window),
+        "p95_inter_chunk_gap": _quantile(0.95, "adk_llm_inter_chunk_seconds", window),
+        "avg_output_tokens_per_second": _mean("adk_llm_output_tokens_per_second", window),
+    }
+    if duration_quantiles:
+        for name, q in QUANTILES.items():
+            queries[name] = _quantile(q, "adk_llm_request_duration_seconds", window)
+    return queries
+
+
+def build_latency_breakdown(
+    results: Dict[str, Optional[Dict[str, Any]]],
+    time_range: str,
+    duration_quantiles: Optional[Dict[Tuple[str, str], Dict[str, float]]] = None,
+) -> LatencyBreakdownResponse:
+    """One row per (model, agent) seen in any of the results.
+
+    Generation time is the mean duration minus the mean time to first
+    response, i.e. how long the answer took once it started arriving.
+    Sketch quantiles, when given, replace the histogram ones.
+    """
+    vectors = {key: parse_vector(result, BREAKDOWN_LABELS) for key, result in results.items()}
+    if duration_quantiles is not None:
+        for name in QUANTILES:
+            vectors[name] = {pair: values[name] for pair, values in duration_quantiles.items()}
+    pairs: set[Tuple[str, str]] = {pair for vector in vectors.values() for pair in vector}
+
+    rows = []
+    for model, agent_name in sorted(pairs, key=lambda pair: (pair[1], pair[0])):
+        values = {key: vector.get((model, agent_name), 0.0) for key, vector in vectors.items()}
+        rows.append(LatencyBreakdown(
+            model=model,
+            agent_name=agent_name,
+            requests=int(round(values.get("requests", 0.0))),
+            avg_duration=values.get("avg_duration", 0.0),
+            p50_duration=values.get("p50_duration", 0.0),
+            p90_duration=values.get("p90_duration", 0.0),
+            p95_duration=values.get("p95_duration", 0.0),
+            p99_duration=values.get("p99_duration", 0.0),
+            avg_time_to_first_response=values.get("avg_time_to_first_response", 0.0),
+            p50_time_to_first_response=values.get("p50_time_to_first_response", 0.0),
+            p95_time_to_first_response=values.get("p95_time_to_first_response", 0.0),
+            avg_generation_time=max(values.get("avg_duration", 0.0) - values.get("avg_time_to_first_response", 0.0), 0.0),
+            p50_inter_chunk_gap=values.get("p50_inter_chunk_gap", 0.0),
+            p95_inter_chunk_gap=values.get("p95_inter_chunk_gap", 0.0),
+            avg_output_tokens_per_second=values.get("avg_output_tokens_per_second", 0.0),
+        ))
+    return LatencyBreakdownResponse(breakdown=rows, time_range=time_range)
@@ -0,0 +1,164 @@
+"""PromQL builders for the windowed aggregates used by the metrics endpoints.
+
+Each aggregate is defined once and used both to generate Prometheus
+recording rules (see ``recording_rules.py``) and to build endpoint
+queries. When the matching recorded series is loaded in Prometheus the
+builder emits a cheap lookup of it; otherwise it emits the raw
+``increase()`` / ``rate()`` expression.
+
+Windowed queries that need an instant-counter fallback are composed with
+it into a single query, so the fallback costs no extra round trip.
+"""
+from dataclasses import dataclass
+from typing import AbstractSet, Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """A windowed aggregate over one metric at its finest useful grouping.
+
+    Attributes:
+        metric: Counter name, or histogram base name for ``mean`` aggregates
+        by: Labels kept by the recorded series
+        kind: ``increase`` (counter delta) or ``mean`` (histogram sum/count)
+        selector: Label matchers applied to the raw metric before aggregating
+        record_base: Metric part of the recorded series name
+    """
+    metric: str
+    by: Tuple[str, ...]
+    kind: str
+    selector: str = ""
+    record_base: str = ""
+
+    def record_name(self, window: str) -> str:
+        """Recorded series name, following the ``level:metric:operation`` convention."""
+        base = self.record_base or self.metric.removesuffix("_total")
+        return f"{'_'.join(self.by)}:{base}:{self.kind}{window}"
+
+    def raw(self, window: str, by: Tuple[str, ...], selector: str = "") -> str:
+        """Raw PromQL for this aggregate grouped by ``by``.
+
+        ``selector`` holds extra label matchers (``status="success"``) and is
+        merged with the aggregate's own selector.
+        """
+        matchers = ", ".join(m for m in (self.selector.strip("{}"), selector) if m)
+        labels = f"{{{matchers}}}" if matchers else ""
+        if self.kind == "mean":
+            inner = f"rate({self.metric}_sum{labels}[{window}]) / rate({self.metric}_count{labels}[{window}])"
+            return f"avg{_grouping(by)} ({inner})"
+        return f"sum{_grouping(by)} (increase({self.metric}{labels}[{window}]))"
+
+    def rule_expr(self, window: str) -> str:
+        """Expression of the recording rule for one window."""
+        return self.raw(window, self.by)
+
+
+def _grouping(by: Tuple[str, ...]) -> str:
+    return f" by ({', '.join(by)})" if by else ""
+
+
+AGENT_RUNS = Aggregate("adk_agent_runs_total", ("agent_name", "status"), "increase")
+TOOL_CALLS = Aggregate("adk_tool_calls_total", ("agent_name", "tool_name", "status"), "increase")
+LLM_COST = Aggregate("adk_llm_cost_dollars_total", ("agent_name",), "increase", record_base="adk_llm_cost_dollars")
+LLM_TOTAL_TOKENS = Aggregate("adk_llm_tokens_total", ("agent_name",), "increase", '{type="total"}', "adk_llm_total_tokens")
+LLM_REQUESTS = Aggregate("adk_llm_requests_total", ("agent_name",), "increase")
+CONVERSATIONS = Aggregate("adk_conversations_total", ("job",), "increase")
+AGENT_DURATION = Aggregate("adk_agent_run_duration_seconds", ("agent_name",), "mean")
+TOOL_DURATION = Aggregate("adk_tool_call_duration_seconds", ("agent_name", "tool_name"), "mean")
+
+AGGREGATES = (
+    AGENT_RUNS, TOOL_CALLS, LLM_COST, LLM_TOTAL_TOKENS, LLM_REQUESTS,
+    CONVERSATIONS, AGENT_DURATION, TOOL_DURATION,
+)
+
+# Dashboard time ranges that get recording rules, with their evaluation
+# interval. Short ranges are cheap to compute raw; the interval stays well
+# under the 5m lookback so recorded samples never go stale.
+RECORDED_WINDOWS = {
+    "1h": "30s",
+    "6h": "30s",
+    "24h": "1m",
+    "7d": "2m",
+    "30d": "2m",
+}
+
+
+class QueryBuilder:
+    """Builds endpoint PromQL, preferring recorded series that are loaded.
+
+    Args:
+        recorded: Names of recording rules currently evaluated by Prometheus
+    """
+
+    def __init__(self, recorded: AbstractSet[str] = frozenset()):
+        self.recorded = recorded
+
+    def _recorded(self, aggregate: Aggregate, window: str, by: Tuple[str, ...]) -> str:
+        """Recorded series name usable for this grouping, or empty string."""
+        name = aggregate.record_name(window)
+        if name in self.recorded and set(by) <= set(aggregate.by):
+            return name
+        return ""
+
+    def increase(self, aggregate: Aggregate, window: str, by: Tuple[str, ...] = (), selector: str = "") -> str:
+        """``sum by (by) (increase(metric{selector}[window]))``.
+
+        ``selector`` may only match labels kept by the aggregate, since it is
+        applied to the recorded series as-is.
+        """
+        name = self._recorded(aggregate, window, by)
+        if not name:
+            return aggregate.raw(window, by, selector)
+        series = f"{name}{{{selector}}}" if selector else name
+        if tuple(by) == aggregate.by:
+            return series
+        return f"sum{_grouping(by)} ({series})"
+
+    def mean(self, aggregate: Aggregate, window: str, by: Tuple[str, ...] = ()) -> str:
+        """``avg by (by) (rate(metric_sum[window]) / rate(metric_count[window]))``.
+
+        An average of averages is not the same aggregate, so the recorded
+        series is only used at exactly its own grouping.
+        """
+        name = self._recorded(aggregate, window, by)
+        if name and tuple(by) == aggregate.by:
+            return name
+        return aggregate.raw(window, by)
+
+    def success_ratio(self, aggregate: Aggregate, window: str, by: Tuple[str, ...]) -> str:
+        """Share of ``status="success"`` in a counter's increase over the window."""
+        success = self.increase(aggregate, window, by, 'status="success"')
+        return f"{success} / {self.increase(aggregate, window, by)}"
+
+
+# Label marking which half of a composed query a series came from
+SOURCE_LABEL = "adk_source"
+
+
+def with_fallback(windowed: str, instant: str) -> str:
+    """One query returning both the windowed and the instant-counter series.
+
+    Each side is tagged with ``adk_source`` ("window" or "instant") so that
+    ``or`` keeps every series of both, and the caller can choose between
+    them after a single round trip (see ``split_by_source``).
+    """
+    return (
+        f'label_replace({windowed}, "{SOURCE_LABEL}", "window", "", "")'
+        f' or label_replace({instant}, "{SOURCE_LABEL}", "instant", "", "")'
+    )
+
+
+def split_by_source(
+    result: Optional[Dict[str, Any]],
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Split a ``with_fallback`` result into its windowed and instant results."""
+    if result is None:
+        return None, None
+    windowed: List[Dict[str, Any]] = []
+    instant: List[Dict[str, Any]] = []
+    for r in result.get("result", []):
+        (instant if r["metric"].get(SOURCE_LABEL) == "instant" else windowed).append(r)
+    return (
+        {"resultType": result.get("resultType"), "result": windowed},
+        {"resultType": result.get("resultType"), "result": instant},
+    )
@@ -0,0 +1,53 @@
+"""Generate the Prometheus recording rules for the dashboard aggregates.
+
+Usage:
+    python -m agent.backend.prometheus.recording_rules [output_path]
+
+Writes ``prometheus.rules.yml`` in the repository root by default. The
+file is loaded by the Prometheus container (see ``prometheus.yml`` and
+``docker-compose.yml``); regenerate it whenever ``queries.AGGREGATES`` or
+``queries.RECORDED_WINDOWS`` change.
+"""
+import sys
+from pathlib import Path
+from typing import Any, Dict
+import yaml
+
+from agent.backend.prometheus.queries import AGGREGATES, RECORDED_WINDOWS
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parents[3] / "prometheus.rules.yml"
+
+HEADER = (
+    "# Generated by `python -m agent.backend.prometheus.recording_rules`.\n"
+    "# Do not edit by hand; change agent/backend/prometheus/queries.py instead.\n"
+)
+
+
+def build_rules() -> Dict[str, Any]:
+    """Recording rule groups, one per window so each gets its own interval."""
+    groups = []
+    for window, interval in RECORDED_WINDOWS.items():
+        groups.append({
+            "name": f"adk_dashboard_{window}",
+            "interval": interval,
+            "rules": [
+                {"record": agg.record_name(window), "expr": agg.rule_expr(window)}
+                for agg in AGGREGATES
+            ],
+        })
+    return {"groups": groups}
+
+
+def render_rules() -> str:
+    """Rules file contents as YAML."""
+    return HEADER + yaml.safe_dump(build_rules(), sort_keys=False, width=200)
+
+
+def main() -> None:
+    output = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    output.write_text(render_rules())
+    print(f"Wrote {sum(len(g['rules']) for g in build_rules()['groups'])} recording rules to {output}")
+
+
+if __name__ == "__main__":
+    main()
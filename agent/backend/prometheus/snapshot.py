@@ -0,0 +1,431 @@
+"""Dashboard snapshot built from one deduplicated set of PromQL queries.
+
+The summary, by-agent, agent detail and conversation endpoints overlap
+heavily: all of them need runs, cost and tool calls over the same window.
+This module queries each metric once at the finest grouping any widget
+needs (``by (agent_name, tool_name, status)``) and derives every total
+and ratio in-process.
+"""
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agent.backend.metrics_store import LOCAL_METRICS, LocalMetricsStore
+from agent.backend.prometheus.client import PrometheusClient
+from agent.backend.prometheus.queries import (
+    QueryBuilder, with_fallback, split_by_source, AGENT_RUNS, TOOL_CALLS, LLM_COST, LLM_TOTAL_TOKENS,
+    LLM_REQUESTS, CONVERSATIONS, AGENT_DURATION, TOOL_DURATION,
+)
+from agent.backend.prometheus.timeseries import parse_step
+from agent.backend.sketches import LATENCY_SKETCHES, QUANTILES, LatencySketches
+from agent.backend.types.types import (
+    MetricsSummary, AgentMetrics, AgentMetricsResponse,
+    ToolMetrics, AgentDetailMetrics, AgentDetailResponse,
+    ConversationMetrics, DashboardSnapshot,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricVectors:
+    """Aggregates over one time range, keyed by label values.
+
+    The ``*_lifetime`` fields hold raw counter values since process start.
+    They are only used when the windowed vector has nothing for the known
+    agents, mirroring the instant-value fallback of the detail endpoint.
+    """
+    runs: Dict[Tuple[str, str], float] = field(default_factory=dict)  # (agent, status)
+    tool_calls: Dict[Tuple[str, str, str], float] = field(default_factory=dict)  # (agent, tool, status)
+    cost: Dict[str, float] = field(default_factory=dict)
+    tokens: Dict[str, float] = field(default_factory=dict)
+    llm_requests: Dict[str, float] = field(default_factory=dict)
+    agent_duration: Dict[str, float] = field(default_factory=dict)
+    tool_duration: Dict[Tuple[str, str], float] = field(default_factory=dict)
+    conversations: float = 0.0
+    models: Dict[str, str] = field(default_factory=dict)
+    workflows: Dict[str, list[str]] = field(default_factory=dict)
+    subagents: Dict[str, list[str]] = field(default_factory=dict)
+    runs_lifetime: Optional[Dict[Tuple[str, str], float]] = None
+    tool_calls_lifetime: Optional[Dict[Tuple[str, str, str], float]] = None
+    cost_lifetime: Optional[Dict[str, float]] = None
+    agent_duration_lifetime: Optional[Dict[str, float]] = None
+    tool_duration_lifetime: Optional[Dict[Tuple[str, str], float]] = None
+    # Duration quantiles keyed by QUANTILES field name
+    agent_quantiles: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    tool_quantiles: Dict[Tuple[str, str], Dict[str, float]] = field(default_factory=dict)
+
+
+# --- Query Plan ---
+
+# Label names forming the key of each vector; a single label gives a plain string key
+VECTOR_LABELS = {
+    "runs": ("agent_name", "status"),
+    "tool_calls": ("agent_name", "tool_name", "status"),
+    "cost": ("agent_name",),
+    "tokens": ("agent_name",),
+    "llm_requests": ("agent_name",),
+    "agent_duration": ("agent_name",),
+    "tool_duration": ("agent_name", "tool_name"),
+    "runs_lifetime": ("agent_name", "status"),
+    "tool_calls_lifetime": ("agent_name", "tool_name", "status"),
+    "cost_lifetime": ("agent_name",),
+    "agent_duration_lifetime": ("agent_name",),
+    "tool_duration_lifetime": ("agent_name", "tool_name"),
+}
+
+
+def _windowed_queries(q: QueryBuilder, time_range: str) -> Dict[str, str]:
+    """PromQL for every windowed vector in MetricVectors."""
+    return {
+        "runs": q.increase(AGENT_RUNS, time_range, VECTOR_LABELS["runs"]),
+        "tool_calls": q.increase(TOOL_CALLS, time_range, VECTOR_LABELS["tool_calls"]),
+        "cost": q.increase(LLM_COST, time_range, VECTOR_LABELS["cost"]),
+        "tokens": q.increase(LLM_TOTAL_TOKENS, time_range, VECTOR_LABELS["tokens"]),
+        "llm_requests": q.increase(LLM_REQUESTS, time_range, VECTOR_LABELS["llm_requests"]),
+        "agent_duration": q.mean(AGENT_DURATION, time_range, VECTOR_LABELS["agent_duration"]),
+        "tool_duration": q.mean(TOOL_DURATION, time_range, VECTOR_LABELS["tool_duration"]),
+        "conversations": q.increase(CONVERSATIONS, time_range),
+        "models": 'adk_agent_model_info',
+        "workflows": 'adk_agent_workflows_info',
+        "subagents": 'adk_agent_subagents_info',
+    }
+
+
+LIFETIME_QUERIES = {
+    "runs_lifetime": 'sum by (agent_name, status) (adk_agent_runs_total)',
+    "tool_calls_lifetime": 'sum by (agent_name, tool_name, status) (adk_tool_calls_total)',
+    "cost_lifetime": 'sum by (agent_name) (adk_llm_cost_dollars_total)',
+    "agent_duration_lifetime": 'sum by (agent_name) (adk_agent_run_duration_seconds_sum) / sum by (agent_name) (adk_agent_run_duration_seconds_count)',
+    "tool_duration_lifetime": 'sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_sum) / sum by (agent_name, tool_name) (adk_tool_call_duration_seconds_count)',
+}
+
+
+def quantile_queries(time_range: str) -> Dict[str, str]:
+    """``histogram_quantile`` per agent and per tool, for windows the sketches do not cover."""
+    queries = {}
+    for name, q in QUANTILES.items():
+        queries[f"agent_{name}"] = (
+            f'histogram_quantile({q}, sum by (le, agent_name) (rate(adk_agent_run_duration_seconds_bucket[{time_range}])))'
+        )
+        queries[f"tool_{name}"] = (
+            f'histogram_quantile({q}, sum by (le, agent_name, tool_name) (rate(adk_tool_call_duration_seconds_bucket[{time_range}])))'
+        )
+    return queries
+
+
+def sketch_quantiles(
+    window_seconds: float,
+    sketches: LatencySketches = LATENCY_SKETCHES,
+) -> Optional[Tuple[Dict[str, Dict[str, float]], Dict[Tuple[str, str], Dict[str, float]]]]:
+    """Agent and tool duration quantiles from the in-process sketches, or None if they cannot answer."""
+    if not sketches.covers(window_seconds):
+        return None
+    agents = {key[0]: values for key, values in sketches.quantiles("agent", window_seconds).items()}
+    tools = {(key[0], key[1]): values for key, values in sketches.quantiles("tool", window_seconds).items()}
+    return agents, tools
+
+
+def _sample_value(r: Dict[str, Any]) -> float:
+    """Float value of an instant-vector sample, with NaN/Inf mapped to 0."""
+    val = float(r["value"][1]) if r.get("value") else 0.0
+    if math.isnan(val) or math.isinf(val):
+        return 0.0
+    return val
+
+
+def parse_vector(result: Optional[Dict[str, Any]], labels: Tuple[str, ...]) -> Dict[Any, float]:
+    """Turn an instant-vector result into a dict keyed by label values."""
+    vector: Dict[Any, float] = {}
+    if result and result.get("result"):
+        for r in result["result"]:
+            key = tuple(r["metric"].get(label, "unknown") for label in labels)
+            vector[key[0] if len(key) == 1 else key] = _sample_value(r)
+    return vector
+
+
+def _parse_info(result: Optional[Dict[str, Any]], label: str) -> Dict[str, str]:
+    """Map agent_name to the given label of an info metric."""
+    info: Dict[str, str] = {}
+    if result and result.get("result"):
+        for r in result["result"]:
+            info[r["metric"].get("agent_name", "unknown")] = r["metric"].get(label, "")
+    return info
+
+
+def _parse_quantiles(results: Dict[str, Optional[Dict[str, Any]]], prefix: str, labels: Tuple[str, ...]) -> Dict[Any, Dict[str, float]]:
+    """Regroup ``quantile_queries`` results into quantiles per key."""
+    quantiles: Dict[Any, Dict[str, float]] = {}
+    for name in QUANTILES:
+        for key, val in parse_vector(results.get(f"{prefix}_{name}"), labels).items():
+            quantiles.setdefault(key, {})[name] = val
+    return quantiles
+
+
+# --- Derivations ---
+
+def _sum_by(vector: Dict[Tuple, float], width: int) -> Dict[Any, float]:
+    """Collapse the trailing labels of a tuple-keyed vector by summing."""
+    out: Dict[Any, float] = {}
+    for key, val in vector.items():
+        prefix = key[0] if width == 1 else key[:width]
+        out[prefix] = out.get(prefix, 0.0) + val
+    return out
+
+
+def _success_ratio(vector: Dict[Tuple, float], width: int) -> Dict[Any, float]:
+    """Ratio of status="success" to all statuses, grouped by the leading labels."""
+    totals = _sum_by(vector, width)
+    successes = _sum_by({k: v for k, v in vector.items() if k[-1] == "success"}, width)
+    return {k: successes.get(k, 0.0) / total for k, total in totals.items() if total > 0}
+
+
+def _pick(
+    windowed: Dict[Any, float],
+    lifetime: Optional[Dict[Any, float]],
+    is_known: Callable[[Any], bool],
+) -> Dict[Any, float]:
+    """Non-zero windowed values for known keys, or lifetime values if there are none."""
+    hits = {k: v for k, v in windowed.items() if is_known(k) and v > 0}
+    if hits or lifetime is None:
+        return hits
+    return {k: v for k, v in lifetime.items() if is_known(k)}
+
+
+def build_summary(v: MetricVectors, time_range: str) -> MetricsSummary:
+    """Totals over all agents."""
+    durations = [d for d in v.agent_duration.values() if d > 0]
+    return MetricsSummary(
+        total_cost=sum(v.cost.values()),
+        total_runs=int(sum(v.runs.values())),
+        total_tool_calls=int(sum(v.tool_calls.values())),
+        avg_execution_duration=sum(durations) / len(durations) if durations else 0.0,
+        time_range=time_range,
+    )
+
+
+def build_agent_metrics(v: MetricVectors, time_range: str) -> AgentMetricsResponse:
+    """Per-agent totals, for every agent seen in any of the windowed vectors."""
+    runs = _sum_by(v.runs, 1)
+    tool_calls = _sum_by(v.tool_calls, 1)
+    agents: Dict[str, AgentMetrics] = {}
+    for name in [*runs, *v.agent_duration, *tool_calls, *v.llm_requests, *v.tokens, *v.cost]:
+        if name not in agents:
+            agents[name] = AgentMetrics(
+                agent_id=name,
+                cost=v.cost.get(name, 0.0),
+                tokens=int(v.tokens.get(name, 0)),
+                tool_calls=int(tool_calls.get(name, 0)),
+                llm_requests=int(v.llm_requests.get(name, 0)),
+                duration=v.agent_duration.get(name, 0.0),
+            )
+    return AgentMetricsResponse(agents=list(agents.values()), time_range=time_range)
+
+
+def build_agent_detail(v: MetricVectors, time_range: str) -> AgentDetailResponse:
+    """Per-agent detail with tool breakdown for every agent with a model info metric."""
+    agents = {name: AgentDetailMetrics(name=name, model=model) for name, model in v.models.items()}
+    known_agent = lambda k: k in agents
+
+    for name, val in _pick(v.cost, v.cost_lifetime, known_agent).items():
+        agents[name].cost = val
+    runs_lifetime = _sum_by(v.runs_lifetime, 1) if v.runs_lifetime is not None else None
+    for name, val in _pick(_sum_by(v.runs, 1), runs_lifetime, known_agent).items():
+        agents[name].runs = int(val)
+    success_lifetime = _success_ratio(v.runs_lifetime, 1) if v.runs_lifetime is not None else None
+    for name, val in _pick(_success_ratio(v.runs, 1), success_lifetime, known_agent).items():
+        agents[name].success_rate = min(val, 1.0)
+    for name, val in _pick(v.agent_duration, v.agent_duration_lifetime, known_agent).items():
+        agents[name].avg_duration = val
+    for name, values in v.agent_quantiles.items():
+        if name in agents:
+            for field_name, val in values.items():
+                setattr(agents[name], field_name, val)
+
+    tools: Dict[Tuple[str, str], ToolMetrics] = {}
+    calls_lifetime = _sum_by(v.tool_calls_lifetime, 2) if v.tool_calls_lifetime is not None else None
+    for (agent_name, tool_name), val in _pick(_sum_by(v.tool_calls, 2), calls_lifetime, lambda k: k[0] in agents).items():
+        tools[(agent_name, tool_name)] = ToolMetrics(name=tool_name, calls=int(val))
+        agents[agent_name].tools.append(tools[(agent_name, tool_name)])
+    known_tool = lambda k: k in tools
+    for key, val in _pick(v.tool_duration, v.tool_duration_lifetime, known_tool).items():
+        tools[key].avg_duration = val
+    tool_success_lifetime = _success_ratio(v.tool_calls_lifetime, 2) if v.tool_calls_lifetime is not None else None
+    for key, val in _pick(_success_ratio(v.tool_calls, 2), tool_success_lifetime, known_tool).items():
+        tools[key].success_rate = min(val, 1.0)
+    for key, values in v.tool_quantiles.items():
+        if key in tools:
+            for field_name, val in values.items():
+                setattr(tools[key], field_name, val)
+
+    for name, workflows in v.workflows.items():
+        if name in agents and workflows:
+            agents[name].workflows = workflows
+    for name, subagents in v.subagents.items():
+        if name in agents and subagents:
+            agents[name].subagents = subagents
+
+    return AgentDetailResponse(agents=list(agents.values()), time_range=time_range)
+
+
+def build_conversations(v: MetricVectors, time_range: str) -> ConversationMetrics:
+    """Averages per conversation."""
+    total_conversations = int(v.conversations)
+    total_cost = sum(v.cost.values())
+    total_runs = int(sum(v.runs.values()))
+    total_tool_calls = int(sum(v.tool_calls.values()))
+    return ConversationMetrics(
+        total_conversations=total_conversations,
+        avg_cost_per_conversation=total_cost / total_conversations if total_conversations > 0 else 0.0,
+        avg_runs_per_conversation=total_runs / total_conversations if total_conversations > 0 else 0.0,
+        avg_tool_calls_per_conversation=total_tool_calls / total_conversations if total_conversations > 0 else 0.0,
+        time_range=time_range,
+    )
+
+
+def assemble_snapshot(v: MetricVectors, time_range: str) -> DashboardSnapshot:
+    """Derive all four dashboard responses from one set of vectors."""
+    return DashboardSnapshot(
+        summary=build_summary(v, time_range),
+        by_agent=build_agent_metrics(v, time_range),
+        agents_detail=build_agent_detail(v, time_range),
+        conversations=build_conversations(v, time_range),
+        time_range=time_range,
+    )
+
+
+def empty_snapshot(time_range: str) -> DashboardSnapshot:
+    """Snapshot with zero values, returned when fetching fails."""
+    return assemble_snapshot(MetricVectors(), time_range)
+
+
+# --- Fetching ---
+
+async def fetch_metric_vectors(client: PrometheusClient, time_range: str) -> MetricVectors:
+    """Run the deduplicated query plan for one time range.
+
+    All queries go out in one concurrent batch, reading recorded series
+    where Prometheus has them. Vectors with a lifetime fallback are fetched
+    together with it in one composed query. Duration quantiles come from
+    the in-process sketches when they cover the window.
+    """
+    q = QueryBuilder(await client.recorded_series())
+    queries = _windowed_queries(q, time_range)
+    for name, lifetime_query in LIFETIME_QUERIES.items():
+        windowed_name = name[:-len("_lifetime")]
+        queries[windowed_name] = with_fallback(queries[windowed_name], lifetime_query)
+    try:
+        sketched = sketch_quantiles(parse_step(time_range))
+    except ValueError:
+        sketched = None
+    if sketched is None:
+        queries.update(quantile_queries(time_range))
+    results = await client.query_many(queries)
+
+    lifetimes = {}
+    for name in LIFETIME_QUERIES:
+        windowed_name = name[:-len("_lifetime")]
+        results[windowed_name], lifetimes[name] = split_by_source(results[windowed_name])
+
+    vectors = MetricVectors(
+        runs=parse_vector(results["runs"], VECTOR_LABELS["runs"]),
+        tool_calls=parse_vector(results["tool_calls"], VECTOR_LABELS["tool_calls"]),
+        cost=parse_vector(results["cost"], VECTOR_LABELS["cost"]),
+        tokens=parse_vector(results["tokens"], VECTOR_LABELS["tokens"]),
+        llm_requests=parse_vector(results["llm_requests"], VECTOR_LABELS["llm_requests"]),
+        agent_duration=parse_vector(results["agent_duration"], VECTOR_LABELS["agent_duration"]),
+        tool_duration=parse_vector(results["tool_duration"], VECTOR_LABELS["tool_duration"]),
+        conversations=sum(parse_vector(results["conversations"], ("__name__",)).values()),
+        models=_parse_info(results["models"], "model"),
+        workflows={k: s.split(",") for k, s in _parse_info(results["workflows"], "workflows").items() if s},
+        subagents={k: s.split(",") for k, s in _parse_info(results["subagents"], "subagents").items() if s},
+    )
+    for name, result in lifetimes.items():
+        setattr(vectors, name, parse_vector(result, VECTOR_LABELS[name]))
+    if sketched is not None:
+        vectors.agent_quantiles, vectors.tool_quantiles = sketched
+    else:
+        vectors.agent_quantiles = _parse_quantiles(results, "agent", VECTOR_LABELS["agent_duration"])
+        vectors.tool_quantiles = _parse_quantiles(results, "tool", VECTOR_LABELS["tool_duration"])
+    return vectors
+
+
+def local_metric_vectors(time_range: str, store: LocalMetricsStore = LOCAL_METRICS) -> Optional[MetricVectors]:
+    """Vectors for a time range from the in-process store, or None if it cannot answer.
+
+    Only windows the store fully covers are answered (see
+    ``LocalMetricsStore.covers``); the caller queries Prometheus otherwise.
+    """
+    try:
+        window = parse_step(time_range)
+    except ValueError:
+        return None
+    if not store.covers(window):
+        return None
+
+    def _mean(totals: Dict[str, float]) -> float:
+        return totals["duration_sum"] / totals["duration_count"] if totals["duration_count"] > 0 else 0.0
+
+    agents = store.window_totals("agent", window)
+    tools = store.window_totals("tool", window)
+    models = store.window_totals("model", window)
+    conversations = store.window_totals("conversation", window)
+    agents_lifetime = store.lifetime_totals("agent")
+    tools_lifetime = store.lifetime_totals("tool")
+    models_lifetime = store.lifetime_totals("model")
+
+    v = MetricVectors(
+        conversations=sum(t["conversations"] for t in conversations.values()),
+        models=dict(store.models),
+        workflows=dict(store.workflows),
+        subagents=dict(store.subagents),
+        runs_lifetime={},
+        tool_calls_lifetime={},
+        cost_lifetime={},
+        agent_duration_lifetime={},
+        tool_duration_lifetime={},
+    )
+    for (agent_name,), t in agents.items():
+        v.runs[(agent_name, "success")] = t["runs_success"]
+        v.runs[(agent_name, "error")] = t["runs_error"]
+        if t["duration_count"] > 0:
+            v.agent_duration[agent_name] = _mean(t)
+    for (agent_name,), t in agents_lifetime.items():
+        v.runs_lifetime[(agent_name, "success")] = t["runs_success"]
+        v.runs_lifetime[(agent_name, "error")] = t["runs_error"]
+        v.agent_duration_lifetime[agent_name] = _mean(t)
+    for (agent_name, tool_name), t in tools.items():
+        v.tool_calls[(agent_name, tool_name, "success")] = t["calls_success"]
+        v.tool_calls[(agent_name, tool_name, "error")] = t["calls_error"]
+        if t["duration_count"] > 0:
+            v.tool_duration[(agent_name, tool_name)] = _mean(t)
+    for (agent_name, tool_name), t in tools_lifetime.items():
+        v.tool_calls_lifetime[(agent_name, tool_name, "success")] = t["calls_success"]
+        v.tool_calls_lifetime[(agent_name, tool_name, "error")] = t["calls_error"]
+        v.tool_duration_lifetime[(agent_name, tool_name)] = _mean(t)
+    for (agent_name, _), t in models.items():
+        v.cost[agent_name] = v.cost.get(agent_name, 0.0) + t["cost"]
+        v.tokens[agent_name] = v.tokens.get(agent_name, 0.0) + t["total_tokens"]
+        v.llm_requests[agent_name] = v.llm_requests.get(agent_name, 0.0) + t["requests"]
+    for (agent_name, _), t in models_lifetime.items():
+        v.cost_lifetime[agent_name] = v.cost_lifetime.get(agent_name, 0.0) + t["cost"]
+    sketched = sketch_quantiles(window)
+    if sketched is not None:
+        v.agent_quantiles, v.tool_quantiles = sketched
+    return v
+
+
+async def build_dashboard_snapshot(client: PrometheusClient, time_range: str) -> DashboardSnapshot:
+    """Fetch and assemble the dashboard snapshot for one time range.
+
+    Recent windows are served from the in-process store when it covers them.
+    """
+    vectors = local_metric_vectors(time_range)
+    if vectors is None:
+        vectors = await fetch_metric_vectors(client, time_range)
+    return assemble_snapshot(vectors, time_range)
@@ -0,0 +1,149 @@
+"""Server-sent event stream of dashboard snapshots.
+
+One background task per distinct ``time_range`` computes the dashboard
+snapshot once per scrape interval and publishes it as pre-serialized JSON
+sections. Subscribers only receive the sections that changed since the
+last event they were sent, so backend work grows with the number of
+distinct views rather than the number of open dashboards.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional
+from prometheus_client import Gauge
+
+from agent.backend.prometheus.client import PrometheusClient
+from agent.backend.prometheus.snapshot import build_dashboard_snapshot
+
+from config import PROMETHEUS_SCRAPE_INTERVAL
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+logger = logging.getLogger(__name__)
+
+
+STREAM_SUBSCRIBERS = Gauge(
+    "adk_metrics_stream_subscribers",
+    "Open dashboard metrics stream connections",
+    [],
+    multiprocess_mode="livesum"
+)
+STREAM_CHANNELS = Gauge(
+    "adk_metrics_stream_channels",
+    "Distinct time ranges currently computed for the metrics stream",
+    [],
+    multiprocess_mode="livesum"
+)
+
+# Snapshot sections sent to subscribers, in DashboardSnapshot field order
+SECTIONS = ("summary", "by_agent", "agents_detail", "conversations")
+
+# Idle connections get an SSE comment this often so proxies keep them open
+KEEPALIVE_SECONDS = 15.0
+
+
+class _Channel:
+    """Latest snapshot for one time range and the subscribers watching it."""
+
+    def __init__(self, time_range: str):
+        self.time_range = time_range
+        self.sections: Dict[str, str] = {}
+        self.version = 0
+        self.subscribers = 0
+        self.updated = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, sections: Dict[str, str]) -> None:
+        """Replace the current sections and wake every waiting subscriber."""
+        self.sections = sections
+        self.version += 1
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+
+class SnapshotBroadcaster:
+    """Computes dashboard snapshots once per tick and fans them out over SSE."""
+
+    def __init__(self, client: PrometheusClient, interval: float = PROMETHEUS_SCRAPE_INTERVAL):
+        self._client = client
+        self.interval = interval
+        self._channels: Dict[str, _Channel] = {}
+
+    async def _run(self, channel: _Channel) -> None:
+        """Refresh a channel on every scrape-interval boundary while it has subscribers."""
+        while True:
+            try:
+                snapshot = await build_dashboard_snapshot(self._client, channel.time_range)
+                channel.publish({
+                    name: getattr(snapshot, name).model_dump_json() for name in SECTIONS
+                })
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error computing metrics stream snapshot for time_range={channel.time_range}: {e}")
+            # Sleep to just past the next boundary, when the result cache turns over
+            await asyncio.sleep(self.interval - (time.time() % self.interval) + 0.05)
+
+    def _join(self, time_range: str) -> _Channel:
+        channel = self._channels.get(time_range)
+        if channel is None:
+            channel = _Channel(time_range)
+            channel.task = asyncio.create_task(self._run(channel))
+            self._channels[time_range] = channel
+            STREAM_CHANNELS.set(len(self._channels))
+            logger.info(f"Started metrics stream channel for time_range={time_range}")
+        channel.subscribers += 1
+        STREAM_SUBSCRIBERS.inc()
+        return channel
+
+    def _leave(self, channel: _Channel) -> None:
+        channel.subscribers -= 1
+        STREAM_SUBSCRIBERS.dec()
+        if channel.subscribers == 0 and self._channels.get(channel.time_range) is channel:
+            del self._channels[channel.time_range]
+            if channel.task is not None:
+                channel.task.cancel()
+            STREAM_CHANNELS.set(len(self._channels))
+            logger.info(f"Stopped metrics stream channel for time_range={channel.time_range}")
+
+    async def subscribe(self, time_range: str) -> AsyncIterator[str]:
+        """Yield SSE frames for a time range until the client disconnects.
+
+        The first ``snapshot`` event carries every section; later events carry
+        only the sections whose content changed.
+        """
+        channel = self._join(time_range)
+        sent: Dict[str, str] = {}
+        version = 0
+        try:
+            while True:
+                updated = channel.updated
+                if channel.version == version:
+                    try:
+                        await asyncio.wait_for(updated.wait(), timeout=KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    continue
+
+                version = channel.version
+                changed = [name for name in SECTIONS if name in channel.sections and sent.get(name) != channel.sections[name]]
+                if not changed:
+                    continue
+                for name in changed:
+                    sent[name] = channel.sections[name]
+                body = ",".join(f'"{name}":{sent[name]}' for name in changed)
+                yield f'event: snapshot\ndata: {{"time_range":{json.dumps(time_range)},"sections":{{{body}}}}}\n\n'
+        finally:
+            self._leave(channel)
+
+    async def close(self) -> None:
+        """Stop all channel tasks."""
+        tasks = [c.task for c in self._channels.values() if c.task is not None]
+        self._channels.clear()
+        STREAM_CHANNELS.set(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,211 @@
+"""Decoding of Prometheus range-query results for the time-series endpoints.
+
+The query step is chosen from the requested range and a point budget,
+and the ``rate()`` window grows with it so coarse steps do not sample a
+short window at sparse instants. Optional Largest-Triangle-Three-Buckets
+downsampling reduces a finer-grained result to the budget while keeping
+peaks and troughs.
+
+Two output shapes are supported. The point shape builds one
+``TimeSeriesPoint`` per sample and is what existing clients expect. The
+columnar shape keeps one epoch-timestamp array shared by every metric and
+one float array per metric, decoded straight from the ``values`` pairs
+without per-point objects or ISO formatting.
+"""
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agent.backend.types.types import TimeSeriesPoint
+
+from config import PROMETHEUS_SCRAPE_INTERVAL
+
+# Steps the server picks from, in seconds; round values keep buckets aligned
+# across refreshes and make the cached range results reusable.
+STEP_CHOICES = (
+    15, 30, 60, 120, 300, 600, 900, 1800,
+    3600, 2 * 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400,
+)
+
+# LTTB picks from this many times the point budget
+LTTB_OVERSAMPLE = 4
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_DURATION_RE = re.compile(r"^(\d+)([smhdw])$")
+
+
+def parse_step(step: str) -> int:
+    """Seconds in a Prometheus duration such as ``'30s'``, ``'5m'`` or ``'1d'``."""
+    match = _DURATION_RE.match(step.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid step: {step!r}")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def format_step(seconds: int) -> str:
+    """Shortest Prometheus duration string for a whole number of seconds."""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def choose_step(range_seconds: float, max_points: int, requested: Optional[int] = None) -> int:
+    """Step giving at most ``max_points`` samples over the range.
+
+    A requested step is honored when it already fits the budget; otherwise,
+    or without one, the smallest step from STEP_CHOICES that fits is used.
+    """
+    min_step = range_seconds / max(max_points, 1)
+    if requested is not None and requested >= min_step:
+        return requested
+    for step in STEP_CHOICES:
+        if step >= min_step:
+            return step
+    return int(math.ceil(min_step / 86400)) * 86400
+
+
+def rate_window(step_seconds: int, scrape_interval: float = PROMETHEUS_SCRAPE_INTERVAL) -> str:
+    """``rate()`` range for a step: the step itself, but at least four scrapes.
+
+    A window shorter than the step would skip the samples between points;
+    four scrape intervals keep ``rate()`` stable at the finest steps.
+    """
+    return format_step(max(step_seconds, int(math.ceil(4 * scrape_interval))))
+
+
+def time_series_queries(window: str) -> Dict[str, str]:
+    """Dashboard-wide series, keyed by TimeSeriesData field."""
+    return {
+        # Tokens over time (using type="total" to avoid double counting)
+        "tokens": f'sum(rate(adk_llm_tokens_total{{type="total"}}[{window}])) or vector(0)',
+        "tool_calls": f'sum(rate(adk_tool_calls_total[{window}])) or vector(0)',
+        "duration": f'avg(rate(adk_agent_run_duration_seconds_sum[{window}]) / rate(adk_agent_run_duration_seconds_count[{window}])) or vector(0)',
+        "cost": f'sum(rate(adk_llm_cost_dollars_total[{window}])) or vector(0)',
+    }
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept. Each bucket in between keeps
+    the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves visual extremes.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    kept = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def downsample_columns(
+    timestamps: List[float],
+    columns: Dict[str, List[float]],
+    threshold: int,
+) -> Tuple[List[float], Dict[str, List[float]]]:
+    """LTTB over columns that share timestamps.
+
+    Indices are chosen per metric and merged, so every metric keeps its own
+    extremes on the shared axis. The merged axis therefore holds between
+    ``threshold`` and ``threshold`` times the number of metrics points.
+    """
+    if len(timestamps) <= threshold:
+        return timestamps, columns
+    keep = sorted({i for values in columns.values() for i in lttb_indices(timestamps, values, threshold)})
+    return [timestamps[i] for i in keep], {key: [values[i] for i in keep] for key, values in columns.items()}
+
+
+def _value(raw: str) -> float:
+    """Sample value with NaN/Inf (e.g. 0/0 duration ratios) mapped to 0."""
+    val = float(raw)
+    if math.isnan(val) or math.isinf(val):
+        return 0.0
+    return val
+
+
+def decode_points(result: Optional[Dict[str, Any]], threshold: Optional[int] = None) -> List[TimeSeriesPoint]:
+    """One TimeSeriesPoint per sample of every series in a matrix result.
+
+    With ``threshold``, each series is reduced by LTTB before any point
+    objects are built.
+    """
+    points: List[TimeSeriesPoint] = []
+    if result and result.get("result"):
+        for series in result["result"]:
+            values = series.get("values", [])
+            if threshold is not None and len(values) > threshold:
+                xs = [float(ts) for ts, _ in values]
+                ys = [_value(val) for _, val in values]
+                values = [values[i] for i in lttb_indices(xs, ys, threshold)]
+            for ts, val in values:
+                points.append(TimeSeriesPoint(
+                    timestamp=datetime.fromtimestamp(ts).isoformat(),
+                    value=_value(val),
+                ))
+    return points
+
+
+def _first_series(result: Optional[Dict[str, Any]]) -> List[List[Any]]:
+    """``values`` of the single series an aggregated matrix result holds."""
+    if result and result.get("result"):
+        return result["result"][0].get("values", [])
+    return []
+
+
+def decode_columns(
+    results: Dict[str, Optional[Dict[str, Any]]],
+) -> Tuple[List[float], Dict[str, List[float]]]:
+    """Columnar view of aggregated range results that share one query window.
+
+    Every query is aggregated to a single series evaluated on the same step
+    grid, so in the common case all metrics have identical timestamps and
+    the values are copied over as-is. Metrics with gaps are aligned to the
+    union of timestamps with missing samples filled as 0.
+
+    Returns:
+        Shared epoch-second timestamps and a value array per result key
+    """
+    values = {key: _first_series(result) for key, result in results.items()}
+    grids = {len(v) for v in values.values() if v}
+    longest = max(values.values(), key=len, default=[])
+    timestamps = [ts for ts, _ in longest]
+
+    if len(grids) <= 1:
+        return timestamps, {
+            key: [_value(val) for _, val in v] if v else [0.0] * len(timestamps)
+            for key, v in values.items()
+        }
+
+    timestamps = sorted({ts for v in values.values() for ts, _ in v})
+    index = {ts: i for i, ts in enumerate(timestamps)}
+    columns: Dict[str, List[float]] = {}
+    for key, v in values.items():
+        column = [0.0] * len(timestamps)
+        for ts, val in v:
+            column[index[ts]] = _value(val)
+        columns[key] = column
+    return timestamps, columns
@@ -0,0 +1,134 @@
+"""
+Agent Call Retries
+==================
+Retries agent turns that come back with nothing to show, without blocking
+the event loop and without retrying forever.
+
+An attempt is retried when it produces no answer: an empty result for
+``call``, or a stream that ends before yielding anything for ``stream``.
+Attempts are separated by full-jitter exponential backoff (a random delay
+up to ``base_delay * 2 ** (attempt - 1)``, capped at ``max_delay``) so
+clients that failed together do not retry together. Every request has an
+overall deadline: ``call`` cancels an attempt still running when it
+passes, and neither method sleeps or starts an attempt past it. A stream
+is never cancelled once it has started sending, as the client is already
+seeing progress.
+
+Retries and abandoned requests are counted per endpoint on ``/metrics``.
+"""
+import asyncio
+import logging
+import random
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from prometheus_client import Counter
+
+from config import (
+    AGENT_RETRY_MAX_ATTEMPTS,
+    AGENT_RETRY_BASE_DELAY,
+    AGENT_RETRY_MAX_DELAY,
+    AGENT_RETRY_DEADLINE,
+)
+
+logger = logging.getLogger("adk_metrics")
+
+T = TypeVar("T")
+
+
+AGENT_RETRIES = Counter(
+    "adk_agent_call_retries_total",
+    "Agent turns retried after producing no answer",
+    ["endpoint"]
+)
+AGENT_RETRIES_EXHAUSTED = Counter(
+    "adk_agent_call_retries_exhausted_total",
+    "Agent requests abandoned without an answer, by limit reached (attempts, deadline)",
+    ["endpoint", "reason"]
+)
+
+
+class RetriesExhausted(Exception):
+    """No attempt produced an answer within the attempt limit or the deadline."""
+
+    def __init__(self, endpoint: str, reason: str, attempts: int):
+        self.endpoint = endpoint
+        self.reason = reason
+        self.attempts = attempts
+        limit = "deadline passed" if reason == "deadline" else "no attempts left"
+        super().__init__(f"Agent produced no answer after {attempts} attempt(s) ({limit})")
+
+
+class RetryPolicy:
+    """Bounded, jittered retries of one endpoint's agent turns.
+
+    Args:
+        endpoint: Label value for the retry counters
+        max_attempts: Attempts per request, the first one included
+        base_delay: Backoff cap before the second attempt, doubling after each retry
+        max_delay: Upper bound of any backoff
+        deadline: Seconds from the first attempt after which the request is abandoned
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        max_attempts: int = AGENT_RETRY_MAX_ATTEMPTS,
+        base_delay: float = AGENT_RETRY_BASE_DELAY,
+        max_delay: float = AGENT_RETRY_MAX_DELAY,
+        deadline: float = AGENT_RETRY_DEADLINE,
+    ):
+        self.endpoint = endpoint
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._retries = AGENT_RETRIES.labels(endpoint=endpoint)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the attempt following ``attempt`` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _give_up(self, reason: str, attempts: int) -> RetriesExhausted:
+        AGENT_RETRIES_EXHAUSTED.labels(endpoint=self.endpoint, reason=reason).inc()
+        logger.warning(f"Giving up on {self.endpoint} agent call after {attempts} attempt(s): {reason}")
+        return RetriesExhausted(self.endpoint, reason, attempts)
+
+    async def _pause(self, attempt: int, deadline: float) -> None:
+        """Back off before the next attempt, or raise if there is none."""
+        loop = asyncio.get_running_loop()
+        if attempt >= self.max_attempts:
+            raise self._give_up("attempts", attempt)
+        delay = self.backoff(attempt)
+        if loop.time() + delay >= deadline:
+            raise self._give_up("deadline", attempt)
+        self._retries.inc()
+        logger.warning(f"Agent returned no answer on {self.endpoint}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+        await asyncio.sleep(delay)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], is_empty: Callable[[T], bool]) -> T:
+        """Result of the first attempt of ``fn`` for which ``is_empty`` is False."""
+        deadline = asyncio.get_running_loop().time() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with asyncio.timeout_at(deadline):
+                    result = await fn()
+            except TimeoutError:
+                raise self._give_up("deadline", attempt) from None
+            if not is_empty(result):
+                return result
+            await self._pause(attempt, deadline)
+
+    async def stream(self, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Items of the first stream from ``fn`` that yields anything."""
+        deadline = asyncio.get_running_loop().time() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            produced = False
+            async for item in fn():
+                produced = True
+                yield item
+            if produced:
+                return
+            await self._pause(attempt, deadline)
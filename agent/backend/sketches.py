@@ -0,0 +1,212 @@
+"""
+Latency Quantile Sketches
+=========================
+DDSketch-style quantile sketches of agent run, LLM call and tool call
+durations, kept per agent, per (agent, model) and per (agent, tool) over
+rolling windows.
+
+A sketch maps each positive value ``x`` to the bin ``ceil(log_gamma(x))``
+with ``gamma = (1 + a) / (1 - a)`` and counts values per bin. Any quantile
+read back is within relative error ``a`` of a true sample value, and two
+sketches with the same ``a`` merge by adding bin counts, which is what
+makes rolling windows cheap: a window is the merge of the slot sketches it
+spans. Bins are capped at ``max_bins``; past that the lowest bins are
+folded together, which only affects accuracy of the smallest quantiles.
+
+Each series keeps 60 one-minute slots and 24 one-hour slots. Windows up to
+an hour are answered from minute slots and windows up to a day from hour
+slots, counted in whole slots including the current partial one, as in
+``metrics_store``. Longer windows, and windows the process has not been up
+for, are left to ``histogram_quantile`` in Prometheus.
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    LATENCY_SKETCH_ENABLED,
+    LATENCY_SKETCH_ACCURACY,
+    LATENCY_SKETCH_MAX_BINS,
+    LATENCY_SKETCH_MAX_SERIES,
+)
+
+# Response field per quantile, as on AgentDetailMetrics and ToolMetrics
+QUANTILES = {"p50_duration": 0.5, "p90_duration": 0.9, "p95_duration": 0.95, "p99_duration": 0.99}
+
+# Values at or below this many seconds are counted in the zero bin
+_MIN_VALUE = 1e-6
+
+_MINUTE_SLOTS = 60
+_HOUR_SLOTS = 24
+
+
+class DDSketch:
+    """Mergeable quantile sketch with bounded relative error.
+
+    Args:
+        relative_accuracy: Maximum relative error of returned quantiles
+        max_bins: Cap on non-empty bins
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_gamma", "_ln_gamma", "bins", "zero_count", "count")
+
+    def __init__(self, relative_accuracy: float = LATENCY_SKETCH_ACCURACY, max_bins: int = LATENCY_SKETCH_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._ln_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def key(self, value: float) -> Optional[int]:
+        """Bin of a value, or None for the zero bin."""
+        if value <= _MIN_VALUE:
+            return None
+        return math.ceil(math.log(value) / self._ln_gamma)
+
+    def add(self, value: float) -> None:
+        self.add_key(self.key(value))
+
+    def add_key(self, key: Optional[int]) -> None:
+        """Count a value already mapped with ``key``."""
+        self.count += 1
+        if key is None:
+            self.zero_count += 1
+            return
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other: "DDSketch") -> None:
+        """Add another sketch with the same relative accuracy into this one."""
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        keys = sorted(self.bins)
+        target = keys[len(keys) - self.max_bins]
+        for key in keys[:len(keys) - self.max_bins]:
+            self.bins[target] += self.bins.pop(key)
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile ``q`` (0 to 1), or 0.0 for an empty sketch."""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+
+
+class _RollingSketch:
+    """Minute and hour slot sketches of one series."""
+
+    __slots__ = ("minute_ids", "minutes", "hour_ids", "hours")
+
+    def __init__(self):
+        self.minute_ids = [-1] * _MINUTE_SLOTS
+        self.minutes: List[Optional[DDSketch]] = [None] * _MINUTE_SLOTS
+        self.hour_ids = [-1] * _HOUR_SLOTS
+        self.hours: List[Optional[DDSketch]] = [None] * _HOUR_SLOTS
+
+    @staticmethod
+    def _add(ids: List[int], sketches: List[Optional[DDSketch]], period: int, key: Optional[int]) -> None:
+        slot = period % len(ids)
+        if ids[slot] < period:
+            ids[slot] = period
+            sketches[slot] = DDSketch()
+        elif ids[slot] > period:
+            # Older than the ring; its slot already holds a newer period
+            return
+        sketches[slot].add_key(key)
+
+    def add(self, key: Optional[int], now: float) -> None:
+        """Count a value mapped with ``DDSketch.key`` in the minute and hour slots of ``now``."""
+        self._add(self.minute_ids, self.minutes, int(now // 60), key)
+        self._add(self.hour_ids, self.hours, int(now // 3600), key)
+
+    def window(self, window_seconds: float, now: float) -> DDSketch:
+        """Merge of the slots overlapping the trailing window."""
+        if window_seconds <= _MINUTE_SLOTS * 60:
+            ids, sketches, size = self.minute_ids, self.minutes, 60
+        else:
+            ids, sketches, size = self.hour_ids, self.hours, 3600
+        last = int(now // size)
+        first = last - max(int(math.ceil(window_seconds / size)), 1) + 1
+        merged = DDSketch()
+        for period, sketch in zip(ids, sketches):
+            if sketch is not None and first <= period <= last:
+                merged.merge(sketch)
+        return merged
+
+
+class LatencySketches:
+    """Rolling duration sketches per agent, (agent, model) and (agent, tool).
+
+    Args:
+        max_series: Cap on series across all kinds
+        enabled: When False, recording is a no-op and no window is covered
+    """
+
+    def __init__(self, max_series: int = LATENCY_SKETCH_MAX_SERIES, enabled: bool = LATENCY_SKETCH_ENABLED):
+        self.max_series = max_series
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.dropped_series = 0
+        self._series: Dict[Tuple[str, Tuple[str, ...]], _RollingSketch] = {}
+        self._lock = threading.Lock()
+        # Maps values to bins; every slot sketch uses the same accuracy
+        self._mapping = DDSketch()
+
+    def record(self, kind: str, key: Tuple[str, ...], duration: float, now: Optional[float] = None) -> None:
+        """One duration in seconds; ``kind`` is agent, model or tool."""
+        if not self.enabled:
+            return
+        now = now if now is not None else time.time()
+        bin_key = self._mapping.key(duration)
+        with self._lock:
+            series = self._series.get((kind, key))
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    self.dropped_series += 1
+                    return
+                series = self._series[(kind, key)] = _RollingSketch()
+            series.add(bin_key, now)
+
+    def covers(self, window_seconds: float, now: Optional[float] = None) -> bool:
+        """Whether the sketches hold every duration of the trailing window."""
+        if not self.enabled or self.dropped_series or window_seconds > 24 * 3600:
+            return False
+        now = now if now is not None else time.time()
+        return now - self.started_at >= window_seconds
+
+    def quantiles(
+        self,
+        kind: str,
+        window_seconds: float,
+        quantiles: Dict[str, float] = QUANTILES,
+        now: Optional[float] = None,
+    ) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Quantiles per key over the trailing window, for keys with samples in it."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            merged = [(key[1], series.window(window_seconds, now)) for key, series in self._series.items() if key[0] == kind]
+        return {
+            key: {name: sketch.quantile(q) for name, q in quantiles.items()}
+            for key, sketch in merged if sketch.count
+        }
+
+
+# Process-wide sketches fed by agent/backend/instrument.py
+LATENCY_SKETCHES = LatencySketches()
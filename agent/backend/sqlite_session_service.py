@@ -0,0 +1,481 @@
+"""
+SQLite Session Service
+======================
+An ADK session service that keeps conversations in a SQLite file, so they
+survive restarts and can be picked up by any worker sharing the file.
+
+Reads are served from a hot cache of recently used sessions. A session not
+in the cache is loaded lazily, with its events, on ``get_session``. With
+``revalidate`` on (the default), each cache hit checks the session's
+update time in the database (one indexed row read) and reloads the
+session if another worker has appended to it, or deleted it, since. A
+single worker owning the file can turn it off and serve hits from memory.
+
+Writes go behind: ``append_event`` updates the cached session and queues
+the event and the new state, and a background task writes the queue in
+one transaction every ``flush_interval`` seconds, or as soon as a batch is
+waiting. Within a batch, state upserts of the same session collapse to the
+last one and rows of the same kind are written with a single
+``executemany``; a state upsert never overwrites a newer one from another
+worker. Before any read of the database the queue is flushed, so a
+process always reads its own writes. When the queue is full, callers wait
+for a flush rather than losing events.
+
+State keys follow ADK's prefixes: ``app:`` and ``user:`` keys are stored
+once per app and per user and merged into every session returned, and
+``temp:`` keys are never stored.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import BaseSessionService, GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+from prometheus_client import Counter, Gauge
+
+from config import (
+    SESSION_DB_PATH,
+    SESSION_CACHE_SIZE,
+    SESSION_FLUSH_INTERVAL,
+    SESSION_WRITE_QUEUE_SIZE,
+    SESSION_CACHE_REVALIDATE,
+)
+
+logger = logging.getLogger("adk_metrics")
+
+
+SESSION_CACHE_LOOKUPS = Counter(
+    "adk_session_cache_lookups_total",
+    "SQLite session service lookups by result (hit, miss, stale)",
+    ["result"]
+)
+SESSION_WRITE_QUEUE = Gauge(
+    "adk_session_write_queue_depth",
+    "Session writes waiting for the next SQLite batch",
+    [],
+    multiprocess_mode="livesum"
+)
+_CACHE_HIT = SESSION_CACHE_LOOKUPS.labels(result="hit")
+_CACHE_MISS = SESSION_CACHE_LOOKUPS.labels(result="miss")
+_CACHE_STALE = SESSION_CACHE_LOOKUPS.labels(result="stale")
+
+# Longest wait before retrying a batch after consecutive failed writes (seconds)
+_MAX_RETRY_DELAY = 30.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "app_name TEXT NOT NULL, user_id TEXT NOT NULL, id TEXT NOT NULL, state TEXT NOT NULL, "
+    "create_time REAL NOT NULL, update_time REAL NOT NULL, PRIMARY KEY (app_name, user_id, id))",
+    "CREATE TABLE IF NOT EXISTS events ("
+    "app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL, id TEXT NOT NULL, "
+    "timestamp REAL NOT NULL, data TEXT NOT NULL, PRIMARY KEY (app_name, user_id, session_id, id))",
+    "CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, timestamp)",
+    "CREATE TABLE IF NOT EXISTS app_states ("
+    "app_name TEXT PRIMARY KEY, state TEXT NOT NULL, update_time REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS user_states ("
+    "app_name TEXT NOT NULL, user_id TEXT NOT NULL, state TEXT NOT NULL, update_time REAL NOT NULL, "
+    "PRIMARY KEY (app_name, user_id))",
+)
+
+_UPSERT_SESSION = (
+    "INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (app_name, user_id, id) DO UPDATE SET state = excluded.state, update_time = excluded.update_time "
+    "WHERE excluded.update_time >= sessions.update_time"
+)
+_INSERT_EVENT = "INSERT OR REPLACE INTO events (app_name, user_id, session_id, id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)"
+_UPSERT_APP_STATE = (
+    "INSERT INTO app_states (app_name, state, update_time) VALUES (?, ?, ?) "
+    "ON CONFLICT (app_name) DO UPDATE SET state = excluded.state, update_time = excluded.update_time "
+    "WHERE excluded.update_time >= app_states.update_time"
+)
+_UPSERT_USER_STATE = (
+    "INSERT INTO user_states (app_name, user_id, state, update_time) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (app_name, user_id) DO UPDATE SET state = excluded.state, update_time = excluded.update_time "
+    "WHERE excluded.update_time >= user_states.update_time"
+)
+_DELETE_EVENTS = "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+_DELETE_SESSION = "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?"
+
+SessionKey = Tuple[str, str, str]  # (app_name, user_id, session_id)
+
+
+def _json_default(value: Any) -> Any:
+    """Tool results in state may be pydantic models."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def _dumps(state: Dict[str, Any]) -> str:
+    return json.dumps(state, default=_json_default)
+
+
+def _split_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """App, user and session parts of a state delta, without prefixes or temp keys."""
+    app, user, session = {}, {}, {}
+    for key, value in state.items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+class SqliteSessionService(BaseSessionService):
+    """Persistent ADK session service with a hot cache and write-behind batching.
+
+    Args:
+        path: SQLite database file
+        cache_size: Sessions kept in memory; least recently used are dropped first
+        flush_interval: Seconds between write batches
+        max_pending: Queued writes after which callers wait for a flush
+        revalidate: Check cached sessions for other workers' writes on every read
+    """
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        cache_size: int = SESSION_CACHE_SIZE,
+        flush_interval: float = SESSION_FLUSH_INTERVAL,
+        max_pending: int = SESSION_WRITE_QUEUE_SIZE,
+        revalidate: bool = SESSION_CACHE_REVALIDATE,
+    ):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.revalidate = revalidate
+        # Cached sessions hold only their own state; app and user state are merged on read
+        self._sessions: "OrderedDict[SessionKey, Session]" = OrderedDict()
+        self._app_states: Dict[str, Dict[str, Any]] = {}
+        self._user_states: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._pending: List[tuple] = []
+        self._db: Optional[aiosqlite.Connection] = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    # --- Connection and write-behind queue ---
+
+    async def _conn(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._open_lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.path, timeout=5.0)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                for statement in _SCHEMA:
+                    await db.execute(statement)
+                await db.commit()
+                self._wake = asyncio.Event()
+                self._writer = asyncio.create_task(self._write_loop(), name="adk-session-writer")
+                self._db = db
+                logger.info(f"SQLite session store opened at {self.path}")
+        return self._db
+
+    async def _enqueue(self, op: tuple) -> None:
+        await self._conn()
+        self._pending.append(op)
+        SESSION_WRITE_QUEUE.inc()
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif len(self._pending) == 1:
+            self._wake.set()
+
+    async def _write_loop(self) -> None:
+        failures = 0
+        while True:
+            await self._wake.wait()
+            # Let the rest of the turn's writes join the batch
+            await asyncio.sleep(self.flush_interval)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                failures += 1
+                delay = min(self.flush_interval * 2 ** min(failures, 16), _MAX_RETRY_DELAY)
+                if failures == 1:
+                    logger.error(f"Failed to write session batch: {e}", exc_info=True)
+                else:
+                    logger.error(f"Failed to write session batch ({failures} in a row, retrying in {delay:.1f}s): {e}")
+                # The batch is back in the queue; retry it, backing off, without waiting for new writes
+                await asyncio.sleep(delay)
+                self._wake.set()
+            else:
+                if failures:
+                    logger.info(f"Session batch written after {failures} failed attempt(s)")
+                failures = 0
+
+    async def flush(self) -> None:
+        """Write every queued change now."""
+        async with self._write_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            SESSION_WRITE_QUEUE.dec(len(batch))
+            db = await self._conn()
+            try:
+                for sql, rows in self._statements(batch):
+                    await db.executemany(sql, rows)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                # Keep the batch ahead of newer writes, to be retried by the next flush
+                self._pending[:0] = batch
+                SESSION_WRITE_QUEUE.inc(len(batch))
+                raise
+
+    @staticmethod
+    def _statements(batch: List[tuple]) -> List[Tuple[str, List[tuple]]]:
+        """SQL and rows for a batch, grouped by statement between deletes."""
+        statements: List[Tuple[str, List[tuple]]] = []
+        sessions: Dict[SessionKey, tuple] = {}
+        app_states: Dict[str, tuple] = {}
+        user_states: Dict[Tuple[str, str], tuple] = {}
+        events: List[tuple] = []
+
+        def close_segment():
+            for sql, rows in (
+                (_UPSERT_SESSION, list(sessions.values())),
+                (_INSERT_EVENT, events[:]),
+                (_UPSERT_APP_STATE, list(app_states.values())),
+                (_UPSERT_USER_STATE, list(user_states.values())),
+            ):
+                if rows:
+                    statements.append((sql, rows))
+            sessions.clear(); events.clear(); app_states.clear(); user_states.clear()
+
+        for op in batch:
+            kind = op[0]
+            if kind == "session":
+                _, key, state, create_time, update_time = op
+                sessions[key] = (*key, _dumps(state), create_time, update_time)
+            elif kind == "event":
+                _, key, event = op
+                events.append((*key, event.id, event.timestamp, event.model_dump_json(exclude_none=True)))
+            elif kind == "app_state":
+                _, app_name, state, update_time = op
+                app_states[app_name] = (app_name, _dumps(state), update_time)
+            elif kind == "user_state":
+                _, app_name, user_id, state, update_time = op
+                user_states[(app_name, user_id)] = (app_name, user_id, _dumps(state), update_time)
+            elif kind == "delete":
+                close_segment()
+                statements.append((_DELETE_EVENTS, [op[1]]))
+                statements.append((_DELETE_SESSION, [op[1]]))
+        close_segment()
+        return statements
+
+    async def close(self) -> None:
+        """Write pending changes and close the database."""
+        if self._db is None:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write {len(self._pending)} queued session change(s) on close: {e}")
+        if self._writer is not None:
+            self._writer.cancel()
+        await self._db.close()
+        self._db = None
+
+    # --- Cache ---
+
+    def _cache(self, session: Session) -> None:
+        key = (session.app_name, session.user_id, session.id)
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.cache_size:
+            self._sessions.popitem(last=False)
+
+    async def _app_state(self, app_name: str) -> Dict[str, Any]:
+        state = self._app_states.get(app_name)
+        if state is None:
+            await self.flush()
+            async with (await self._conn()).execute(
+                "SELECT state FROM app_states WHERE app_name = ?", (app_name,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            state = self._app_states[app_name] = json.loads(row[0]) if row else {}
+        return state
+
+    async def _user_state(self, app_name: str, user_id: str) -> Dict[str, Any]:
+        key = (app_name, user_id)
+        state = self._user_states.get(key)
+        if state is None:
+            await self.flush()
+            async with (await self._conn()).execute(
+                "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?", key
+            ) as cursor:
+                row = await cursor.fetchone()
+            state = self._user_states[key] = json.loads(row[0]) if row else {}
+            while len(self._user_states) > self.cache_size:
+                self._user_states.popitem(last=False)
+        else:
+            self._user_states.move_to_end(key)
+        return state
+
+    async def _view(self, session: Session, config: Optional[GetSessionConfig] = None) -> Session:
+        """Copy of a cached session for callers, with app and user state merged in.
+
+        Events are never modified once appended, so the copy shares them.
+        """
+        events = session.events
+        if config is not None:
+            if config.num_recent_events:
+                events = events[-config.num_recent_events:]
+            if config.after_timestamp:
+                events = [e for e in events if e.timestamp >= config.after_timestamp]
+        state = dict(session.state)
+        for key, value in (await self._app_state(session.app_name)).items():
+            state[State.APP_PREFIX + key] = value
+        for key, value in (await self._user_state(session.app_name, session.user_id)).items():
+            state[State.USER_PREFIX + key] = value
+        return session.model_copy(update={"state": state, "events": list(events)})
+
+    async def _load(self, key: SessionKey) -> Optional[Session]:
+        await self.flush()
+        db = await self._conn()
+        async with db.execute(
+            "SELECT state, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            self._sessions.pop(key, None)
+            return None
+        async with db.execute(
+            "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY timestamp, rowid", key
+        ) as cursor:
+            events = [Event.model_validate_json(data) for (data,) in await cursor.fetchall()]
+        session = Session(
+            app_name=key[0], user_id=key[1], id=key[2],
+            state=json.loads(row[0]), events=events, last_update_time=row[1],
+        )
+        self._cache(session)
+        return session
+
+    # --- BaseSessionService ---
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        if key in self._sessions or await self._load(key) is not None:
+            raise ValueError(f"Session with ID {session_id} already exists for user {user_id}")
+
+        now = time.time()
+        app_delta, user_delta, session_state = _split_state(state or {})
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=session_state, last_update_time=now)
+        self._cache(session)
+        await self._enqueue(("session", key, dict(session_state), now, now))
+        if app_delta:
+            app_state = await self._app_state(app_name)
+            app_state.update(app_delta)
+            await self._enqueue(("app_state", app_name, dict(app_state), now))
+        if user_delta:
+            user_state = await self._user_state(app_name, user_id)
+            user_state.update(user_delta)
+            await self._enqueue(("user_state", app_name, user_id, dict(user_state), now))
+        return await self._view(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        session = self._sessions.get(key)
+        if session is not None and not self.revalidate:
+            _CACHE_HIT.inc()
+            self._sessions.move_to_end(key)
+        elif session is not None:
+            # Another worker may have appended to or deleted the session since it was cached
+            async with (await self._conn()).execute(
+                "SELECT update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None or row[0] > session.last_update_time:
+                _CACHE_STALE.inc()
+                session = await self._load(key)
+            else:
+                _CACHE_HIT.inc()
+                self._sessions.move_to_end(key)
+        else:
+            _CACHE_MISS.inc()
+            session = await self._load(key)
+        if session is None:
+            return None
+        return await self._view(session, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+        query = "SELECT user_id, id, state, update_time FROM sessions WHERE app_name = ?"
+        params: tuple = (app_name,)
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params += (user_id,)
+        async with (await self._conn()).execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=row[0], id=row[1], state=json.loads(row[2]), last_update_time=row[3])
+            for row in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._sessions.pop(key, None)
+        await self._enqueue(("delete", key))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Updates the caller's copy of the session
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        cached = self._sessions.get(key)
+        if cached is None:
+            cached = await self._load(key)
+            if cached is None:
+                raise ValueError(f"Session with ID {session.id} not found for user {session.user_id}")
+        # Callers only ever hold copies, so the cached session is updated separately
+        cached.events.append(event)
+        cached.last_update_time = event.timestamp
+
+        app_delta, user_delta, session_delta = {}, {}, {}
+        if event.actions and event.actions.state_delta:
+            app_delta, user_delta, session_delta = _split_state(event.actions.state_delta)
+        cached.state.update(session_delta)
+
+        await self._enqueue(("event", key, event))
+        await self._enqueue(("session", key, dict(cached.state), cached.last_update_time, cached.last_update_time))
+        if app_delta:
+            app_state = await self._app_state(session.app_name)
+            app_state.update(app_delta)
+            await self._enqueue(("app_state", session.app_name, dict(app_state), event.timestamp))
+        if user_delta:
+            user_state = await self._user_state(session.app_name, session.user_id)
+            user_state.update(user_delta)
+            await self._enqueue(("user_state", session.app_name, session.user_id, dict(user_state), event.timestamp))
+        return event
@@ -0,0 +1,482 @@
+"""
+Span Tracing
+============
+Parent/child spans for agent runs, LLM calls and tool calls, emitted by the
+wrappers in ``agent/backend/instrument.py`` and kept in a local trace store
+so a conversation can be inspected as a latency waterfall without any
+external collector.
+
+The current span is held in a ``ContextVar``. ADK runs tool calls while the
+LLM call that requested them is still open and sub-agents inside their
+parent's run, so the nesting of the wrappers gives the hierarchy
+agent → LLM call → tool directly.
+
+Finished spans are appended to a bounded queue and written to the store by
+a daemon thread in batches, so the request path never waits on storage.
+When the queue is full, spans are dropped and counted. Spans are also sent
+to an OTLP/HTTP collector when ``TRACE_OTLP_ENDPOINT`` is set.
+"""
+import contextvars
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from opentelemetry import trace as otel_trace
+from prometheus_client import Counter
+
+from agent.backend.types.types import TraceSpan, TraceWaterfallResponse
+from config import (
+    TRACING_ENABLED,
+    TRACE_STORE,
+    TRACE_STORE_PATH,
+    TRACE_MAX_SESSIONS,
+    TRACE_MAX_SPANS_PER_SESSION,
+    TRACE_QUEUE_SIZE,
+    TRACE_EXPORT_BATCH_SIZE,
+    TRACE_EXPORT_INTERVAL,
+    TRACE_OTLP_ENDPOINT,
+)
+
+logger = logging.getLogger("adk_metrics")
+
+
+TRACE_SPANS = Counter(
+    "adk_trace_spans_total",
+    "Finished spans by outcome (exported, dropped)",
+    ["result"]
+)
+_SPANS_EXPORTED = TRACE_SPANS.labels(result="exported")
+_SPANS_DROPPED = TRACE_SPANS.labels(result="dropped")
+
+
+class SpanRecord(NamedTuple):
+    """A finished span as handed to the exporter."""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    session_id: Optional[str]
+    user_id: Optional[str]
+    kind: str  # agent, llm or tool
+    name: str
+    start_time: float  # Unix epoch seconds
+    duration: float  # Seconds
+    status: str
+    attributes: Dict[str, Any]
+
+
+class OpenSpan:
+    """A span that has started and not yet ended."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "session_id", "user_id", "kind", "name", "start_time", "token")
+
+    def __init__(self, trace_id, span_id, parent_id, session_id, user_id, kind, name, start_time):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.session_id = session_id
+        self.user_id = user_id
+        self.kind = kind
+        self.name = name
+        self.start_time = start_time
+        self.token: Optional[contextvars.Token] = None
+
+
+_CURRENT_SPAN: contextvars.ContextVar[Optional[OpenSpan]] = contextvars.ContextVar("adk_current_span", default=None)
+
+
+# --- Trace Stores ---
+
+class MemoryTraceStore:
+    """Spans of the most recent sessions, held in process memory.
+
+    Args:
+        max_sessions: Sessions kept; the least recently updated is evicted first
+        max_spans: Spans kept per session; the oldest are dropped first
+    """
+
+    def __init__(self, max_sessions: int = TRACE_MAX_SESSIONS, max_spans: int = TRACE_MAX_SPANS_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.max_spans = max_spans
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._users: Dict[str, str] = {}  # user_id -> latest session_id
+        self._lock = threading.Lock()
+
+    def export(self, batch: Sequence[SpanRecord]) -> None:
+        with self._lock:
+            for span in batch:
+                if not span.session_id:
+                    continue
+                spans = self._sessions.get(span.session_id)
+                if spans is None:
+                    spans = deque(maxlen=self.max_spans)
+                    self._sessions[span.session_id] = spans
+                    while len(self._sessions) > self.max_sessions:
+                        evicted, _ = self._sessions.popitem(last=False)
+                        self._users = {u: s for u, s in self._users.items() if s != evicted}
+                else:
+                    self._sessions.move_to_end(span.session_id)
+                spans.append(span)
+                if span.user_id:
+                    self._users[span.user_id] = span.session_id
+
+    def spans_for_session(self, session_id: str) -> List[SpanRecord]:
+        """Spans of an ADK session, or of the latest session of a user ID."""
+        with self._lock:
+            spans = self._sessions.get(session_id)
+            if spans is None and session_id in self._users:
+                spans = self._sessions.get(self._users[session_id])
+            return list(spans) if spans else []
+
+
+class SqliteTraceStore:
+    """Spans of the most recent sessions in a SQLite file.
+
+    Several workers can share one file. A small ``sessions`` table tracks
+    each session's last span start and span count, so every batch trims the
+    sessions it touched to their newest ``max_spans`` spans and, only when
+    it adds sessions past ``max_sessions``, drops the least recently active
+    ones, without aggregating over the spans table.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_STORE_PATH,
+        max_sessions: int = TRACE_MAX_SESSIONS,
+        max_spans: int = TRACE_MAX_SPANS_PER_SESSION,
+    ):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spans ("
+            "session_id TEXT NOT NULL, user_id TEXT, trace_id TEXT NOT NULL, span_id TEXT NOT NULL, "
+            "parent_id TEXT, kind TEXT NOT NULL, name TEXT NOT NULL, start_time REAL NOT NULL, "
+            "duration REAL NOT NULL, status TEXT NOT NULL, attributes TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spans_session ON spans (session_id, start_time)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spans_user ON spans (user_id, start_time)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, last_start REAL NOT NULL, spans INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_start ON sessions (last_start)")
+        # Files written before the sessions table existed
+        self._conn.execute(
+            "INSERT OR IGNORE INTO sessions "
+            "SELECT session_id, MAX(start_time), COUNT(*) FROM spans "
+            "WHERE NOT EXISTS (SELECT 1 FROM sessions) GROUP BY session_id"
+        )
+        self._conn.commit()
+
+    def export(self, batch: Sequence[SpanRecord]) -> None:
+        rows = [
+            (s.session_id, s.user_id, s.trace_id, s.span_id, s.parent_id, s.kind, s.name,
+             s.start_time, s.duration, s.status, json.dumps(s.attributes, default=str))
+            for s in batch if s.session_id
+        ]
+        if not rows:
+            return
+        touched: Dict[str, List[float]] = {}
+        for row in rows:
+            session = touched.setdefault(row[0], [row[7], 0])
+            session[0] = max(session[0], row[7])
+            session[1] += 1
+        with self._lock:
+            conn = self._conn
+            conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+                "last_start = MAX(last_start, excluded.last_start), spans = spans + excluded.spans",
+                [(session_id, last_start, count) for session_id, (last_start, count) in touched.items()],
+            )
+            # Keep the newest max_spans spans of each session written to
+            full = [
+                session_id for (session_id,) in conn.execute(
+                    f"SELECT session_id FROM sessions WHERE spans > ? "
+                    f"AND session_id IN ({', '.join('?' * len(touched))})",
+                    (self.max_spans, *touched),
+                )
+            ]
+            conn.executemany(
+                "DELETE FROM spans WHERE rowid IN (SELECT rowid FROM spans WHERE session_id = ? "
+                "ORDER BY start_time DESC LIMIT -1 OFFSET ?)",
+                [(session_id, self.max_spans) for session_id in full],
+            )
+            conn.executemany(
+                "UPDATE sessions SET spans = ? WHERE session_id = ?",
+                [(self.max_spans, session_id) for session_id in full],
+            )
+            # Drop the least recently active sessions once new ones exceed the cap
+            if conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] > self.max_sessions:
+                stale = conn.execute(
+                    "SELECT session_id FROM sessions ORDER BY last_start DESC LIMIT -1 OFFSET ?",
+                    (self.max_sessions,),
+                ).fetchall()
+                conn.executemany("DELETE FROM spans WHERE session_id = ?", stale)
+                conn.executemany("DELETE FROM sessions WHERE session_id = ?", stale)
+            conn.commit()
+
+    def spans_for_session(self, session_id: str) -> List[SpanRecord]:
+        """Spans of an ADK session, or of the latest session of a user ID."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM spans WHERE session_id = ? ORDER BY start_time DESC LIMIT ?",
+                (session_id, self.max_spans),
+            ).fetchall()
+            if not rows:
+                latest = self._conn.execute(
+                    "SELECT session_id FROM spans WHERE user_id = ? ORDER BY start_time DESC LIMIT 1",
+                    (session_id,),
+                ).fetchone()
+                if latest:
+                    rows = self._conn.execute(
+                        "SELECT * FROM spans WHERE session_id = ? ORDER BY start_time DESC LIMIT ?",
+                        (latest[0], self.max_spans),
+                    ).fetchall()
+        return [
+            SpanRecord(
+                trace_id=r[2], span_id=r[3], parent_id=r[4], session_id=r[0], user_id=r[1],
+                kind=r[5], name=r[6], start_time=r[7], duration=r[8], status=r[9],
+                attributes=json.loads(r[10]),
+            )
+            for r in reversed(rows)
+        ]
+
+
+class OtlpSpanSink:
+    """Sends span batches to an OTLP/HTTP collector.
+
+    Needs ``opentelemetry-sdk`` and ``opentelemetry-exporter-otlp-proto-http``;
+    without them the sink logs a warning once and does nothing.
+    """
+
+    def __init__(self, endpoint: str, service_name: str = "adk-agent-backend"):
+        self.endpoint = endpoint
+        self._exporter = None
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import ReadableSpan
+            from opentelemetry.trace import SpanContext, SpanKind, TraceFlags
+            from opentelemetry.trace.status import Status, StatusCode
+        except ImportError as e:
+            logger.warning(f"OTLP trace export disabled, missing dependency: {e}")
+            return
+        self._exporter = OTLPSpanExporter(endpoint=endpoint)
+        self._resource = Resource.create({"service.name": service_name})
+        self._readable_span = ReadableSpan
+        self._span_context = SpanContext
+        self._span_kind = SpanKind.INTERNAL
+        self._sampled = TraceFlags(TraceFlags.SAMPLED)
+        self._ok = Status(StatusCode.OK)
+        self._error = Status(StatusCode.ERROR)
+
+    def _context(self, trace_id: str, span_id: str):
+        return self._span_context(int(trace_id, 16), int(span_id, 16), is_remote=False, trace_flags=self._sampled)
+
+    def export(self, batch: Sequence[SpanRecord]) -> None:
+        if self._exporter is None:
+            return
+        spans = []
+        for s in batch:
+            start_ns = int(s.start_time * 1e9)
+            attributes = {"adk.kind": s.kind, **{k: v for k, v in s.attributes.items() if v is not None}}
+            if s.session_id:
+                attributes["adk.session_id"] = s.session_id
+            spans.append(self._readable_span(
+                name=f"{s.kind} {s.name}",
+                context=self._context(s.trace_id, s.span_id),
+                parent=self._context(s.trace_id, s.parent_id) if s.parent_id else None,
+                resource=self._resource,
+                attributes=attributes,
+                kind=self._span_kind,
+                status=self._ok if s.status == "success" else self._error,
+                start_time=start_ns,
+                end_time=start_ns + int(s.duration * 1e9),
+            ))
+        self._exporter.export(spans)
+
+
+# --- Exporter ---
+
+class BatchSpanExporter:
+    """Moves finished spans from a bounded queue to the sinks on a daemon thread.
+
+    ``submit`` only appends to a deque, so it is safe to call from the event
+    loop. The thread wakes every ``interval`` seconds, or as soon as a full
+    batch is waiting, and writes batches of up to ``batch_size`` spans.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[Any],
+        max_queue: int = TRACE_QUEUE_SIZE,
+        batch_size: int = TRACE_EXPORT_BATCH_SIZE,
+        interval: float = TRACE_EXPORT_INTERVAL,
+    ):
+        self.sinks = list(sinks)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: deque = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="adk-span-exporter", daemon=True)
+                self._thread.start()
+
+    def submit(self, span: SpanRecord) -> None:
+        if len(self._queue) >= self.max_queue:
+            _SPANS_DROPPED.inc()
+            return
+        self._queue.append(span)
+        if self._thread is None:
+            self._start()
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every queued span now."""
+        while self._queue:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+            except IndexError:
+                pass
+            for sink in self.sinks:
+                try:
+                    sink.export(batch)
+                except Exception as e:
+                    logger.error(f"Failed to export {len(batch)} spans to {type(sink).__name__}: {e}")
+            _SPANS_EXPORTED.inc(len(batch))
+
+
+# --- Tracer ---
+
+def _session_ids(invocation_context) -> tuple:
+    session = getattr(invocation_context, "session", None)
+    if session is None:
+        return None, None
+    return getattr(session, "id", None), getattr(session, "user_id", None)
+
+
+class Tracer:
+    """Starts and ends spans for the instrumentation wrappers."""
+
+    def __init__(self, exporter: BatchSpanExporter, enabled: bool = TRACING_ENABLED):
+        self.exporter = exporter
+        self.enabled = enabled
+
+    def start(self, kind: str, name: str, invocation_context=None) -> Optional[OpenSpan]:
+        """Open a span as a child of the current one and make it current."""
+        if not self.enabled:
+            return None
+        parent = _CURRENT_SPAN.get()
+        session_id, user_id = _session_ids(invocation_context)
+        if parent is not None:
+            trace_id = parent.trace_id
+            session_id = session_id or parent.session_id
+            user_id = user_id or parent.user_id
+        else:
+            # Join the request's OpenTelemetry trace when there is one
+            span_context = otel_trace.get_current_span().get_span_context()
+            trace_id = format(span_context.trace_id if span_context.is_valid else random.getrandbits(128), "032x")
+        span = OpenSpan(
+            trace_id, format(random.getrandbits(64), "016x"), parent.span_id if parent else None,
+            session_id, user_id, kind, name, time.time(),
+        )
+        span.token = _CURRENT_SPAN.set(span)
+        return span
+
+    def end(self, span: Optional[OpenSpan], duration: float, status: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        """Restore the parent span and queue the finished span for export."""
+        if span is None:
+            return
+        try:
+            _CURRENT_SPAN.reset(span.token)
+        except ValueError:
+            # Closed from another context (e.g. generator finalization); nothing to restore
+            pass
+        self.exporter.submit(SpanRecord(
+            span.trace_id, span.span_id, span.parent_id, span.session_id, span.user_id,
+            span.kind, span.name, span.start_time, duration, status, attributes or {},
+        ))
+
+
+# --- Waterfall ---
+
+def build_waterfall(session_id: str, spans: Sequence[SpanRecord]) -> TraceWaterfallResponse:
+    """Spans in depth-first order with start offsets from the first span.
+
+    Spans whose parent is not in the store (evicted or still running) are
+    shown as roots.
+    """
+    if not spans:
+        return TraceWaterfallResponse(session_id=session_id)
+    origin = min(s.start_time for s in spans)
+    known = {s.span_id for s in spans}
+    children: Dict[Optional[str], List[SpanRecord]] = {}
+    for s in spans:
+        children.setdefault(s.parent_id if s.parent_id in known else None, []).append(s)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s.start_time)
+
+    rows: List[TraceSpan] = []
+    stack = [(s, 0) for s in reversed(children.get(None, []))]
+    while stack:
+        s, depth = stack.pop()
+        rows.append(TraceSpan(
+            trace_id=s.trace_id,
+            span_id=s.span_id,
+            parent_id=s.parent_id,
+            kind=s.kind,
+            name=s.name,
+            status=s.status,
+            depth=depth,
+            start_offset=s.start_time - origin,
+            duration=s.duration,
+            attributes=s.attributes,
+        ))
+        stack.extend((c, depth + 1) for c in reversed(children.get(s.span_id, [])))
+
+    end = max(s.start_time + s.duration for s in spans)
+    return TraceWaterfallResponse(
+        session_id=spans[0].session_id or session_id,
+        start_time=origin,
+        duration=end - origin,
+        traces=len({s.trace_id for s in spans}),
+        spans=rows,
+    )
+
+
+def _build_store():
+    if TRACE_STORE == "sqlite":
+        return SqliteTraceStore()
+    if TRACE_STORE != "memory":
+        logger.warning(f"Unknown TRACE_STORE {TRACE_STORE!r}; using the in-memory store")
+    return MemoryTraceStore()
+
+
+# Process-wide store and tracer used by agent/backend/instrument.py
+TRACE_STORE_BACKEND = _build_store()
+TRACER = Tracer(BatchSpanExporter(
+    [TRACE_STORE_BACKEND] + ([OtlpSpanSink(TRACE_OTLP_ENDPOINT)] if TRACE_OTLP_ENDPOINT else [])
+))
@@ -23,6 +23,12 @@ class AgentCallResponse(BaseModel):
     function_payloads: Optional[list[FunctionPayload]] = None
 
 
+class AgentStreamChunk(BaseModel):
+    """One piece of a streamed agent turn: a text delta or a function payload."""
+    delta: str = ""
+    function_payload: Optional[FunctionPayload] = None
+
+
 class Location(BaseModel):
     """Represents a geographic location."""
     address: str
@@ -111,6 +117,10 @@ class ToolMetrics(BaseModel):
     name: str
     calls: int = 0
     avg_duration: float = 0.0
+    p50_duration: float = 0.0
+    p90_duration: float = 0.0
+    p95_duration: float = 0.0
+    p99_duration: float = 0.0
     success_rate: float = 1.0  # 0.0 to 1.0
 
 
@@ -131,6 +141,10 @@ class AgentDetailMetrics(BaseModel):
     cost: float = 0.0
     runs: int = 0
     avg_duration: float = 0.0
+    p50_duration: float = 0.0
+    p90_duration: float = 0.0
+    p95_duration: float = 0.0
+    p99_duration: float = 0.0
     success_rate: float = 1.0  # 0.0 to 1.0
     tools: list[ToolMetrics] = Field(default_factory=list)
     workflows: list[str] = Field(default_factory=list)
@@ -170,6 +184,99 @@ class TimeSeriesResponse(BaseModel):
     step: str
 
 
+class ColumnarTimeSeriesResponse(BaseModel):
+    """Time series metrics as one shared timestamp array and a value array per metric."""
+    timestamps: list[float] = Field(default_factory=list)  # Unix epoch seconds
+    series: dict[str, list[float]] = Field(default_factory=dict)
+    hours: int
+    step: str
+
+
+class AgentTimeSeriesResponse(BaseModel):
+    """Time series metrics for a single agent, in columnar form."""
+    agent_name: str
+    timestamps: list[float] = Field(default_factory=list)  # Unix epoch seconds
+    series: dict[str, list[float]] = Field(default_factory=dict)
+    hours: int
+    step: str
+
+
+class AgentsTimeSeriesResponse(BaseModel):
+    """Time series metrics for every agent, sharing one timestamp array."""
+    timestamps: list[float] = Field(default_factory=list)  # Unix epoch seconds
+    agents: dict[str, dict[str, list[float]]] = Field(default_factory=dict)
+    hours: int
+    step: str
+
+
+class LatencyBreakdown(BaseModel):
+    """LLM latency split into time to first response and generation, for one (model, agent)."""
+    model: str
+    agent_name: str
+    requests: int = 0
+    avg_duration: float = 0.0
+    p50_duration: float = 0.0
+    p90_duration: float = 0.0
+    p95_duration: float = 0.0
+    p99_duration: float = 0.0
+    avg_time_to_first_response: float = 0.0
+    p50_time_to_first_response: float = 0.0
+    p95_time_to_first_response: float = 0.0
+    avg_generation_time: float = 0.0  # avg_duration minus avg_time_to_first_response
+    p50_inter_chunk_gap: float = 0.0
+    p95_inter_chunk_gap: float = 0.0
+    avg_output_tokens_per_second: float = 0.0
+
+
+class LatencyBreakdownResponse(BaseModel):
+    """Response containing the LLM latency breakdown per model and agent."""
+    breakdown: list[LatencyBreakdown] = Field(default_factory=list)
+    time_range: str
+
+
+class TopSession(BaseModel):
+    """A session among the heaviest for one metric.
+
+    ``value`` may overestimate the true total by at most ``error``.
+    """
+    session_id: str
+    value: float
+    error: float = 0.0
+
+
+class TopSessionsResponse(BaseModel):
+    """Heaviest sessions by LLM cost, tokens and latency since process start."""
+    cost: list[TopSession] = Field(default_factory=list)
+    tokens: list[TopSession] = Field(default_factory=list)
+    latency: list[TopSession] = Field(default_factory=list)  # Seconds spent in LLM calls
+    capacity: int
+    since: float  # Unix epoch seconds
+    enabled: bool = True  # False in multi-worker mode, where no process sees every session
+
+
+class TraceSpan(BaseModel):
+    """One span of a session trace, positioned for a latency waterfall."""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    kind: str  # agent, llm or tool
+    name: str
+    status: str
+    depth: int = 0
+    start_offset: float = 0.0  # Seconds since the first span of the session started
+    duration: float = 0.0
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+
+class TraceWaterfallResponse(BaseModel):
+    """Spans of a session in depth-first order."""
+    session_id: str
+    start_time: Optional[float] = None  # Unix epoch seconds
+    duration: float = 0.0
+    traces: int = 0
+    spans: list[TraceSpan] = Field(default_factory=list)
+
+
 class AgentInfo(BaseModel):
     """Static configuration info for an agent."""
     name: str
@@ -190,3 +297,12 @@ class ConversationMetrics(BaseModel):
     avg_runs_per_conversation: float = 0.0
     avg_tool_calls_per_conversation: float = 0.0
     time_range: str
+
+
+class DashboardSnapshot(BaseModel):
+    """All overview dashboard metrics for one time range in a single payload."""
+    summary: MetricsSummary
+    by_agent: AgentMetricsResponse
+    agents_detail: AgentDetailResponse
+    conversations: ConversationMetrics
+    time_range: str
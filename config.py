@@ -14,6 +14,121 @@ VERTEX_RAG_CORPUS = os.getenv("VERTEX_RAG_CORPUS", "UNKNOWN")
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Prometheus HTTP API used by the metrics endpoints
+PROMETHEUS_URL = os.getenv("PROMETHEUS_URL", "http://localhost:9093")
+PROMETHEUS_HTTP2 = os.getenv("PROMETHEUS_HTTP2", "false").lower() == "true"
+PROMETHEUS_MAX_CONNECTIONS = int(os.getenv("PROMETHEUS_MAX_CONNECTIONS", "20"))
+PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+PROMETHEUS_KEEPALIVE_EXPIRY = float(os.getenv("PROMETHEUS_KEEPALIVE_EXPIRY", "30"))
+PROMETHEUS_TIMEOUT = float(os.getenv("PROMETHEUS_TIMEOUT", "10"))
+PROMETHEUS_CONNECT_TIMEOUT = float(os.getenv("PROMETHEUS_CONNECT_TIMEOUT", "2"))
+PROMETHEUS_POOL_TIMEOUT = float(os.getenv("PROMETHEUS_POOL_TIMEOUT", "5"))
+# Concurrent PromQL queries: process-wide and per API request
+PROMETHEUS_MAX_CONCURRENT_QUERIES = int(os.getenv("PROMETHEUS_MAX_CONCURRENT_QUERIES", "16"))
+PROMETHEUS_REQUEST_CONCURRENCY = int(os.getenv("PROMETHEUS_REQUEST_CONCURRENCY", "8"))
+# Query result cache: must match scrape_interval in prometheus.yml; 0 entries disables it
+PROMETHEUS_SCRAPE_INTERVAL = float(os.getenv("PROMETHEUS_SCRAPE_INTERVAL", "15"))
+PROMETHEUS_CACHE_MAX_ENTRIES = int(os.getenv("PROMETHEUS_CACHE_MAX_ENTRIES", "1024"))
+PROMETHEUS_CACHE_MAX_BYTES = int(os.getenv("PROMETHEUS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# How often to re-check which recording rules Prometheus has loaded (seconds)
+PROMETHEUS_RULES_REFRESH = float(os.getenv("PROMETHEUS_RULES_REFRESH", "300"))
+# Time-series endpoints: default point budget per series and hard ceiling on requests
+TIME_SERIES_MAX_POINTS = int(os.getenv("TIME_SERIES_MAX_POINTS", "300"))
+TIME_SERIES_POINTS_LIMIT = int(os.getenv("TIME_SERIES_POINTS_LIMIT", "2000"))
+
+# Shared directory for multi-worker metrics (uvicorn --workers N). prometheus_client
+# reads it at import time, so it must be set in the process environment, not only in .env
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Histogram buckets per metric family: a profile name from instrument.BUCKET_PROFILES
+# ("default", "tool", "llm", "agent") or comma-separated upper bounds in seconds
+AGENT_DURATION_BUCKETS = os.getenv("AGENT_DURATION_BUCKETS", "agent")
+LLM_DURATION_BUCKETS = os.getenv("LLM_DURATION_BUCKETS", "llm")
+TOOL_DURATION_BUCKETS = os.getenv("TOOL_DURATION_BUCKETS", "tool")
+# Attach trace/session ID exemplars to duration observations (OpenMetrics scrapes only)
+METRICS_EXEMPLARS_ENABLED = os.getenv("METRICS_EXEMPLARS_ENABLED", "true").lower() == "true"
+
+# Instrumentation overhead budget as a fraction of wrapped call time; past it,
+# exemplars, chunk-gap histograms and logs are sampled down to the minimum rate
+INSTRUMENTATION_OVERHEAD_BUDGET = float(os.getenv("INSTRUMENTATION_OVERHEAD_BUDGET", "0.01"))
+INSTRUMENTATION_MIN_SAMPLE_RATE = float(os.getenv("INSTRUMENTATION_MIN_SAMPLE_RATE", "0.01"))
+
+# Wrappers queue one event per call and a background thread applies them to
+# the metrics; past INSTRUMENTATION_QUEUE_SIZE waiting events, new ones are dropped
+INSTRUMENTATION_QUEUE_SIZE = int(os.getenv("INSTRUMENTATION_QUEUE_SIZE", "65536"))
+INSTRUMENTATION_FLUSH_INTERVAL = float(os.getenv("INSTRUMENTATION_FLUSH_INTERVAL", "0.25"))
+
+# Span tracing of agent runs, LLM calls and tool calls. TRACE_STORE is "memory"
+# (per process) or "sqlite" (shared by workers using the same TRACE_STORE_PATH)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_STORE = os.getenv("TRACE_STORE", "memory").lower()
+TRACE_STORE_PATH = os.getenv("TRACE_STORE_PATH", "/tmp/adk_traces.db")
+TRACE_MAX_SESSIONS = int(os.getenv("TRACE_MAX_SESSIONS", "500"))
+TRACE_MAX_SPANS_PER_SESSION = int(os.getenv("TRACE_MAX_SPANS_PER_SESSION", "2000"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", "256"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "1.0"))
+# Optional OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+
+# Sessions tracked by each top-sessions summary (cost, tokens, latency).
+# Per process, so off in multi-worker mode like the local store and sketches
+TOP_SESSIONS_ENABLED = (
+    os.getenv("TOP_SESSIONS_ENABLED", "true").lower() == "true"
+    and not PROMETHEUS_MULTIPROC_DIR
+)
+TOP_SESSIONS_CAPACITY = int(os.getenv("TOP_SESSIONS_CAPACITY", "100"))
+
+# In-process per-minute metrics store serving recent windows without Prometheus.
+# Each worker would only see its own traffic, so it is off in multi-worker mode
+LOCAL_METRICS_ENABLED = (
+    os.getenv("LOCAL_METRICS_ENABLED", "true").lower() == "true"
+    and not PROMETHEUS_MULTIPROC_DIR
+)
+LOCAL_METRICS_WINDOW_MINUTES = int(os.getenv("LOCAL_METRICS_WINDOW_MINUTES", str(24 * 60)))
+LOCAL_METRICS_MAX_SERIES = int(os.getenv("LOCAL_METRICS_MAX_SERIES", "256"))
+
+# Rolling latency quantile sketches (per process, so off in multi-worker mode)
+LATENCY_SKETCH_ENABLED = (
+    os.getenv("LATENCY_SKETCH_ENABLED", "true").lower() == "true"
+    and not PROMETHEUS_MULTIPROC_DIR
+)
+LATENCY_SKETCH_ACCURACY = float(os.getenv("LATENCY_SKETCH_ACCURACY", "0.01"))
+LATENCY_SKETCH_MAX_BINS = int(os.getenv("LATENCY_SKETCH_MAX_BINS", "512"))
+LATENCY_SKETCH_MAX_SERIES = int(os.getenv("LATENCY_SKETCH_MAX_SERIES", "256"))
+
+# Conversation sessions kept per process: idle sessions are evicted after
+# SESSION_IDLE_TTL seconds, and least recently used ones beyond the count or
+# approximate size cap (bytes of events and state)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# ADK session service: "memory" (per process, lost on restart) or "sqlite"
+# (persistent, shared by workers using the same SESSION_DB_PATH). The SQLite
+# service caches hot sessions and writes events behind, batched every
+# SESSION_FLUSH_INTERVAL seconds
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "/tmp/adk_sessions.db")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.05"))
+SESSION_WRITE_QUEUE_SIZE = int(os.getenv("SESSION_WRITE_QUEUE_SIZE", "10000"))
+# Check a cached session against the database on every read, to see writes from
+# other workers; a single worker owning the file can turn it off
+SESSION_CACHE_REVALIDATE = os.getenv("SESSION_CACHE_REVALIDATE", "true").lower() == "true"
+
+# Retries of agent turns that come back empty: attempts, full-jitter exponential
+# backoff between them (seconds) and an overall deadline per request (seconds)
+AGENT_RETRY_MAX_ATTEMPTS = int(os.getenv("AGENT_RETRY_MAX_ATTEMPTS", "3"))
+AGENT_RETRY_BASE_DELAY = float(os.getenv("AGENT_RETRY_BASE_DELAY", "0.5"))
+AGENT_RETRY_MAX_DELAY = float(os.getenv("AGENT_RETRY_MAX_DELAY", "4.0"))
+AGENT_RETRY_DEADLINE = float(os.getenv("AGENT_RETRY_DEADLINE", "120"))
+
+# CopilotKit GraphQL SSE: streamed text is sent at most every COPILOT_FRAME_INTERVAL
+# seconds, or sooner once COPILOT_FRAME_MAX_BYTES are waiting
+COPILOT_FRAME_INTERVAL = float(os.getenv("COPILOT_FRAME_INTERVAL", "0.05"))
+COPILOT_FRAME_MAX_BYTES = int(os.getenv("COPILOT_FRAME_MAX_BYTES", "1024"))
+
 # Upload directory for photos
 UPLOAD_DIR = "/tmp/uploads"
 
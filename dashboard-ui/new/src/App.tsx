@@ -7,7 +7,7 @@ import { AgentModal } from './components/AgentModal';
 import { Activity, Zap, DollarSign, Clock, TrendingUp, CheckCircle, Loader2 } from 'lucide-react';
 import { ArrowUpDown, ArrowUp, ArrowDown } from 'lucide-react';
 import { PieChart, Pie, Cell, ResponsiveContainer, Legend, Tooltip } from 'recharts';
-import { useMetricsSummary, useAgentsDetail, useConversationMetrics } from './hooks/useMetrics';
+import { useDashboardStream } from './hooks/useMetrics';
 import { CopilotSidebar } from "@copilotkit/react-ui";
 import { useCopilotReadable } from "@copilotkit/react-core";
 import { prompt } from "./prompt";
@@ -40,10 +40,15 @@ export default function App() {
   // Convert to backend format for API calls
   const backendTimeRange = toBackendTimeRange(timePeriod);
 
-  // Fetch data from backend using converted time range
-  const { data: summary, loading: summaryLoading, error: summaryError } = useMetricsSummary(backendTimeRange);
-  const { data: agentsDetail, loading: agentsLoading, error: agentsError } = useAgentsDetail(backendTimeRange);
-  const { data: conversationMetrics, loading: conversationLoading, error: conversationError } = useConversationMetrics(backendTimeRange);
+  // Subscribe to server-pushed metrics for the converted time range
+  const { data: dashboard, loading: dashboardLoading, error: dashboardError } = useDashboardStream(backendTimeRange);
+  const summary = dashboard.summary;
+  const agentsDetail = useMemo(() => dashboard.agents_detail?.agents ?? [], [dashboard.agents_detail]);
+  const conversationMetrics = dashboard.conversations;
+  const summaryLoading = dashboardLoading && !summary;
+  const agentsLoading = dashboardLoading && !dashboard.agents_detail;
+  const conversationLoading = dashboardLoading && !conversationMetrics;
+  const agentsError = dashboard.agents_detail ? null : dashboardError;
 
   // Combined loading state
   const isLoading = summaryLoading || agentsLoading || conversationLoading;
@@ -1,6 +1,7 @@
 import { X } from 'lucide-react';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 import { useState } from 'react';
+import { useAgentTimeSeries } from '../hooks/useMetrics';
 
 interface Agent {
   name: string;
@@ -27,61 +28,34 @@ type TimeHorizon = '7d' | '30d' | '90d';
 export function AgentModal({ agent, onClose }: AgentModalProps) {
   const [timeHorizon, setTimeHorizon] = useState<TimeHorizon>('30d');
 
-  // TODO: Replace mock data with real per-agent time-series from backend
-  // Backend has the Prometheus metrics (adk_llm_cost_dollars_total, adk_agent_runs_total, etc.)
-  // but no endpoint currently exposes time-series data per agent.
-  // Need to create: GET /api/metrics/time-series/agent/{agent_name}
-  const generateTimeSeriesData = (metric: string, horizon: TimeHorizon) => {
-    const days = horizon === '7d' ? 7 : horizon === '30d' ? 30 : 90;
-    const data = [];
-    
-    for (let i = 0; i < days; i++) {
-      const date = new Date();
-      date.setDate(date.getDate() - (days - i - 1));
-      const dayLabel = date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
-      
-      let value = 0;
-      const variance = 0.15; // 15% variance
-      
-      switch (metric) {
-        case 'totalCost':
-          const dailyCost = agent.totalCost / days;
-          value = dailyCost * (1 + (Math.random() - 0.5) * variance);
-          break;
-        case 'invocations':
-          const dailyInvocations = agent.invocations / days;
-          value = Math.round(dailyInvocations * (1 + (Math.random() - 0.5) * variance));
-          break;
-        case 'costPerInvocation':
-          value = agent.costPerInvocation * (1 + (Math.random() - 0.5) * variance);
-          break;
-        case 'successRate':
-          value = agent.successRate + (Math.random() - 0.5) * 2;
-          value = Math.max(95, Math.min(100, value));
-          break;
-        case 'latency':
-          value = agent.avgLatency * (1 + (Math.random() - 0.5) * variance);
-          break;
-        case 'toolCalls':
-          const dailyToolCalls = agent.toolCalls / days;
-          value = Math.round(dailyToolCalls * (1 + (Math.random() - 0.5) * variance));
-          break;
-      }
-      
-      data.push({ date: dayLabel, value });
-    }
-    
-    return data;
+  const hours = timeHorizon === '7d' ? 7 * 24 : timeHorizon === '30d' ? 30 * 24 : 90 * 24;
+  const { data: timeSeries } = useAgentTimeSeries(agent.name, hours, '1d');
+
+  // Daily series from GET /api/metrics/time-series/agent/{agent_name}
+  const getTimeSeriesData = (metric: string) => {
+    if (!timeSeries) return [];
+    const { series } = timeSeries;
+    const values: Record<string, number[]> = {
+      totalCost: series.cost,
+      invocations: series.runs,
+      costPerInvocation: series.cost_per_run,
+      successRate: (series.success_rate ?? []).map((v) => v * 100),
+      latency: (series.avg_duration ?? []).map((v) => v * 1000),
+      toolCalls: series.tool_calls,
+    };
+    return timeSeries.timestamps.map((ts, i) => ({
+      date: new Date(ts * 1000).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
+      value: values[metric]?.[i] ?? 0,
+    }));
   };
 
-  // NOTE: All chart labels include "(Mock)" since time-series data is generated, not from backend
   const metrics = [
-    { key: 'totalCost', label: 'Total Cost (Mock)', color: '#53706C', format: (v: number) => `$${v.toFixed(4)}` },
-    { key: 'invocations', label: 'Invocations (Mock)', color: '#6E8C88', format: (v: number) => v.toLocaleString() },
-    { key: 'costPerInvocation', label: 'Cost/Invocation (Mock)', color: '#53706C', format: (v: number) => `$${v.toFixed(5)}` },
-    { key: 'successRate', label: 'Success Rate (Mock)', color: '#6E8C88', format: (v: number) => `${v.toFixed(1)}%` },
-    { key: 'latency', label: 'Latency (Mock)', color: '#53706C', format: (v: number) => `${v.toFixed(0)}ms` },
-    { key: 'toolCalls', label: 'Tool Calls (Mock)', color: '#6E8C88', format: (v: number) => v.toLocaleString() },
+    { key: 'totalCost', label: 'Total Cost', color: '#53706C', format: (v: number) => `$${v.toFixed(4)}` },
+    { key: 'invocations', label: 'Invocations', color: '#6E8C88', format: (v: number) => v.toLocaleString() },
+    { key: 'costPerInvocation', label: 'Cost/Invocation', color: '#53706C', format: (v: number) => `$${v.toFixed(5)}` },
+    { key: 'successRate', label: 'Success Rate', color: '#6E8C88', format: (v: number) => `${v.toFixed(1)}%` },
+    { key: 'latency', label: 'Latency', color: '#53706C', format: (v: number) => `${v.toFixed(0)}ms` },
+    { key: 'toolCalls', label: 'Tool Calls', color: '#6E8C88', format: (v: number) => v.toLocaleString() },
   ];
 
   return (
@@ -148,7 +122,7 @@ export function AgentModal({ agent, onClose }: AgentModalProps) {
         {/* Charts Grid */}
         <div className="p-6 grid grid-cols-2 gap-6">
           {metrics.map((metric) => {
-            const data = generateTimeSeriesData(metric.key, timeHorizon);
+            const data = getTimeSeriesData(metric.key);
             return (
               <div key={metric.key} className="bg-[#F0FFFC] border border-[#ADC4C2] rounded-lg p-4">
                 <h3 className="text-sm text-[#000F0C] mb-4">{metric.label}</h3>
@@ -23,6 +23,10 @@ export interface ToolMetrics {
   name: string;
   calls: number;
   avg_duration: number;
+  p50_duration: number;
+  p90_duration: number;
+  p95_duration: number;
+  p99_duration: number;
   success_rate: number;
 }
 
@@ -32,6 +36,10 @@ export interface AgentDetailMetrics {
   cost: number;
   runs: number;
   avg_duration: number;
+  p50_duration: number;
+  p90_duration: number;
+  p95_duration: number;
+  p99_duration: number;
   success_rate: number;
   tools: ToolMetrics[];
   workflows: string[];
@@ -155,6 +163,56 @@ export function useMetricsTimeSeries(hours: number = 24, step: string = "5m", re
   return { data, loading, error };
 }
 
+export interface AgentTimeSeries {
+  agent_name: string;
+  timestamps: number[];
+  series: {
+    cost: number[];
+    tokens: number[];
+    runs: number[];
+    success_rate: number[];
+    cost_per_run: number[];
+    avg_duration: number[];
+    tool_calls: number[];
+  };
+  hours: number;
+  step: string;
+}
+
+/**
+ * Fetch per-agent time series (each point covers the preceding step)
+ * @param agentName - Agent to fetch; no request is made while empty
+ */
+export function useAgentTimeSeries(agentName: string, hours: number = 720, step: string = "1d") {
+  const [data, setData] = useState<AgentTimeSeries | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    if (!agentName) return;
+    const fetchData = async () => {
+      try {
+        setLoading(true);
+        const response = await fetch(
+          `${API_BASE_URL}/api/metrics/time-series/agent/${encodeURIComponent(agentName)}?hours=${hours}&step=${step}`
+        );
+        if (!response.ok) throw new Error("Failed to fetch agent time series");
+        const result = await response.json();
+        setData(result);
+        setError(null);
+      } catch (err) {
+        setError(err instanceof Error ? err.message : "Unknown error");
+      } finally {
+        setLoading(false);
+      }
+    };
+
+    fetchData();
+  }, [agentName, hours, step]);
+
+  return { data, loading, error };
+}
+
 export function useAgentsInfo() {
   const [data, setData] = useState<AgentInfo[]>([]);
   const [loading, setLoading] = useState(true);
@@ -250,3 +308,47 @@ export function useConversationMetrics(timeRange: string = "1h", refreshInterval
 
   return { data, loading, error };
 }
+
+export interface DashboardSnapshot {
+  summary: MetricsSummary | null;
+  by_agent: { agents: AgentMetrics[]; time_range: string } | null;
+  agents_detail: { agents: AgentDetailMetrics[]; time_range: string } | null;
+  conversations: ConversationMetrics | null;
+}
+
+const EMPTY_SNAPSHOT: DashboardSnapshot = {
+  summary: null,
+  by_agent: null,
+  agents_detail: null,
+  conversations: null,
+};
+
+/**
+ * Subscribe to server-pushed dashboard metrics instead of polling each endpoint.
+ * The backend sends every section on connect, then only the sections that changed.
+ * @param timeRange - Backend format: "1h", "24h", "7d", "30d", etc.
+ */
+export function useDashboardStream(timeRange: string = "24h") {
+  const [data, setData] = useState<DashboardSnapshot>(EMPTY_SNAPSHOT);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    setData(EMPTY_SNAPSHOT);
+    setLoading(true);
+    const source = new EventSource(`${API_BASE_URL}/api/metrics/stream?time_range=${timeRange}`);
+
+    source.addEventListener("snapshot", (event) => {
+      const update = JSON.parse((event as MessageEvent).data);
+      setData((prev) => ({ ...prev, ...update.sections }));
+      setLoading(false);
+      setError(null);
+    });
+    // EventSource reconnects by itself; the server resends all sections on reconnect
+    source.onerror = () => setError("Metrics stream disconnected");
+
+    return () => source.close();
+  }, [timeRange]);
+
+  return { data, loading, error };
+}
@@ -238,3 +238,47 @@ export function useConversationMetrics(timeRange: string = "1h", refreshInterval
 
   return { data, loading, error };
 }
+
+export interface DashboardSnapshot {
+  summary: MetricsSummary | null;
+  by_agent: { agents: AgentMetrics[]; time_range: string } | null;
+  agents_detail: { agents: AgentDetailMetrics[]; time_range: string } | null;
+  conversations: ConversationMetrics | null;
+}
+
+const EMPTY_SNAPSHOT: DashboardSnapshot = {
+  summary: null,
+  by_agent: null,
+  agents_detail: null,
+  conversations: null,
+};
+
+/**
+ * Subscribe to server-pushed dashboard metrics instead of polling each endpoint.
+ * The backend sends every section on connect, then only the sections that changed.
+ * @param timeRange - Backend format: "1h", "24h", "7d", "30d", etc.
+ */
+export function useDashboardStream(timeRange: string = "24h") {
+  const [data, setData] = useState<DashboardSnapshot>(EMPTY_SNAPSHOT);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    setData(EMPTY_SNAPSHOT);
+    setLoading(true);
+    const source = new EventSource(`${API_BASE_URL}/api/metrics/stream?time_range=${timeRange}`);
+
+    source.addEventListener("snapshot", (event) => {
+      const update = JSON.parse((event as MessageEvent).data);
+      setData((prev) => ({ ...prev, ...update.sections }));
+      setLoading(false);
+      setError(null);
+    });
+    // EventSource reconnects by itself; the server resends all sections on reconnect
+    source.onerror = () => setError("Metrics stream disconnected");
+
+    return () => source.close();
+  }, [timeRange]);
+
+  return { data, loading, error };
+}